@@ -0,0 +1,49 @@
+import io
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.views import APIView
+
+# Validators are per sub-request; conditional headers of the batch itself must not leak into them
+_DROPPED_HEADERS = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+
+def run_subrequest(request, path, excluded=()):
+    """
+    Dispatch a GET for `path` to its API view in-process, as `request`'s user.
+
+    The sub-request reuses the batch request's environ (host, headers) and
+    forces its already-authenticated user and token, so it skips middleware
+    and re-authentication. Returns `{'status', 'body'}`, plus the `etag`
+    when the view sets one.
+    """
+    parts = urlsplit(path)
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        match = None
+    view_class = getattr(match.func, 'cls', None) if match else None
+    if view_class is None or not issubclass(view_class, APIView):
+        return {'status': status.HTTP_404_NOT_FOUND, 'body': {'detail': 'Not found.'}}
+    if issubclass(view_class, excluded):
+        return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'detail': 'Batch requests cannot be nested.'}}
+
+    environ = {key: value for key, value in request._request.META.items() if key not in _DROPPED_HEADERS}
+    environ.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(b''),
+    })
+    subrequest = WSGIRequest(environ)
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+
+    response = match.func(subrequest, *match.args, **match.kwargs)
+    result = {'status': response.status_code, 'body': getattr(response, 'data', None)}
+    if response.has_header('ETag'):
+        result['etag'] = response['ETag']
+    return result
@@ -0,0 +1,204 @@
+import math
+import statistics
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Case, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from school_management.core.generations import get_generations
+from school_management.core.grading import round_score
+from school_management.core.models import Class, ExamSchedule, Grade, Mark, Student, Subject
+from school_management.core.reference_cache import reference_cache
+
+# Everything the analytics read; a write to any of them recomputes cached results
+ANALYTICS_MODELS = (Mark, ExamSchedule, Subject, Grade, Student, Class)
+ANALYTICS_CACHE_TIMEOUT = 3600
+PERCENTILES = (10, 25, 75, 90)
+MAX_TOP = 50
+
+
+def exam_analytics(exam, class_id=None, top=5):
+    """
+    Statistics of an exam's marks for each class and subject (exam schedule):
+    mean, median, percentiles, spread, pass rate, grade distribution and the
+    `top` scorers. Absentees and blank marks are counted but not scored.
+
+    Marks are loaded as columns in one query and every statistic is computed
+    for all groups at once (with NumPy when installed, otherwise with the
+    statistics module). Cached until one of ANALYTICS_MODELS is written.
+    """
+    key = f'exam-analytics:{exam.pk}:{class_id}:{top}'
+    generations = get_generations(ANALYTICS_MODELS)
+    entry = cache.get(key)
+    if entry is not None and entry['generations'] == generations:
+        return entry['data']
+
+    schedules, rolls, scores = _load(exam, class_id)
+    grades = sorted(reference_cache.table(Grade).values(), key=lambda grade: grade.min_marks)
+    summarize = _summarize_numpy if np is not None and scores else _summarize_python
+    stats = summarize(schedules, scores, grades, top)
+
+    top_rolls = {rolls[row] for group in stats for row in group['top']}
+    student_ids = dict(Student.objects.filter(roll_number__in=top_rolls).values_list('roll_number', 'pk'))
+    data = {'exam': exam.pk, 'class_obj': class_id, 'groups': []}
+    for (schedule, class_obj, subject, total, _), group in zip(schedules, stats):
+        top_rows = group.pop('top')
+        data['groups'].append({
+            'exam_schedule': schedule,
+            'class_obj': class_obj,
+            'class_name': reference_cache.name(Class, class_obj),
+            'subject': subject,
+            'subject_name': reference_cache.name(Subject, subject),
+            'total_marks': total,
+            'pass_marks': round_score(_pass_percentage(subject) * total / 100),
+            **group,
+            'top': [
+                {'student': student_ids.get(rolls[row]), 'roll_number': rolls[row], 'marks': round_score(scores[row]),
+                 'percentage': round_score(scores[row] * 100 / total) if total else None}
+                for row in top_rows
+            ],
+        })
+    data['groups'].sort(key=lambda group: (str(group['class_name']), str(group['subject_name'])))
+    cache.set(key, {'generations': generations, 'data': data}, ANALYTICS_CACHE_TIMEOUT)
+    return data
+
+
+def _load(exam, class_id):
+    """
+    The exam's schedules that have marks as (id, class, subject, total_marks,
+    mark count), and roll numbers and scores (None: absent or blank) of all
+    their marks, ordered by schedule so each schedule's marks are one
+    contiguous run.
+
+    Each mark is tagged with its schedule's position in that list instead of
+    the schedule id: converting tens of thousands of UUID columns costs more
+    than all the statistics, and the position still ties every mark to its
+    own schedule whatever order either table would default to.
+    """
+    schedules = ExamSchedule.objects.filter(exam=exam)
+    if class_id:
+        schedules = schedules.filter(class_obj=class_id)
+    schedules = list(schedules.order_by('pk').values_list('pk', 'class_obj', 'subject', 'total_marks'))
+    if not schedules:
+        return [], [], []
+    position = Case(*[When(exam_schedule=pk, then=Value(index)) for index, (pk, *_) in enumerate(schedules)],
+                    output_field=IntegerField())
+    rows = list(Mark.objects.filter(exam_schedule__in=[pk for pk, *_ in schedules])
+                .annotate(position=position).order_by('position')
+                .values_list('position', 'student__roll_number', 'is_absent', Cast('marks_obtained', FloatField())))
+    counts = Counter(row[0] for row in rows)
+    groups = [(*schedule, counts[index]) for index, schedule in enumerate(schedules) if counts[index]]
+    rolls = [roll for _, roll, _, _ in rows]
+    scores = [None if is_absent else score for _, _, is_absent, score in rows]
+    return groups, rolls, scores
+
+
+def _pass_percentage(subject_id):
+    subject = reference_cache.get(Subject, subject_id)
+    if subject is None or not subject.max_marks:
+        return 0.0
+    return subject.pass_marks * 100 / subject.max_marks
+
+
+def _result(count, absent, mean, std, percentile, passed, grades, top):
+    """One group's statistics; `percentile(q)` interpolates its ascending scores"""
+    return {
+        'appeared': count,
+        'absent': absent,
+        'mean': round_score(mean) if count else None,
+        'median': round_score(percentile(50)) if count else None,
+        'std': round_score(std) if count else None,
+        'min': round_score(percentile(0)) if count else None,
+        'max': round_score(percentile(100)) if count else None,
+        'percentiles': {f'p{q}': round_score(percentile(q)) if count else None for q in PERCENTILES},
+        'passed': passed,
+        'pass_rate': round_score(passed * 100 / count) if count else None,
+        'grades': grades,
+        'top': top,
+    }
+
+
+def _summarize_python(schedules, scores, grades, top):
+    stats, start = [], 0
+    for _, _, subject, total, size in schedules:
+        rows, start = range(start, start + size), start + size
+        ranked = sorted((row for row in rows if scores[row] is not None), key=lambda row: -scores[row])
+        values = [scores[row] for row in reversed(ranked)]
+        percents = [value * 100 / total if total else math.nan for value in values]
+        distribution = {grade.name: 0 for grade in reversed(grades)}
+        for percent in percents:
+            grade = next((grade for grade in reversed(grades) if grade.min_marks <= percent), None)
+            if grade is not None and percent <= grade.max_marks:
+                distribution[grade.name] += 1
+
+        def percentile(q, values=values):
+            rank = q / 100 * (len(values) - 1)
+            low, high = math.floor(rank), math.ceil(rank)
+            return values[low] + (values[high] - values[low]) * (rank - low)
+
+        stats.append(_result(
+            len(values), len(rows) - len(values),
+            statistics.fmean(values) if values else None, statistics.pstdev(values) if values else None,
+            percentile, sum(percent >= _pass_percentage(subject) for percent in percents),
+            distribution, ranked[:top],
+        ))
+    return stats
+
+
+def _summarize_numpy(schedules, scores, grades, top):
+    size = len(schedules)
+    group = np.repeat(np.arange(size), [mark_count for *_, mark_count in schedules])
+    score = np.array([math.nan if value is None else value for value in scores], dtype=np.float64)
+    total = np.array([total or math.nan for _, _, _, total, _ in schedules], dtype=np.float64)
+    pass_percent = np.array([_pass_percentage(subject) for _, _, subject, _, _ in schedules])
+
+    appeared = ~np.isnan(score)
+    counts = np.bincount(group, weights=appeared, minlength=size).astype(np.int64)
+    absentees = np.bincount(group, minlength=size) - counts
+    filled = np.where(appeared, score, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(group, weights=filled, minlength=size) / counts
+        deviation = np.where(appeared, score - mean[group], 0.0)
+        std = np.sqrt(np.bincount(group, weights=deviation ** 2, minlength=size) / counts)
+        percent = score * 100 / total[group]
+    passed = np.bincount(group, weights=appeared & (percent >= pass_percent[group]), minlength=size)
+
+    # Grade of each mark: the highest grade whose min_marks it reaches, if within its max_marks
+    distribution = np.zeros((size, len(grades)), dtype=np.int64)
+    if grades:
+        lower = np.array([float(grade.min_marks) for grade in grades])
+        upper = np.array([float(grade.max_marks) for grade in grades])
+        graded = np.searchsorted(lower, np.where(appeared, percent, -np.inf), side='right') - 1
+        valid = appeared & (graded >= 0) & (percent <= upper[np.maximum(graded, 0)])
+        distribution = np.bincount(group[valid] * len(grades) + graded[valid],
+                                   minlength=size * len(grades)).reshape(size, len(grades))
+
+    # Sorted by group, then best score first with blanks last: each group is one contiguous run
+    order = np.lexsort((np.where(appeared, -score, np.inf), group))
+    starts = np.searchsorted(group[order], np.arange(size))
+
+    def percentile(q):
+        # Linear interpolation between closest ranks, as numpy.percentile does by default
+        rank = q / 100 * np.maximum(counts - 1, 0)
+        low, high = np.floor(rank).astype(np.int64), np.ceil(rank).astype(np.int64)
+        last = starts + np.maximum(counts, 1) - 1
+        values, upper_values = score[order[last - low]], score[order[last - high]]
+        return values + (upper_values - values) * (rank - low)
+
+    quantiles = {q: percentile(q) for q in (0, 50, 100, *PERCENTILES)}
+    stats = []
+    for position in range(size):
+        count = int(counts[position])
+        stats.append(_result(
+            count, int(absentees[position]), mean[position], std[position],
+            lambda q, position=position: quantiles[q][position], int(passed[position]),
+            {grade.name: int(distribution[position, column]) for column, grade in reversed(list(enumerate(grades)))},
+            order[starts[position]:starts[position] + min(top, count)].tolist(),
+        ))
+    return stats
@@ -0,0 +1,164 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from school_management.core.reference_cache import reference_cache
+from .serializers import ReferenceNameField
+
+# Fields whose to_representation returns database values unchanged
+_PASSTHROUGH = {
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.BooleanField.to_representation,
+    serializers.ChoiceField.to_representation,
+}
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _converter(field):
+    method = type(field).to_representation
+    if method in _PASSTHROUGH:
+        return None
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+        return str
+    return field.to_representation
+
+
+def _walk(model, attrs):
+    """Split a dotted source into (relation path, related model, terminal attribute)"""
+    path = []
+    for index, attr in enumerate(attrs):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            if index != len(attrs) - 1:
+                raise Unsupported(attr)
+            return path, model, attr
+        if not model_field.is_relation:
+            if index != len(attrs) - 1:
+                raise Unsupported(attr)
+            return path, model, attr
+        if model_field.many_to_many or not model_field.concrete:
+            raise Unsupported(attr)
+        path.append(attr)
+        model = model_field.related_model
+    return path, model, None
+
+
+def _compile(serializer, model, prefix):
+    """Return (values() paths, [emit(row, out)]) for `serializer`'s fields"""
+    paths, emitters = [], []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, ReferenceNameField):
+            key = prefix + field.fk
+            paths.append(key)
+            emitters.append(_emit_reference(name, key, field))
+            continue
+        if field.source == '*' or isinstance(field, serializers.ListSerializer):
+            raise Unsupported(name)
+
+        path, related, terminal = _walk(model, field.source_attrs)
+        guards = [prefix + '__'.join(path[:depth]) for depth in range(1, len(path) + 1)]
+        paths.extend(guards)
+
+        if isinstance(field, serializers.BaseSerializer):
+            if terminal is not None or not path:
+                raise Unsupported(name)
+            nested_paths, nested_emitters = _compile(field, related, guards[-1] + '__')
+            paths.extend(nested_paths)
+            emitters.append(_emit_nested(name, guards[-1], nested_emitters))
+        elif isinstance(field, serializers.RelatedField):
+            if terminal is not None or len(path) != 1 or getattr(field, 'pk_field', None) is not None:
+                raise Unsupported(name)
+            emitters.append(_emit_value(name, guards[0], (), None))
+        elif terminal == 'get_full_name' and hasattr(related, 'get_full_name'):
+            base = prefix + ''.join(f'{attr}__' for attr in path)
+            paths.extend([base + 'first_name', base + 'last_name'])
+            emitters.append(_emit_full_name(name, base, guards, _converter(field)))
+        elif terminal is not None:
+            try:
+                related._meta.get_field(terminal)
+            except FieldDoesNotExist:
+                raise Unsupported(name)
+            key = prefix + '__'.join(path + [terminal])
+            paths.append(key)
+            emitters.append(_emit_value(name, key, guards, _converter(field)))
+        else:
+            raise Unsupported(name)
+    return paths, emitters
+
+
+def _emit_value(name, key, guards, convert):
+    def emit(row, out):
+        # A NULL foreign key on the way makes DRF skip the field entirely
+        for guard in guards:
+            if row[guard] is None:
+                return
+        value = row[key]
+        if value is not None and convert is not None:
+            value = convert(value)
+        out[name] = value
+    return emit
+
+
+def _emit_full_name(name, base, guards, convert):
+    def emit(row, out):
+        for guard in guards:
+            if row[guard] is None:
+                return
+        value = ('%s %s' % (row[base + 'first_name'], row[base + 'last_name'])).strip()
+        out[name] = value if convert is None else convert(value)
+    return emit
+
+
+def _emit_reference(name, key, field):
+    def emit(row, out):
+        obj = reference_cache.get(field.model, row[key])
+        if obj is not None:
+            out[name] = getattr(obj, field.attr)
+    return emit
+
+
+def _emit_nested(name, key, emitters):
+    def emit(row, out):
+        if row[key] is None:
+            out[name] = None
+            return
+        nested = {}
+        for nested_emit in emitters:
+            nested_emit(row, nested)
+        out[name] = nested
+    return emit
+
+
+class RowMapper:
+    """
+    Precompiled mapping from `values()` rows to a serializer's representation.
+
+    Builds the same dicts (same keys, order and values) the serializer's
+    to_representation would for read-only output, without instantiating
+    models or walking DRF fields per row.
+    """
+
+    def __init__(self, paths, emitters):
+        self.paths = list(dict.fromkeys(paths))
+        self.emitters = emitters
+
+    def __call__(self, row):
+        out = {}
+        for emit in self.emitters:
+            emit(row, out)
+        return out
+
+
+def compile_row_mapper(serializer):
+    """RowMapper for `serializer`, or None when a field cannot be built from values()"""
+    try:
+        paths, emitters = _compile(serializer, serializer.Meta.model, '')
+    except Unsupported:
+        return None
+    return RowMapper(paths, emitters)
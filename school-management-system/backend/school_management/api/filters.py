@@ -0,0 +1,99 @@
+from django_filters import rest_framework as filters
+
+from school_management.core.models import AttendanceRecord, Complaint, Exam, FeePayment, Homework, Notification
+
+
+class UUIDInFilter(filters.BaseInFilter, filters.UUIDFilter):
+    """Comma-separated UUIDs, e.g. ?student__in=<id>,<id>"""
+
+
+class AttendanceRecordFilter(filters.FilterSet):
+    student__in = UUIDInFilter(field_name='student')
+    subject__in = UUIDInFilter(field_name='subject')
+    current_class = filters.UUIDFilter(field_name='student__current_class')
+    current_class__in = UUIDInFilter(field_name='student__current_class')
+
+    class Meta:
+        model = AttendanceRecord
+        fields = {
+            'student': ['exact'],
+            'subject': ['exact'],
+            'date': ['exact', 'gte', 'lte'],
+            'status': ['exact', 'in'],
+        }
+
+
+class FeePaymentFilter(filters.FilterSet):
+    student__in = UUIDInFilter(field_name='student')
+    current_class = filters.UUIDFilter(field_name='student__current_class')
+    current_class__in = UUIDInFilter(field_name='student__current_class')
+
+    class Meta:
+        model = FeePayment
+        fields = {
+            'student': ['exact'],
+            'status': ['exact', 'in'],
+            'payment_method': ['exact', 'in'],
+            'due_date': ['exact', 'gte', 'lte'],
+            'payment_date': ['gte', 'lte'],
+        }
+
+
+class HomeworkFilter(filters.FilterSet):
+    class_obj__in = UUIDInFilter(field_name='class_obj')
+    subject__in = UUIDInFilter(field_name='subject')
+    teacher__in = UUIDInFilter(field_name='teacher')
+
+    class Meta:
+        model = Homework
+        fields = {
+            'class_obj': ['exact'],
+            'subject': ['exact'],
+            'teacher': ['exact'],
+            'due_date': ['exact', 'gte', 'lte'],
+            'is_active': ['exact'],
+        }
+
+
+class ExamFilter(filters.FilterSet):
+    academic_year__in = UUIDInFilter(field_name='academic_year')
+
+    class Meta:
+        model = Exam
+        fields = {
+            'academic_year': ['exact'],
+            'exam_type': ['exact', 'in'],
+            'start_date': ['gte', 'lte'],
+            'end_date': ['gte', 'lte'],
+            'is_published': ['exact'],
+        }
+
+
+class ComplaintFilter(filters.FilterSet):
+    complainant__in = UUIDInFilter(field_name='complainant')
+    assigned_to__in = UUIDInFilter(field_name='assigned_to')
+
+    class Meta:
+        model = Complaint
+        fields = {
+            'status': ['exact', 'in'],
+            'complaint_type': ['exact', 'in'],
+            'priority': ['exact', 'in'],
+            'complainant': ['exact'],
+            'assigned_to': ['exact'],
+            'filed_date': ['gte', 'lt', 'lte'],
+        }
+
+
+class NotificationFilter(filters.FilterSet):
+    sender__in = UUIDInFilter(field_name='sender')
+    recipients__in = UUIDInFilter(field_name='recipients', distinct=True)
+
+    class Meta:
+        model = Notification
+        fields = {
+            'notification_type': ['exact', 'in'],
+            'sender': ['exact'],
+            'is_read': ['exact'],
+            'sent_date': ['gte', 'lt', 'lte'],
+        }
@@ -0,0 +1,108 @@
+import csv
+
+from django.db.models import FloatField, Q
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
+
+from school_management.core.grading import competition_ranks, grade_name, grade_scale, round_score
+from school_management.core.models import Class, ExamSchedule, Mark, Student, Subject
+from school_management.core.reference_cache import reference_cache
+
+
+def build_gradebook(exam, class_id):
+    """
+    Student × subject marks of `exam` for one class, as columns.
+
+    `marks[s][i]` is student i's mark in subject s (None if not entered or
+    absent; absentees are listed per subject in `absent`). Students are the
+    class's current students plus anyone with marks in its schedules, by roll
+    number. Totals count absences as zero against the total marks of every
+    subject; rank is competition ranking (1, 2, 2, 4) by total.
+    """
+    class_id = Class._meta.pk.to_python(class_id)
+    schedules = list(ExamSchedule.objects.filter(exam=exam, class_obj=class_id)
+                     .order_by('exam_date', 'start_time').values_list('pk', 'subject', 'total_marks'))
+    schedule_ids = [pk for pk, _, _ in schedules]
+    students = list(Student.objects.filter(Q(current_class=class_id) | Q(marks__exam_schedule__in=schedule_ids))
+                    .distinct().order_by('roll_number')
+                    .values_list('pk', 'roll_number', 'user__first_name', 'user__last_name'))
+
+    column = {pk: index for index, pk in enumerate(schedule_ids)}
+    row = {pk: index for index, (pk, _, _, _) in enumerate(students)}
+    marks = [[None] * len(students) for _ in schedules]
+    absent = [[] for _ in schedules]
+    entered = [False] * len(students)
+    for schedule, student, is_absent, score in (Mark.objects.filter(exam_schedule__in=schedule_ids)
+                                                .values_list('exam_schedule', 'student', 'is_absent',
+                                                             Cast('marks_obtained', FloatField()))):
+        subject, position = column[schedule], row[student]
+        entered[position] = True
+        if is_absent:
+            absent[subject].append(position)
+        else:
+            marks[subject][position] = round_score(score)
+    for positions in absent:
+        positions.sort()
+
+    max_total = sum(total for _, _, total in schedules)
+    totals = [round_score(sum(subject_marks[position] or 0 for subject_marks in marks)) if entered[position] else None
+              for position in range(len(students))]
+    percentages = [round_score(total * 100 / max_total) if total is not None and max_total else None
+                   for total in totals]
+    grades = grade_scale()
+    ranks = competition_ranks(totals)
+
+    return {
+        'exam': exam.pk,
+        'class_obj': class_id,
+        'class_name': reference_cache.name(Class, class_id),
+        'subjects': {
+            'exam_schedule': schedule_ids,
+            'subject': [subject for _, subject, _ in schedules],
+            'subject_name': [reference_cache.name(Subject, subject) for _, subject, _ in schedules],
+            'total_marks': [total for _, _, total in schedules],
+        },
+        'students': {
+            'student': [pk for pk, _, _, _ in students],
+            'roll_number': [roll for _, roll, _, _ in students],
+            'name': [f'{first} {last}'.strip() for _, _, first, last in students],
+        },
+        'marks': marks,
+        'absent': absent,
+        'max_total': max_total,
+        'total': totals,
+        'percentage': percentages,
+        'grade': [grade_name(percentage, grades) for percentage in percentages],
+        'rank': [ranks.get(total) for total in totals],
+    }
+
+
+class _Echo:
+    """File-like object whose write() returns the line, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_rows(gradebook):
+    subjects = gradebook['subjects']
+    yield ['Roll number', 'Name', *(f'{name} ({total})' for name, total in
+                                    zip(subjects['subject_name'], subjects['total_marks'])),
+           f"Total ({gradebook['max_total']})", 'Percentage', 'Grade', 'Rank']
+    absent = [set(positions) for positions in gradebook['absent']]
+    students = gradebook['students']
+    for position, (roll, name) in enumerate(zip(students['roll_number'], students['name'])):
+        cells = ['AB' if position in absent[subject] else subject_marks[position]
+                 for subject, subject_marks in enumerate(gradebook['marks'])]
+        yield [roll, name, *cells, *(gradebook[key][position] for key in ('total', 'percentage', 'grade', 'rank'))]
+
+
+def gradebook_csv_response(gradebook, filename):
+    """Stream a gradebook as CSV, one row per student; absences are written as AB"""
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(['' if cell is None else cell for cell in row]) for row in _csv_rows(gradebook)),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,83 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from school_management.api.fast_serialization import compile_row_mapper
+from school_management.api.renderers import FastJSONRenderer
+from school_management.api.serializers import AttendanceRecordSerializer
+from school_management.core.models import AcademicYear, AttendanceRecord, Class, Student, Subject, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Compare the regular serializer path with the values()/RowMapper fast path on one '
+            'page of attendance records, checking that both render the same bytes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._seed(options['rows'])
+                self._run(options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _seed(self, rows):
+        year = AcademicYear.objects.create(name='bench-year', start_date=date(2000, 1, 1), end_date=date(2000, 12, 31))
+        class_obj = Class.objects.create(name='bench-class', class_number=1, academic_year=year)
+        subject = Subject.objects.create(name='Bench Subject', code='BENCH-SUBJECT')
+        students = []
+        for i in range(40):
+            user = User.objects.create(username=f'bench-student-{i}', first_name=f'First{i}', last_name=f'Last{i}')
+            students.append(Student.objects.create(
+                user=user, roll_number=f'bench-{i}', admission_number=f'bench-{i}', admission_date=year.start_date,
+                current_class=class_obj, date_of_birth=date(1990, 1, 1), gender='F'))
+        AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(student=students[i % len(students)],
+                             date=year.start_date + timedelta(days=i // len(students)),
+                             status=('PRESENT', 'ABSENT', 'LATE', 'LEAVE')[i % 4],
+                             subject=subject if i % 3 else None, remarks='ok' if i % 5 else None)
+            for i in range(rows)
+        ])
+
+    def _run(self, rows, repeat):
+        request = Request(APIRequestFactory().get('/api/attendance/'))
+        context = {'request': request}
+        serializer = AttendanceRecordSerializer(context=context)
+        queryset = serializer.optimize_queryset(AttendanceRecord.objects.all())[:rows]
+        mapper = compile_row_mapper(serializer)
+        if mapper is None:
+            raise CommandError('AttendanceRecordSerializer is not supported by the fast path')
+
+        def regular():
+            data = AttendanceRecordSerializer(queryset.all(), many=True, context=context).data
+            return JSONRenderer().render(data)
+
+        def fast():
+            data = [mapper(row) for row in queryset.values(*mapper.paths)]
+            return FastJSONRenderer().render(data)
+
+        if regular() != fast():
+            raise CommandError('Fast path output differs from the serializer output')
+
+        timings = {}
+        for name, fn in (('serializer', regular), ('fast path', fast)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            timings[name] = (time.perf_counter() - started) / repeat
+            self.stdout.write(f'{name}: {timings[name] * 1000:.1f} ms per {rows}-row page')
+        self.stdout.write(self.style.SUCCESS(
+            f'Identical output, {timings["serializer"] / timings["fast path"]:.1f}x faster'))
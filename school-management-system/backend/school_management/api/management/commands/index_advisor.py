@@ -0,0 +1,200 @@
+import os
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand
+from django.db import connection, migrations, models
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.db.models.constants import LOOKUP_SEP
+
+from school_management.api.urls import router
+
+
+def _concrete_field(model, name):
+    """Return the local concrete field called `name`, or None"""
+    if LOOKUP_SEP in name:
+        return None
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if not getattr(field, 'concrete', False) or field.many_to_many:
+        return None
+    return field
+
+
+def existing_indexes(model):
+    """Field-name tuples of every index the database already has for `model`"""
+    opts = model._meta
+    indexes = []
+    for field in opts.local_concrete_fields:
+        if field.primary_key or field.unique or field.db_index:
+            indexes.append((field.name,))
+    for fields in opts.unique_together:
+        indexes.append(tuple(fields))
+    for fields in opts.index_together:
+        indexes.append(tuple(fields))
+    for index in opts.indexes:
+        indexes.append(tuple(name.lstrip('-') for name in index.fields))
+    for constraint in opts.constraints:
+        if isinstance(constraint, models.UniqueConstraint) and constraint.fields:
+            indexes.append(tuple(constraint.fields))
+    return indexes
+
+
+def is_leading_column(model, name):
+    return has_index_prefix(model, [name])
+
+
+def has_index_prefix(model, fields):
+    """True when an existing index starts with `fields` (sort direction ignored)"""
+    columns = tuple(name.lstrip('-') for name in fields)
+    return any(index[:len(columns)] == columns for index in existing_indexes(model))
+
+
+def declared_filters(viewset):
+    """Field names a viewset lets clients filter on"""
+    filterset_class = getattr(viewset, 'filterset_class', None)
+    if filterset_class is not None:
+        return list(dict.fromkeys(f.field_name for f in filterset_class.base_filters.values()))
+    fields = getattr(viewset, 'filterset_fields', None) or []
+    return list(fields)
+
+
+def default_ordering(viewset, model):
+    ordering = getattr(viewset, 'ordering', None) or model._meta.ordering or []
+    if isinstance(ordering, str):
+        ordering = [ordering]
+    return [o for o in ordering if _concrete_field(model, o.lstrip('-'))]
+
+
+def explain(model, name, ordering):
+    """EXPLAIN a filter on `name` using a sample value, or None without sample rows"""
+    manager = model._default_manager
+    sample = manager.exclude(**{f'{name}__isnull': True}).values_list(name, flat=True).first()
+    if sample is None:
+        return None
+    return manager.filter(**{name: sample}).order_by(*ordering).explain()
+
+
+def plan_needs_index(plan, table):
+    """True when a query plan scans the table or sorts in a temporary structure"""
+    for line in plan.splitlines():
+        line = line.strip()
+        if line.startswith('SCAN') and table in line:
+            return True
+        if 'TEMP B-TREE' in line or 'Seq Scan' in line or line.startswith('Sort'):
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = ('Cross-reference viewset filter, search and ordering fields with model indexes and '
+            'EXPLAIN plans, and propose (or write a migration for) missing composite indexes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-explain', action='store_true',
+                            help='Skip EXPLAIN and propose from declarations only')
+        parser.add_argument('--model', action='append', default=[],
+                            help='Only advise on this model (repeatable)')
+        parser.add_argument('--write-migration', action='store_true',
+                            help='Write a migration adding the proposed indexes')
+        parser.add_argument('--name', default='index_advisor', help='Migration name suffix')
+
+    def handle(self, *args, **options):
+        proposals = {}
+        only = {name.lower() for name in options['model']}
+        for prefix, viewset, basename in router.registry:
+            model = viewset.queryset.model
+            if only and model._meta.model_name not in only:
+                continue
+            table = model._meta.db_table
+            ordering = default_ordering(viewset, model)
+            proposed = proposals.setdefault(model, [])
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{prefix} ({model.__name__}, {table})'))
+
+            for name in getattr(viewset, 'search_fields', None) or []:
+                self.stdout.write(f'  search   {name}: icontains lookups cannot use a B-tree index')
+
+            for name in declared_filters(viewset):
+                if not _concrete_field(model, name):
+                    self.stdout.write(f'  filter   {name}: spans a relation, skipped')
+                    continue
+                fields = [name] + [o for o in ordering[:2] if o.lstrip('-') != name]
+                if has_index_prefix(model, fields):
+                    self.stdout.write(f'  filter   {name}: indexed')
+                    continue
+                plan = None if options['no_explain'] else explain(model, name, ordering)
+                if plan is not None and not plan_needs_index(plan, table):
+                    self.stdout.write(f'  filter   {name}: planner already avoids a scan or sort')
+                    continue
+                source = 'no sample rows' if plan is None else 'EXPLAIN shows a scan or sort'
+                state = 'unindexed'
+                if is_leading_column(model, name):
+                    state = 'indexed, but not together with the default ordering'
+                self.stdout.write(self.style.WARNING(f'  filter   {name}: {state} ({source})'))
+                proposed.append(fields)
+
+            if ordering and not has_index_prefix(model, ordering[:2]):
+                self.stdout.write(self.style.WARNING(f'  ordering {", ".join(ordering)}: unindexed default'))
+                proposed.append(ordering[:2])
+            for name in getattr(viewset, 'ordering_fields', None) or []:
+                name = name.lstrip('-')
+                if not _concrete_field(model, name) or any(o.lstrip('-') == name for o in ordering):
+                    continue
+                if not is_leading_column(model, name):
+                    self.stdout.write(self.style.WARNING(f'  ordering {name}: unindexed'))
+                    proposed.append([name])
+
+        operations = []
+        for model, proposed in proposals.items():
+            indexes = self._dedupe(model, proposed)
+            if not indexes:
+                continue
+            self.stdout.write(self.style.SUCCESS(f'\n{model.__name__}.Meta.indexes += ['))
+            for fields in indexes:
+                self.stdout.write(f'    models.Index(fields={fields!r}),')
+                index = models.Index(fields=fields)
+                index.set_name_with_model(model)
+                operations.append(migrations.AddIndex(model_name=model._meta.model_name, index=index))
+            self.stdout.write(']')
+
+        if not operations:
+            self.stdout.write(self.style.SUCCESS('No missing indexes found'))
+        elif options['write_migration']:
+            self._write_migration(operations, options['name'])
+
+    def _dedupe(self, model, proposed):
+        """Drop duplicates and proposals that are a prefix of another or of an existing index"""
+        unique = []
+        for fields in proposed:
+            if fields not in unique:
+                unique.append(fields)
+        existing = [list(index) for index in existing_indexes(model)]
+        kept = []
+        for fields in unique:
+            columns = [f.lstrip('-') for f in fields]
+            others = existing + [[f.lstrip('-') for f in o] for o in unique if o is not fields]
+            if any(len(o) > len(columns) and o[:len(columns)] == columns for o in others):
+                continue
+            kept.append(fields)
+        return kept
+
+    def _write_migration(self, operations, name):
+        app_label = 'core'
+        loader = MigrationLoader(connection, ignore_no_migrations=True)
+        leaf = loader.graph.leaf_nodes(app_label)[0]
+        number = (MigrationAutodetector.parse_number(leaf[1]) or 0) + 1
+
+        migration = type('Migration', (migrations.Migration,), {
+            'dependencies': [leaf],
+            'operations': operations,
+        })(f'{number:04d}_{name}', app_label)
+        writer = MigrationWriter(migration)
+        with open(writer.path, 'w', encoding='utf-8') as fh:
+            fh.write(writer.as_string())
+        self.stdout.write(self.style.SUCCESS(
+            f'\nWrote {os.path.relpath(writer.path)}; add the indexes above to each model\'s Meta '
+            'so makemigrations stays clean'))
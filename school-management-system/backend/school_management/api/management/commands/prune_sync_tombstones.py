@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from school_management.api.sync import tombstone_horizon
+from school_management.core.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = ('Delete sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS; clients with older '
+            'watermarks get a full snapshot instead')
+
+    def handle(self, *args, **options):
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=tombstone_horizon()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones'))
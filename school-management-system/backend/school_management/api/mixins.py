@@ -0,0 +1,248 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from school_management.core.deletion import pending_deletions, request_deletion
+from school_management.core.generations import get_generations
+from .fast_serialization import compile_row_mapper
+from .renderers import FastJSONRenderer
+from .serializers import DeletionJobSerializer
+
+
+def response_dependencies(view):
+    """
+    Models a GET response of `view` is built from besides its own:
+    `cache_dependencies` plus whatever the serializer, as pruned and expanded
+    for this request, reads (`?expand=` pulls in nested serializers' rows).
+    """
+    models = set(view.cache_dependencies)
+    serializer = view.get_serializer()
+    if hasattr(serializer, 'read_models'):
+        models |= serializer.read_models()
+    models.discard(view.queryset.model)
+    return tuple(sorted(models, key=lambda model: model._meta.label_lower))
+
+
+class CachedResponseMixin:
+    """
+    Cache list and detail responses of a ModelViewSet.
+
+    Entries are keyed on the full URL (host, path and query string) and the
+    caller's access scope, and stored with the write generations of the
+    viewset's model plus its dependencies (`cache_dependencies` and the
+    models the serializer reads, see response_dependencies). A write to any
+    of them bumps its generation, which makes every entry built from the old
+    one stale without touching the entries.
+
+    Only one worker recomputes a stale or missing entry at a time. Meanwhile
+    the others serve the stale entry (stale-while-revalidate) or, when there
+    is none, wait briefly for the recomputed one before computing it
+    themselves.
+    """
+    cache_timeout = 300
+    cache_dependencies = ()
+    cache_lock_timeout = 10
+    cache_wait_timeout = 2.0
+    cache_wait_interval = 0.05
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def get_cache_scope(self, request):
+        """What the response may vary on per user; override for per-user querysets"""
+        user = request.user
+        if not user or not user.is_authenticated:
+            return 'anonymous'
+        role = getattr(user, 'role', None)
+        return f'role:{role}' if role else f'user:{user.pk}'
+
+    def get_cache_models(self):
+        return (self.get_queryset().model,) + response_dependencies(self)
+
+    def get_cache_key(self, request):
+        raw = '|'.join([
+            request.get_host(),
+            request.path,
+            '&'.join(sorted(request.META.get('QUERY_STRING', '').split('&'))),
+            self.get_cache_scope(request),
+        ])
+        return f'response:{self.basename}:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+    def cached_response(self, request, compute, *args, **kwargs):
+        if request.method != 'GET':
+            return compute(request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        generations = get_generations(self.get_cache_models())
+        entry = cache.get(key)
+        if entry is not None and entry['generations'] == generations:
+            return self._cached(entry, 'HIT')
+
+        lock = f'{key}:lock'
+        if not cache.add(lock, 1, self.cache_lock_timeout):
+            if entry is not None:
+                return self._cached(entry, 'STALE')
+            deadline = time.monotonic() + self.cache_wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.cache_wait_interval)
+                entry = cache.get(key)
+                if entry is not None and entry['generations'] == generations:
+                    return self._cached(entry, 'HIT')
+            return compute(request, *args, **kwargs)
+
+        try:
+            response = compute(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, {'generations': generations, 'data': response.data}, self.cache_timeout)
+            response['X-Cache'] = 'MISS'
+            return response
+        finally:
+            cache.delete(lock)
+
+    def _cached(self, entry, state):
+        response = Response(entry['data'])
+        response['X-Cache'] = state
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified validators for list and detail GETs.
+
+    Validators are computed before serializing anything: `max(updated_at)` and
+    `count()` of the filtered queryset (plus the query string) for lists, and
+    the row's `id`, `updated_at` and the query string for detail. The write generations of
+    its dependencies (`cache_dependencies` and whatever `?expand=` pulls in, see
+    response_dependencies) are folded into the ETag so that renamed related
+    rows (e.g. a student's user) still change it. A matching `If-None-Match`, or
+    for detail an `If-Modified-Since`, returns 304 without serializing.
+    Lists ignore `If-Modified-Since` because deleting a row does not move
+    `max(updated_at)`, and so does detail when there are dependencies, because
+    a related row's write does not move the row's own `updated_at`.
+    """
+    cache_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        stats = queryset.aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+        etag = self._make_etag(request.META.get('QUERY_STRING', ''), stats['last_modified'], stats['count'])
+        return self._conditional(request, etag, stats['last_modified'], False, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            row = (self.filter_queryset(self.get_queryset())
+                   .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                   .values_list('pk', 'updated_at').first())
+        except (TypeError, ValueError, ValidationError):
+            row = None
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag = self._make_etag(request.META.get('QUERY_STRING', ''), *row)
+        use_last_modified = not response_dependencies(self)
+        return self._conditional(request, etag, row[1], use_last_modified, super().retrieve, *args, **kwargs)
+
+    def _make_etag(self, *parts):
+        parts += get_generations(response_dependencies(self))
+        raw = '|'.join(str(part) for part in (self.basename,) + parts)
+        return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+    def _conditional(self, request, etag, last_modified, use_last_modified, compute, *args, **kwargs):
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=timestamp if use_last_modified else None)
+        if not_modified is not None:
+            return not_modified
+        response = compute(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class SparseFieldsetsMixin:
+    """
+    Narrow list and detail querysets to what the serializer will read.
+
+    The serializer (already pruned by `?fields=` / `?expand=`) decides which
+    relations are joined with select_related and, for sparse requests, which
+    columns are loaded with only().
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            serializer = self.get_serializer()
+            if hasattr(serializer, 'optimize_queryset'):
+                queryset = serializer.optimize_queryset(queryset)
+        return queryset
+
+
+def _field_shape(serializer):
+    return tuple(
+        (name, type(field), _field_shape(field) if hasattr(field, 'fields') else None)
+        for name, field in serializer.fields.items()
+    )
+
+
+class FastListMixin:
+    """
+    Serve list GETs from `values()` rows through a precompiled RowMapper.
+
+    Mappers are compiled once per serializer class and field set (after
+    `?fields=` / `?expand=` pruning) and rendered with FastJSONRenderer. The
+    bytes match the regular serializer path; serializers with fields the
+    mapper cannot build, and non-JSON renderers such as the browsable API,
+    use the regular path.
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    _row_mappers = {}
+
+    def get_row_mapper(self):
+        serializer = self.get_serializer()
+        key = (type(serializer), _field_shape(serializer))
+        if key not in self._row_mappers:
+            self._row_mappers[key] = compile_row_mapper(serializer)
+        return self._row_mappers[key]
+
+    def list(self, request, *args, **kwargs):
+        mapper = self.get_row_mapper() if request.accepted_renderer.format == 'json' else None
+        if mapper is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*mapper.paths)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response([mapper(row) for row in page])
+        return Response([mapper(row) for row in queryset])
+
+
+class DeferredDestroyMixin:
+    """
+    DELETE through a background DeletionJob (see core.deletion) instead of one
+    in-request cascade. The row disappears from the viewset at once and the
+    response is 202 with the job, whose progress is at /api/deletion-jobs/<id>/.
+    Put it first in the bases so every other mixin sees the narrowed queryset.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().exclude(pk__in=pending_deletions(self.queryset.model))
+
+    def destroy(self, request, *args, **kwargs):
+        try:
+            job = request_deletion(self.get_object(), user=request.user if request.user.is_authenticated else None)
+        except ValidationError as exc:
+            return Response({'error': exc.messages}, status=status.HTTP_409_CONFLICT)
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
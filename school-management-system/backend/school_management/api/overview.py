@@ -0,0 +1,149 @@
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Min, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from school_management.core.generations import get_generations, get_owner_generations
+from school_management.core.models import (
+    AcademicYear, AttendanceRecord, Class, Exam, FeePayment, Grade, Homework, HomeworkSubmission, Notification,
+    Parent, Result, Student, StudentParent, Subject, User
+)
+from school_management.core.reference_cache import reference_cache
+
+# Shared rows the overview reads; a write to any of them rebuilds every cached overview. Everything else is the
+# parent's and their children's own data (see _owners), which rebuilds only the overviews showing it
+OVERVIEW_MODELS = (AcademicYear, Class, Exam, Grade, Subject)
+OVERVIEW_CACHE_TIMEOUT = 300
+
+
+def parent_overview(user):
+    """
+    Overview of every child of the parent signed in as `user`, or None if
+    `user` has no parent profile.
+
+    Built with the same nine queries however many children there are, and
+    cached per parent until one of OVERVIEW_MODELS or the parent's or a
+    child's own data is written (or the day changes, since "today's
+    attendance" does).
+    """
+    today = timezone.localdate()
+    key = f'parent-overview:{user.pk}:{today.isoformat()}'
+    shared = get_generations(OVERVIEW_MODELS)
+    entry = cache.get(key)
+    if entry is not None and entry['generations'] == shared + get_owner_generations(entry['owners']):
+        return entry['data']
+
+    parent = Parent.objects.filter(user=user).first()
+    if parent is None:
+        return None
+    links = list(StudentParent.objects.filter(parent=parent).select_related('student__user').order_by('created_at'))
+    owners = _owners(user, parent, [link.student for link in links])
+    generations = shared + get_owner_generations(owners)
+    data = _build_overview(user, parent, links, today)
+    cache.set(key, {'owners': owners, 'generations': generations, 'data': data}, OVERVIEW_CACHE_TIMEOUT)
+    return data
+
+
+def _owners(user, parent, students):
+    """The rows whose own data (core.signals.OWNERS) the overview of `parent` shows"""
+    class_ids = sorted({student.current_class_id for student in students if student.current_class_id})
+    return [
+        (User, user.pk), (Parent, parent.pk),
+        *((Student, student.pk) for student in students),
+        # Names and unread notifications
+        *((User, student.user_id) for student in students),
+        # Pending homework
+        *((Class, class_id) for class_id in class_ids),
+    ]
+
+
+def _build_overview(user, parent, links, today):
+    students = [link.student for link in links]
+    student_ids = [student.pk for student in students]
+    class_ids = {student.current_class_id for student in students if student.current_class_id}
+
+    today_status = {}
+    for student_id, record_status in (AttendanceRecord.objects
+                                      .filter(student__in=student_ids, date=today)
+                                      .order_by(F('subject').asc(nulls_first=True))
+                                      .values_list('student', 'status')):
+        today_status.setdefault(student_id, record_status)
+
+    # Attendance over the academic year of each child's current class
+    attendance = {
+        row['student']: row for row in AttendanceRecord.objects.filter(
+            student__in=student_ids,
+            date__gte=F('student__current_class__academic_year__start_date'),
+            date__lte=F('student__current_class__academic_year__end_date'),
+        ).values('student').annotate(
+            total=Count('pk'), attended=Count('pk', filter=Q(status__in=('PRESENT', 'LATE'))),
+        ).order_by()
+    }
+
+    balance = ExpressionWrapper(F('amount_due') - F('amount_paid'), output_field=DecimalField())
+    fees = {
+        row['student']: row for row in FeePayment.objects.filter(student__in=student_ids).exclude(status='PAID')
+        .values('student').annotate(count=Count('pk'), balance_due=Sum(balance), next_due_date=Min('due_date'))
+        .order_by()
+    }
+
+    # Only published exams: results of the others are not final and must not reach parents yet
+    latest = (Result.objects.filter(student=OuterRef('student'), exam__is_published=True)
+              .order_by('-exam__start_date', '-created_at'))
+    results = {
+        result.student_id: result for result in Result.objects.filter(student__in=student_ids, exam__is_published=True)
+        .filter(pk=Subquery(latest.values('pk')[:1])).select_related('exam')
+    }
+
+    homework = list(Homework.objects.filter(class_obj__in=class_ids, is_active=True, due_date__gte=today)
+                    .order_by('due_date').values('id', 'class_obj', 'subject', 'title', 'due_date'))
+    submitted = set(HomeworkSubmission.objects
+                    .filter(student__in=student_ids, homework__in=[hw['id'] for hw in homework])
+                    .values_list('homework', 'student'))
+
+    unread = dict(Notification.objects.filter(recipients__in=[user.pk] + [s.user_id for s in students], is_read=False)
+                  .values('recipients').annotate(count=Count('pk')).order_by().values_list('recipients', 'count'))
+
+    children = []
+    for link, student in zip(links, students):
+        stats = attendance.get(student.pk)
+        fee = fees.get(student.pk)
+        result = results.get(student.pk)
+        children.append({
+            'student': {
+                'id': student.pk,
+                'name': student.user.get_full_name(),
+                'roll_number': student.roll_number,
+                'relationship': link.relationship,
+            },
+            'class': {'id': student.current_class_id, 'name': reference_cache.name(Class, student.current_class_id)}
+            if student.current_class_id else None,
+            'today_attendance': today_status.get(student.pk),
+            'attendance_percentage': round(stats['attended'] * 100 / stats['total'], 2) if stats else None,
+            'outstanding_fees': {
+                'count': fee['count'] if fee else 0,
+                'balance_due': f"{fee['balance_due'] if fee else 0:.2f}",
+                'next_due_date': fee['next_due_date'] if fee else None,
+            },
+            'latest_result': {
+                'exam': result.exam_id,
+                'exam_name': result.exam.name,
+                'percentage': f'{result.percentage:.2f}',
+                'grade_name': reference_cache.name(Grade, result.grade_id),
+                'is_passed': result.is_passed,
+                'rank': result.rank,
+            } if result else None,
+            'pending_homework': [
+                {'id': hw['id'], 'title': hw['title'], 'due_date': hw['due_date'], 'subject': hw['subject'],
+                 'subject_name': reference_cache.name(Subject, hw['subject'])}
+                for hw in homework
+                if hw['class_obj'] == student.current_class_id and (hw['id'], student.pk) not in submitted
+            ],
+            'unread_notifications': unread.get(student.user_id, 0),
+        })
+
+    return {
+        'parent': {'id': parent.pk, 'name': user.get_full_name()},
+        'date': today,
+        'unread_notifications': unread.get(user.pk, 0),
+        'children': children,
+    }
@@ -0,0 +1,11 @@
+from rest_framework.permissions import BasePermission
+
+ADMIN_ROLES = ('SUPER_ADMIN', 'ADMIN')
+
+
+class IsSchoolAdmin(BasePermission):
+    """Superusers and users with an admin role, for school-wide operations"""
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_superuser or user.role in ADMIN_ROLES))
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import DecimalField, F, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from school_management.core.models import (
+    AttendanceRecord, Certificate, FeePayment, LibraryTransaction, Result, StudentParent
+)
+from .serializers import (
+    AttendanceRecordSerializer, CertificateSerializer, FeePaymentSerializer, LibraryTransactionSerializer,
+    ParentSerializer, ResultSerializer, RouteStopSerializer, StudentSerializer, TransportRouteSerializer,
+    VehicleSerializer
+)
+
+PROFILE_SECTIONS = ('parents', 'transport', 'attendance', 'fees', 'results', 'library', 'certificates')
+RECENT_ATTENDANCE_DAYS = 30
+
+# The student row (with user, transport and fee balance joined in) plus one prefetch for each
+# other section; reference-table names come from the in-process cache
+PROFILE_QUERY_BUDGET = 7
+
+
+def profile_queryset(queryset, sections):
+    """`queryset` narrowed to load everything the requested profile sections read"""
+    queryset = queryset.select_related('user')
+    if 'transport' in sections:
+        queryset = queryset.select_related('transport__route', 'transport__route_stop', 'transport__vehicle')
+    if 'parents' in sections:
+        links = StudentParent.objects.select_related('parent__user').order_by('-is_primary_contact')
+        queryset = queryset.prefetch_related(Prefetch('parents', queryset=links))
+    if 'attendance' in sections:
+        since = timezone.localdate() - timedelta(days=RECENT_ATTENDANCE_DAYS)
+        queryset = queryset.prefetch_related(
+            Prefetch('attendance_records', queryset=AttendanceRecord.objects.filter(date__gte=since),
+                     to_attr='recent_attendance'))
+    if 'fees' in sections:
+        balances = (FeePayment.objects.filter(student=OuterRef('pk')).exclude(status='PAID')
+                    .values('student').annotate(balance=Sum(F('amount_due') - F('amount_paid'))).values('balance'))
+        queryset = queryset.annotate(
+            balance_due=Coalesce(Subquery(balances), 0, output_field=DecimalField(max_digits=12, decimal_places=2)),
+        ).prefetch_related(
+            Prefetch('fee_payments', queryset=FeePayment.objects.exclude(status='PAID'), to_attr='outstanding_fees'))
+    if 'results' in sections:
+        queryset = queryset.prefetch_related(
+            Prefetch('results', queryset=Result.objects.select_related('exam').order_by('-exam__start_date')))
+    if 'library' in sections:
+        queryset = queryset.prefetch_related(
+            Prefetch('library_transactions', queryset=LibraryTransaction.objects.select_related('book')))
+    if 'certificates' in sections:
+        queryset = queryset.prefetch_related(
+            Prefetch('certificates', queryset=Certificate.objects.order_by('-issue_date')))
+    return queryset
+
+
+def render_profile(student, sections):
+    """Profile of a student loaded through profile_queryset(), without further queries"""
+    data = {'student': StudentSerializer(student).data}
+    if 'parents' in sections:
+        data['parents'] = [
+            {**ParentSerializer(link.parent).data, 'relationship': link.relationship,
+             'is_primary_contact': link.is_primary_contact}
+            for link in student.parents.all()
+        ]
+    if 'transport' in sections:
+        try:
+            transport = student.transport
+        except ObjectDoesNotExist:
+            transport = None
+        data['transport'] = {
+            'route': TransportRouteSerializer(transport.route).data,
+            'stop': RouteStopSerializer(transport.route_stop).data if transport.route_stop else None,
+            'vehicle': VehicleSerializer(transport.vehicle).data if transport.vehicle else None,
+            'seat_number': transport.seat_number,
+            'is_active': transport.is_active,
+        } if transport else None
+    if 'attendance' in sections:
+        data['attendance'] = AttendanceRecordSerializer(student.recent_attendance, many=True).data
+    if 'fees' in sections:
+        data['fees'] = {
+            'balance_due': f'{student.balance_due:.2f}',
+            'outstanding': FeePaymentSerializer(student.outstanding_fees, many=True).data,
+        }
+    if 'results' in sections:
+        data['results'] = ResultSerializer(student.results.all(), many=True).data
+    if 'library' in sections:
+        data['library'] = LibraryTransactionSerializer(student.library_transactions.all(), many=True).data
+    if 'certificates' in sections:
+        data['certificates'] = CertificateSerializer(student.certificates.all(), many=True).data
+    return data
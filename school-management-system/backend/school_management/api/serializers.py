@@ -1,63 +1,221 @@
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.permissions import SAFE_METHODS
+from school_management.core.reference_cache import reference_cache
 from school_management.core.models import (
     User, AcademicYear, School, Class, Subject, Student, Parent, Staff,
     AttendanceRecord, FeeStructure, FeePayment, Exam, Mark, Result,
-    TransportRoute, Vehicle, Homework, Notification, LibraryBook,
-    Complaint, Certificate
+    TransportRoute, RouteStop, Vehicle, Homework, ClassDiary, TimeTable, Notification,
+    LibraryBook, LibraryTransaction, Complaint, Certificate, Grade, DeletionJob
 )
-
-
-class UserSerializer(serializers.ModelSerializer):
+from school_management.core.deletion import total_steps
+
+
+class ReferenceNameField(serializers.ReadOnlyField):
+    """
+    Label of a reference-table foreign key (e.g. `subject.name`) resolved from the
+    in-process reference cache rather than a join. Like `CharField(source='fk.name')`,
+    the key is omitted when the foreign key is empty.
+    """
+
+    def __init__(self, fk, model, attr='name', **kwargs):
+        self.fk = fk
+        self.model = model
+        self.attr = attr
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        obj = reference_cache.get(self.model, getattr(instance, f'{self.fk}_id'))
+        if obj is None:
+            raise SkipField()
+        return getattr(obj, self.attr)
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+def _plan_queryset(serializer, model, prefix, select, columns, full):
+    """Collect the joins and columns `serializer`'s fields read, relative to `model`"""
+    for field in serializer.fields.values():
+        if isinstance(field, ReferenceNameField):
+            columns.add(prefix + field.fk)
+            continue
+        if field.source == '*':
+            continue
+
+        path, current, terminal = [], model, None
+        for attr in field.source_attrs:
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                terminal = '()'  # method or property: needs the whole row
+                break
+            if not model_field.is_relation:
+                terminal = attr
+                break
+            if model_field.many_to_many or not model_field.concrete:
+                terminal = '*'  # reverse or many-to-many: cannot be joined
+                break
+            path.append(attr)
+            current = model_field.related_model
+
+        if not path:
+            if terminal not in ('()', '*'):
+                columns.add(prefix + terminal)
+            continue
+        for depth in range(1, len(path) + 1):
+            columns.add(prefix + '__'.join(path[:depth]))
+        if len(path) == 1 and terminal is None and isinstance(field, serializers.RelatedField):
+            continue  # primary key only, already on the row
+        joined = prefix + '__'.join(path)
+        select.add(joined)
+        if isinstance(field, serializers.BaseSerializer):
+            _plan_queryset(field, current, joined + '__', select, columns, full)
+        elif terminal in (None, '()', '*'):
+            full.add(joined)
+        else:
+            columns.add(f'{joined}__{terminal}')
+
+
+def _read_models(serializer, model):
+    """Models other than `model` whose rows `serializer`'s fields read: reference tables, joins, nested serializers"""
+    found = set()
+    for field in serializer.fields.values():
+        if isinstance(field, ReferenceNameField):
+            found.add(field.model)
+            continue
+        if field.source == '*':
+            continue
+        current, nested = model, isinstance(field, serializers.BaseSerializer)
+        for depth, attr in enumerate(field.source_attrs, 1):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not model_field.is_relation:
+                break
+            current = model_field.related_model
+            if depth == len(field.source_attrs) and not nested:
+                break  # primary key only, already on the row
+            found.add(current)
+        if nested:
+            found |= _read_models(getattr(field, 'child', field), current)
+    return found
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer honouring `?fields=` and `?expand=` on safe requests.
+
+    `fields` is a comma-separated whitelist of output keys; dotted names such as
+    `user_info.first_name` prune nested serializers. `expand` replaces a foreign
+    key's id with the nested serializer named in `Meta.expandable_fields`.
+    Without either parameter the output is unchanged. `optimize_queryset()`
+    narrows a queryset to the joins and columns the remaining fields read.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse = False
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        expand = _split(request.query_params.get('expand'))
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in expand:
+            if name in expandable and name in self.fields:
+                self.fields[name] = expandable[name](read_only=True)
+
+        requested = {}
+        for name in _split(request.query_params.get('fields')):
+            head, _, rest = name.partition('.')
+            requested.setdefault(head, set())
+            if rest:
+                requested[head].add(rest)
+        if not requested:
+            return
+        self.sparse = True
+        for name in list(self.fields):
+            if name not in requested and name not in expand:
+                self.fields.pop(name)
+            elif requested.get(name) and isinstance(self.fields[name], serializers.Serializer):
+                nested = self.fields[name]
+                for sub in list(nested.fields):
+                    if sub not in requested[name]:
+                        nested.fields.pop(sub)
+
+    def read_models(self):
+        """Other models the remaining fields read, `?expand=`ed serializers included: what the output depends on"""
+        return _read_models(self, self.Meta.model)
+
+    def optimize_queryset(self, queryset):
+        """select_related the joins the fields need and, for sparse requests, only() their columns"""
+        select, columns, full = set(), set(), set()
+        _plan_queryset(self, queryset.model, '', select, columns, full)
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        if self.sparse:
+            columns = {c for c in columns if not any(c.startswith(f'{path}__') for path in full)}
+            queryset = queryset.only(*sorted(columns))
+        return queryset
+
+
+class UserSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 'phone', 'is_active']
         read_only_fields = ['id']
 
 
-class AcademicYearSerializer(serializers.ModelSerializer):
+class AcademicYearSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = AcademicYear
         fields = ['id', 'name', 'start_date', 'end_date', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class SchoolSerializer(serializers.ModelSerializer):
+class SchoolSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = School
         fields = ['id', 'name', 'code', 'address', 'city', 'state', 'postal_code', 'phone', 'email', 'website']
         read_only_fields = ['id']
 
 
-class SubjectSerializer(serializers.ModelSerializer):
+class SubjectSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Subject
         fields = ['id', 'name', 'code', 'description', 'max_marks', 'pass_marks']
         read_only_fields = ['id']
 
 
-class ClassSerializer(serializers.ModelSerializer):
+class ClassSerializer(DynamicFieldsModelSerializer):
     class_teacher_name = serializers.CharField(source='class_teacher.get_full_name', read_only=True)
-    academic_year_name = serializers.CharField(source='academic_year.name', read_only=True)
+    academic_year_name = ReferenceNameField('academic_year', AcademicYear)
 
     class Meta:
         model = Class
         fields = ['id', 'name', 'class_number', 'section', 'academic_year', 'academic_year_name',
                   'class_teacher', 'class_teacher_name', 'capacity', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = {'academic_year': AcademicYearSerializer}
 
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(DynamicFieldsModelSerializer):
     user_info = UserSerializer(source='user', read_only=True)
-    class_name = serializers.CharField(source='current_class.name', read_only=True)
+    class_name = ReferenceNameField('current_class', Class)
 
     class Meta:
         model = Student
         fields = ['id', 'user', 'user_info', 'roll_number', 'admission_number', 'admission_date',
                   'current_class', 'class_name', 'date_of_birth', 'gender', 'father_name', 'mother_name']
         read_only_fields = ['id']
+        expandable_fields = {'current_class': ClassSerializer}
 
 
-class ParentSerializer(serializers.ModelSerializer):
+class ParentSerializer(DynamicFieldsModelSerializer):
     user_info = UserSerializer(source='user', read_only=True)
 
     class Meta:
@@ -66,7 +224,7 @@ class ParentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class StaffSerializer(serializers.ModelSerializer):
+class StaffSerializer(DynamicFieldsModelSerializer):
     user_info = UserSerializer(source='user', read_only=True)
 
     class Meta:
@@ -76,26 +234,28 @@ class StaffSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class AttendanceRecordSerializer(serializers.ModelSerializer):
+class AttendanceRecordSerializer(DynamicFieldsModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
-    subject_name = serializers.CharField(source='subject.name', read_only=True)
+    subject_name = ReferenceNameField('subject', Subject)
 
     class Meta:
         model = AttendanceRecord
         fields = ['id', 'student', 'student_name', 'date', 'status', 'subject', 'subject_name', 'remarks']
         read_only_fields = ['id']
+        expandable_fields = {'student': StudentSerializer, 'subject': SubjectSerializer}
 
 
-class FeeStructureSerializer(serializers.ModelSerializer):
-    class_name = serializers.CharField(source='class_obj.name', read_only=True)
+class FeeStructureSerializer(DynamicFieldsModelSerializer):
+    class_name = ReferenceNameField('class_obj', Class)
 
     class Meta:
         model = FeeStructure
         fields = ['id', 'academic_year', 'class_obj', 'class_name', 'fee_type', 'amount', 'frequency', 'due_date']
         read_only_fields = ['id']
+        expandable_fields = {'academic_year': AcademicYearSerializer, 'class_obj': ClassSerializer}
 
 
-class FeePaymentSerializer(serializers.ModelSerializer):
+class FeePaymentSerializer(DynamicFieldsModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
 
     class Meta:
@@ -103,17 +263,19 @@ class FeePaymentSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'student_name', 'amount_due', 'amount_paid', 'status',
                   'due_date', 'payment_date', 'payment_method', 'transaction_id']
         read_only_fields = ['id']
+        expandable_fields = {'student': StudentSerializer}
 
 
-class ExamSerializer(serializers.ModelSerializer):
+class ExamSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Exam
         fields = ['id', 'name', 'description', 'exam_type', 'academic_year', 'start_date',
                   'end_date', 'result_published_date', 'is_published']
         read_only_fields = ['id']
+        expandable_fields = {'academic_year': AcademicYearSerializer}
 
 
-class MarkSerializer(serializers.ModelSerializer):
+class MarkSerializer(DynamicFieldsModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     subject_name = serializers.CharField(source='exam_schedule.subject.name', read_only=True)
 
@@ -121,38 +283,48 @@ class MarkSerializer(serializers.ModelSerializer):
         model = Mark
         fields = ['id', 'exam_schedule', 'student', 'student_name', 'marks_obtained', 'is_absent', 'subject_name']
         read_only_fields = ['id']
+        expandable_fields = {'student': StudentSerializer}
 
 
-class ResultSerializer(serializers.ModelSerializer):
+class ResultSerializer(DynamicFieldsModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
-    grade_name = serializers.CharField(source='grade.name', read_only=True)
+    grade_name = ReferenceNameField('grade', Grade)
 
     class Meta:
         model = Result
         fields = ['id', 'exam', 'student', 'student_name', 'total_marks_obtained', 'total_marks',
                   'percentage', 'grade', 'grade_name', 'is_passed', 'rank']
         read_only_fields = ['id']
+        expandable_fields = {'exam': ExamSerializer, 'student': StudentSerializer}
 
 
-class TransportRouteSerializer(serializers.ModelSerializer):
+class TransportRouteSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = TransportRoute
         fields = ['id', 'route_number', 'name', 'starting_point', 'ending_point', 'distance', 'route_fee']
         read_only_fields = ['id']
 
 
-class VehicleSerializer(serializers.ModelSerializer):
-    route_name = serializers.CharField(source='route.name', read_only=True)
+class RouteStopSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = RouteStop
+        fields = ['id', 'route', 'stop_number', 'stop_name', 'location', 'pickup_time', 'dropoff_time']
+        read_only_fields = ['id']
+
+
+class VehicleSerializer(DynamicFieldsModelSerializer):
+    route_name = ReferenceNameField('route', TransportRoute)
 
     class Meta:
         model = Vehicle
         fields = ['id', 'registration_number', 'vehicle_type', 'model', 'capacity', 'route', 'route_name', 'is_active']
         read_only_fields = ['id']
+        expandable_fields = {'route': TransportRouteSerializer}
 
 
-class HomeworkSerializer(serializers.ModelSerializer):
-    subject_name = serializers.CharField(source='subject.name', read_only=True)
-    class_name = serializers.CharField(source='class_obj.name', read_only=True)
+class HomeworkSerializer(DynamicFieldsModelSerializer):
+    subject_name = ReferenceNameField('subject', Subject)
+    class_name = ReferenceNameField('class_obj', Class)
     teacher_name = serializers.CharField(source='teacher.get_full_name', read_only=True)
 
     class Meta:
@@ -160,9 +332,32 @@ class HomeworkSerializer(serializers.ModelSerializer):
         fields = ['id', 'subject', 'subject_name', 'class_obj', 'class_name', 'teacher', 'teacher_name',
                   'title', 'description', 'due_date', 'marks', 'is_active']
         read_only_fields = ['id']
+        expandable_fields = {'subject': SubjectSerializer, 'class_obj': ClassSerializer}
+
+
+class ClassDiarySerializer(DynamicFieldsModelSerializer):
+    subject_name = ReferenceNameField('subject', Subject)
+    teacher_name = serializers.CharField(source='teacher.get_full_name', read_only=True)
+
+    class Meta:
+        model = ClassDiary
+        fields = ['id', 'class_obj', 'subject', 'subject_name', 'teacher', 'teacher_name', 'date',
+                  'topics_covered', 'homework_assigned', 'remarks']
+        read_only_fields = ['id']
+
 
+class TimeTableSerializer(DynamicFieldsModelSerializer):
+    subject_name = ReferenceNameField('subject', Subject)
+    teacher_name = serializers.CharField(source='teacher.get_full_name', read_only=True)
 
-class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TimeTable
+        fields = ['id', 'class_obj', 'day_of_week', 'period_number', 'subject', 'subject_name', 'teacher',
+                  'teacher_name', 'start_time', 'end_time', 'room_number']
+        read_only_fields = ['id']
+
+
+class NotificationSerializer(DynamicFieldsModelSerializer):
     sender_name = serializers.CharField(source='sender.get_full_name', read_only=True)
 
     class Meta:
@@ -171,7 +366,7 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'sent_date']
 
 
-class LibraryBookSerializer(serializers.ModelSerializer):
+class LibraryBookSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = LibraryBook
         fields = ['id', 'title', 'isbn', 'author', 'publisher', 'category', 'total_copies',
@@ -179,7 +374,17 @@ class LibraryBookSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class ComplaintSerializer(serializers.ModelSerializer):
+class LibraryTransactionSerializer(DynamicFieldsModelSerializer):
+    book_title = serializers.CharField(source='book.title', read_only=True)
+
+    class Meta:
+        model = LibraryTransaction
+        fields = ['id', 'book', 'book_title', 'student', 'issue_date', 'due_date', 'return_date',
+                  'fine_charged', 'is_returned']
+        read_only_fields = ['id', 'issue_date']
+
+
+class ComplaintSerializer(DynamicFieldsModelSerializer):
     complainant_name = serializers.CharField(source='complainant.get_full_name', read_only=True)
 
     class Meta:
@@ -189,7 +394,7 @@ class ComplaintSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'complaint_id', 'filed_date']
 
 
-class CertificateSerializer(serializers.ModelSerializer):
+class CertificateSerializer(DynamicFieldsModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
 
     class Meta:
@@ -197,3 +402,17 @@ class CertificateSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'student_name', 'certificate_type', 'certificate_number',
                   'issue_date', 'valid_until']
         read_only_fields = ['id']
+        expandable_fields = {'student': StudentSerializer}
+
+
+class DeletionJobSerializer(DynamicFieldsModelSerializer):
+    total_steps = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DeletionJob
+        fields = ['id', 'model_label', 'object_id', 'object_repr', 'status', 'step', 'total_steps', 'deleted',
+                  'error', 'requested_by', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+    def get_total_steps(self, job):
+        return total_steps(job)
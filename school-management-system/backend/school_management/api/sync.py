@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from school_management.core.models import Class, ClassDiary, Homework, Student, TimeTable, Tombstone
+from .serializers import ClassDiarySerializer, HomeworkSerializer, StudentSerializer, TimeTableSerializer
+
+
+class SyncResource:
+    def __init__(self, model, serializer_class, class_field, by_student=False):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.class_field = class_field
+        self.by_student = by_student  # parents and students only get their own rows, not classmates'
+
+
+RESOURCES = {
+    'students': SyncResource(Student, StudentSerializer, 'current_class', by_student=True),
+    'timetable': SyncResource(TimeTable, TimeTableSerializer, 'class_obj'),
+    'homework': SyncResource(Homework, HomeworkSerializer, 'class_obj'),
+    'diary': SyncResource(ClassDiary, ClassDiarySerializer, 'class_obj'),
+}
+
+
+class SyncScope:
+    """Classes and students a user may sync; None means unrestricted"""
+
+    def __init__(self, class_ids=None, student_ids=None, user_id=None):
+        self.class_ids = class_ids
+        self.student_ids = student_ids
+        self.user_id = user_id  # whose student tombstones to send when syncing by student
+
+    @classmethod
+    def for_user(cls, user):
+        role = getattr(user, 'role', None)
+        if user.is_superuser or role in ('SUPER_ADMIN', 'ADMIN'):
+            return cls()
+        if role == 'TEACHER':
+            classes = Class.objects.filter(
+                Q(class_teacher=user) | Q(subjects__teacher=user) | Q(timetables__teacher=user))
+            return cls(class_ids=classes.values('pk'))
+        if role == 'PARENT':
+            children = Student.objects.filter(parents__parent__user=user)
+            return cls(class_ids=children.values('current_class'), student_ids=children.values('pk'), user_id=user.pk)
+        if role == 'STUDENT':
+            own = Student.objects.filter(user=user)
+            return cls(class_ids=own.values('current_class'), student_ids=own.values('pk'), user_id=user.pk)
+        return cls(class_ids=[], student_ids=[])
+
+    def rows(self, resource):
+        queryset = resource.model.objects.all()
+        if resource.by_student and self.student_ids is not None:
+            return queryset.filter(pk__in=self.student_ids)
+        if self.class_ids is not None:
+            return queryset.filter(**{f'{resource.class_field}__in': self.class_ids})
+        return queryset
+
+    def tombstones(self, resource):
+        # Scoped by what the tombstone recorded at delete time: the rows and links that put a deleted row
+        # in someone's scope are gone by then
+        queryset = Tombstone.objects.filter(model_label=resource.model._meta.label_lower)
+        if resource.by_student and self.student_ids is not None:
+            return queryset.filter(user_id=self.user_id)
+        queryset = queryset.filter(user_id__isnull=True)
+        if self.class_ids is not None:
+            return queryset.filter(class_id__in=self.class_ids)
+        return queryset
+
+
+def tombstone_horizon():
+    """Deletes older than this have been pruned; clients last synced before it must start over"""
+    return timezone.now() - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+
+
+def changes_since(resource, scope, since):
+    """
+    Rows of `resource` in `scope` created or updated after `since`, and ids of
+    rows deleted (or moved out of scope) after it. `since=None` is a cold
+    load: every row, no deletes.
+
+    The window is widened by SYNC_WATERMARK_OVERLAP so rows written by
+    transactions that committed after the previous sync read its watermark
+    are not missed; clients upsert by id, so the overlap only repeats rows.
+    """
+    rows = scope.rows(resource)
+    deleted = []
+    if since is not None:
+        since -= timedelta(seconds=getattr(settings, 'SYNC_WATERMARK_OVERLAP', 60))
+        rows = rows.filter(updated_at__gt=since)
+        deleted = [str(pk) for pk in scope.tombstones(resource).filter(deleted_at__gt=since)
+                   .values_list('object_id', flat=True)]
+    serializer = resource.serializer_class(context={})
+    rows = serializer.optimize_queryset(rows).order_by('updated_at')
+    data = resource.serializer_class(rows, many=True, context={}).data
+    if deleted:
+        # A row that left one class for another still in scope is an update, not a delete
+        live = {str(row['id']) for row in data}
+        deleted = [pk for pk in dict.fromkeys(deleted) if pk not in live]
+    return data, deleted
@@ -0,0 +1,419 @@
+from datetime import time, timedelta
+from decimal import Decimal
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from school_management.core.models import (
+    AcademicYear, AttendanceRecord, Certificate, Class, DeletionJob, Exam, ExamSchedule, FeePayment, FeeStructure,
+    Grade, LibraryBook, LibraryTransaction, Mark, Notification, Parent, Result, Student, StudentParent, Subject, User,
+)
+from school_management.core import archive, deletion
+from school_management.core.attendance_store import AttendanceMatrix
+from school_management.core.reference_cache import REFERENCE_MODELS, reference_cache
+from school_management.core.testing import clear_reference_cache, make_student
+from . import exam_analytics
+from .overview import parent_overview
+from .profile import PROFILE_QUERY_BUDGET
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        clear_reference_cache()
+        today = timezone.localdate()
+        self.year = AcademicYear.objects.create(name='Current', start_date=today - timedelta(days=100),
+                                                end_date=today + timedelta(days=200))
+        self.class_obj = Class.objects.create(name='5A', class_number=5, academic_year=self.year)
+        self.admin = User.objects.create(username='admin', role='ADMIN', is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+class ConditionalGetTests(APITestCase):
+    def test_related_row_rename_changes_the_validators(self):
+        student = make_student(self.class_obj, 1)
+        url = f'/api/students/{student.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(first.json()['class_name'], '5A')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_obj.name = 'Six'
+            self.class_obj.save()
+        validators = {'HTTP_IF_NONE_MATCH': first['ETag'], 'HTTP_IF_MODIFIED_SINCE': first['Last-Modified']}
+        for header, value in validators.items():
+            response = self.client.get(url, **{header: value})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['class_name'], 'Six')
+            self.assertNotEqual(response['ETag'], first['ETag'])
+
+
+    def test_expanded_relations_are_dependencies(self):
+        cache.clear()
+        fee = FeeStructure.objects.create(academic_year=self.year, class_obj=self.class_obj, fee_type='Tuition',
+                                          amount=Decimal('500'), frequency='MONTHLY', due_date=self.year.start_date)
+        url = f'/api/fee-structures/{fee.pk}/?expand=academic_year'
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        exam = Exam.objects.create(name='Finals', exam_type='Final', academic_year=self.year,
+                                   start_date=self.year.start_date, end_date=self.year.start_date)
+        result = Result.objects.create(exam=exam, student=make_student(self.class_obj, 1), percentage=Decimal('80'),
+                                       total_marks_obtained=Decimal('40'), total_marks=50, is_passed=True)
+        result_url = f'/api/results/{result.pk}/?expand=exam'
+        etag = self.client.get(result_url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.year.name = 'Renamed'
+            self.year.save()
+            exam.name = 'Final exams'
+            exam.save()
+        response = self.client.get(url)
+        self.assertEqual((response['X-Cache'], response.json()['academic_year']['name']), ('MISS', 'Renamed'))
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        response = self.client.get(result_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.json()['exam']['name']), (200, 'Final exams'))
+
+
+class StudentProfileTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = make_student(self.class_obj, 1)
+        for number in range(2):
+            parent = Parent.objects.create(user=User.objects.create(username=f'parent{number}', role='PARENT'))
+            StudentParent.objects.create(student=self.student, parent=parent, relationship='Guardian',
+                                         is_primary_contact=number == 0)
+        today = timezone.localdate()
+        for days in range(3):
+            AttendanceRecord.objects.create(student=self.student, date=today - timedelta(days=days), status='PRESENT',
+                                            marked_by=self.admin)
+        fee = FeeStructure.objects.create(academic_year=self.year, class_obj=self.class_obj, fee_type='Tuition',
+                                          amount=Decimal('500'), frequency='MONTHLY', due_date=today)
+        for status in ('PENDING', 'PARTIAL', 'PAID'):
+            FeePayment.objects.create(student=self.student, fee_structure=fee, amount_due=Decimal('500'),
+                                      amount_paid=Decimal('100'), due_date=today, status=status)
+        for number in range(2):
+            exam = Exam.objects.create(name=f'Exam {number}', exam_type='Unit Test', academic_year=self.year,
+                                       start_date=today, end_date=today, is_published=True)
+            Result.objects.create(exam=exam, student=self.student, total_marks_obtained=Decimal('40'), total_marks=50,
+                                  percentage=Decimal('80'), is_passed=True)
+            book = LibraryBook.objects.create(title=f'Book {number}', author='A', publisher='P', publication_year=2020,
+                                              category='Fiction', total_copies=1, available_copies=0)
+            LibraryTransaction.objects.create(book=book, student=self.student, due_date=today)
+            Certificate.objects.create(student=self.student, certificate_type='Merit', issue_date=today,
+                                       certificate_number=f'C{number}', issued_by=self.admin)
+
+    def test_profile_stays_within_query_budget(self):
+        # Reference tables are loaded once per process and are not part of the budget
+        for model in REFERENCE_MODELS:
+            reference_cache.table(model)
+        with self.assertNumQueries(PROFILE_QUERY_BUDGET):
+            response = self.client.get(f'/api/students/{self.student.pk}/profile/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['parents']), 2)
+        self.assertEqual(len(data['attendance']), 3)
+        self.assertEqual(data['fees']['balance_due'], '800.00')
+        self.assertEqual(len(data['fees']['outstanding']), 2)
+        self.assertEqual((len(data['results']), len(data['library']), len(data['certificates'])), (2, 2, 2))
+
+    def test_sections_limit_the_queries(self):
+        for model in REFERENCE_MODELS:
+            reference_cache.table(model)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/students/{self.student.pk}/profile/', {'sections': 'parents'})
+        self.assertEqual(set(response.json()), {'student', 'parents'})
+
+
+class ParentOverviewTests(APITestCase):
+    def test_latest_result_skips_unpublished_exams(self):
+        student = make_student(self.class_obj, 1)
+        parent_user = User.objects.create(username='parent', role='PARENT')
+        StudentParent.objects.create(student=student, parent=Parent.objects.create(user=parent_user),
+                                     relationship='Mother')
+        today = timezone.localdate()
+        for days, published in ((10, True), (1, False)):
+            exam = Exam.objects.create(name=f'Exam {days}', exam_type='Unit Test', academic_year=self.year,
+                                       start_date=today - timedelta(days=days), end_date=today, is_published=published)
+            Result.objects.create(exam=exam, student=student, total_marks_obtained=Decimal('40'), total_marks=50,
+                                  percentage=Decimal('80'), is_passed=True)
+        self.client.force_authenticate(parent_user)
+        response = self.client.get('/api/parents/me/overview/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['children'][0]['latest_result']['exam_name'], 'Exam 10')
+
+    def test_writes_rebuild_only_the_overviews_showing_them(self):
+        cache.clear()
+        parents = []
+        for number in (1, 2):
+            user = User.objects.create(username=f'parent{number}', role='PARENT')
+            StudentParent.objects.create(student=make_student(self.class_obj, number), relationship='Mother',
+                                         parent=Parent.objects.create(user=user))
+            parents.append(user)
+        first, second = parents
+        for user in parents:
+            self.assertEqual(parent_overview(user)['children'][0]['today_attendance'], None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(student=Student.objects.get(roll_number='R2'), status='PRESENT',
+                                            date=timezone.localdate())
+        with self.assertNumQueries(0):
+            parent_overview(first)
+        self.assertEqual(parent_overview(second)['children'][0]['today_attendance'], 'PRESENT')
+
+        notification = Notification.objects.create(title='Trip', message='Friday', notification_type='GENERAL')
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.recipients.add(first)
+        self.assertEqual(parent_overview(first)['unread_notifications'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.is_read = True
+            notification.save()
+        self.assertEqual(parent_overview(first)['unread_notifications'], 0)
+        with self.assertNumQueries(0):
+            parent_overview(second)
+
+
+class SyncTombstoneTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = make_student(self.class_obj, 1)
+        self.parent_user = User.objects.create(username='parent', role='PARENT')
+        self.link = StudentParent.objects.create(student=self.student, relationship='Father',
+                                                 parent=Parent.objects.create(user=self.parent_user))
+        self.teacher = User.objects.create(username='teacher', role='TEACHER')
+        self.class_obj.class_teacher = self.teacher
+        self.class_obj.save()
+        self.since = timezone.now().isoformat()
+
+    def deleted(self, user, resource):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/sync/', {resource: self.since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['resources'][resource]['deleted']
+
+    def test_deleted_student_reaches_parent_student_and_teacher(self):
+        student_id, student_user = str(self.student.pk), self.student.user
+        self.student.delete()
+        for user in (self.parent_user, student_user, self.teacher, self.admin):
+            self.assertEqual(self.deleted(user, 'students'), [student_id])
+
+    def test_unlinked_child_leaves_parent_scope(self):
+        self.link.delete()
+        self.assertEqual(self.deleted(self.parent_user, 'students'), [str(self.student.pk)])
+        self.assertEqual(self.deleted(self.admin, 'students'), [])
+
+    def test_class_change_tombstones_old_class_only(self):
+        other = Class.objects.create(name='5B', class_number=5, academic_year=self.year)
+        self.student.current_class = other
+        self.student.save()
+        self.assertEqual(self.deleted(self.teacher, 'students'), [str(self.student.pk)])
+        # Still in scope for the admin and the parent: an update, not a delete
+        self.assertEqual(self.deleted(self.admin, 'students'), [])
+        self.assertEqual(self.deleted(self.parent_user, 'students'), [])
+
+
+class ArchivedAttendanceTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        storage = self.settings(MEDIA_ROOT=media.name)
+        storage.enable()
+        self.addCleanup(storage.disable)
+        past = self.year.start_date - timedelta(days=1)
+        self.past_year = AcademicYear.objects.create(name='Past', start_date=past - timedelta(days=300), end_date=past,
+                                                     is_active=False)
+        self.student = make_student(Class.objects.create(name='4A', class_number=4, academic_year=self.past_year), 1)
+        self.day = self.past_year.start_date
+        self.record = AttendanceRecord.objects.create(student=self.student, date=self.day, status='PRESENT',
+                                                      marked_by=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            archive.archive_year(self.past_year, ['attendance'])
+
+    def present(self):
+        return AttendanceMatrix.load(self.past_year, [self.student.pk]).stats()[0]['present']
+
+    def test_writes_to_archived_days_are_refused(self):
+        record = {'student': str(self.student.pk), 'date': str(self.day + timedelta(days=1)), 'status': 'ABSENT',
+                  'subject': None}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/attendance/', record, format='json').status_code, 409)
+            response = self.client.post('/api/attendance/bulk_mark/', {'records': [record]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertEqual(self.present(), 1)
+
+    def test_summary_counts_days_in_live_and_archived_years_alike(self):
+        subject = Subject.objects.create(name='Maths', code='MATH')
+        for subject_id, status in ((None, 'ABSENT'), (subject, 'PRESENT')):
+            AttendanceRecord.objects.create(student=self.student, date=self.year.start_date, status=status,
+                                            subject=subject_id)
+        summary = self.client.get(f'/api/students/{self.student.pk}/attendance/').json()['summary']
+        self.assertEqual((summary['total'], summary['present'], summary['absent']), (2, 1, 1))
+        self.assertEqual(summary['attendance_percentage'], 50.0)
+        self.assertEqual(summary['archived_years'], [str(self.past_year.pk)])
+
+    def test_records_cannot_be_moved_into_an_archived_year(self):
+        record = AttendanceRecord.objects.create(student=self.student, date=self.year.start_date, status='PRESENT')
+        response = self.client.patch(f'/api/attendance/{record.pk}/', {'date': self.day})
+        self.assertEqual(response.status_code, 409)
+        response = self.client.patch(f'/api/attendance/{record.pk}/', {'status': 'LATE'})
+        self.assertEqual(response.status_code, 200)
+
+
+class DeletionJobTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = make_student(self.class_obj, 1)
+        StudentParent.objects.create(student=self.student, relationship='Mother',
+                                     parent=Parent.objects.create(user=User.objects.create(username='parent')))
+        today = timezone.localdate()
+        for days in range(3):
+            AttendanceRecord.objects.create(student=self.student, date=today - timedelta(days=days), status='PRESENT',
+                                            marked_by=self.admin)
+
+    def test_delete_hides_the_student_until_the_job_runs(self):
+        response = self.client.delete(f'/api/students/{self.student.pk}/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'PENDING')
+        self.assertEqual(self.client.get(f'/api/students/{self.student.pk}/').status_code, 404)
+        self.assertTrue(Student.objects.filter(pk=self.student.pk).exists())
+        self.assertEqual(DeletionJob.objects.get().requested_by, self.admin)
+
+    def test_anonymous_delete_is_queued_without_a_requester(self):
+        response = APIClient().delete(f'/api/students/{self.student.pk}/')
+        self.assertEqual(response.status_code, 202)
+        self.assertIsNone(DeletionJob.objects.get().requested_by)
+
+    def test_failed_job_resumes_from_its_saved_step(self):
+        job = deletion.request_deletion(self.student, user=self.admin)
+        run_step, steps_run = deletion._run_step, []
+
+        def dies_on_second_step(job, step, batch_size):
+            steps_run.append(step)
+            if len(steps_run) == 2:
+                raise RuntimeError('worker killed')
+            run_step(job, step, batch_size)
+
+        with mock.patch.object(deletion, '_run_step', dies_on_second_step), self.assertLogs(deletion.logger, 'ERROR'):
+            job = deletion.run_job(job)
+        self.assertEqual((job.status, job.step), ('FAILED', 1))
+        self.assertTrue(Student.objects.filter(pk=self.student.pk).exists())
+
+        with mock.patch.object(deletion, '_run_step', side_effect=run_step) as resumed:
+            job = deletion.run_job(DeletionJob.objects.get(pk=job.pk))
+        self.assertEqual(job.status, 'COMPLETED')
+        steps = deletion.deletion_steps(Student)
+        self.assertEqual([call.args[1] for call in resumed.call_args_list], list(steps[1:]))
+        self.assertFalse(Student.objects.filter(pk=self.student.pk).exists())
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertFalse(StudentParent.objects.exists())
+        self.assertEqual((job.deleted['core.attendancerecord'], job.deleted['core.student']), (3, 1))
+
+
+class RolloverPermissionTests(APITestCase):
+    def test_only_admins_may_roll_a_year_over(self):
+        url = f'/api/academic-years/{self.year.pk}/rollover/'
+        self.assertEqual(APIClient().post(url, {'dry_run': True}).status_code, 401)
+        teacher = APIClient()
+        teacher.force_authenticate(User.objects.create(username='teacher', role='TEACHER'))
+        self.assertEqual(teacher.post(url, {'dry_run': True}).status_code, 403)
+        self.assertEqual(teacher.post(f'{url}rollback/').status_code, 403)
+        self.assertEqual(self.client.post(url, {'dry_run': True}).status_code, 200)
+
+
+
+class GradebookTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam = Exam.objects.create(name='Finals', exam_type='Final', academic_year=self.year,
+                                        start_date=self.year.start_date, end_date=self.year.start_date + timedelta(1))
+        for name, low, high in (('A', 80, 100), ('B', 50, Decimal('79.99')), ('F', 0, Decimal('49.99'))):
+            Grade.objects.create(name=name, min_marks=low, max_marks=high)
+        other_class = Class.objects.create(name='6A', class_number=6, academic_year=self.year)
+        students = [make_student(self.class_obj, number) for number in (1, 2, 3)]
+        # Moved to another class after sitting the exam; no marks yet for R5
+        students.append(make_student(other_class, 4))
+        make_student(self.class_obj, 5)
+        scores = {('Maths', 100): [80, 70, None, 90], ('English', 50): [40, 50, 30, None]}
+        for day, ((name, total), marks) in enumerate(scores.items()):
+            schedule = ExamSchedule.objects.create(exam=self.exam, class_obj=self.class_obj, total_marks=total,
+                                                   subject=Subject.objects.create(name=name, code=name),
+                                                   exam_date=self.exam.start_date + timedelta(day),
+                                                   start_time=time(9), end_time=time(12))
+            for student, score in zip(students, marks):
+                Mark.objects.create(exam_schedule=schedule, student=student, is_absent=score is None,
+                                    marks_obtained=score)
+        clear_reference_cache()
+        self.url = f'/api/exams/{self.exam.pk}/gradebook/'
+
+    def test_ranks_absentees_and_students_who_left(self):
+        response = self.client.get(self.url, {'class_obj': self.class_obj.pk})
+        self.assertEqual(response.status_code, 200)
+        gradebook = response.json()
+        self.assertEqual(gradebook['subjects']['subject_name'], ['Maths', 'English'])
+        self.assertEqual(gradebook['students']['roll_number'], ['R1', 'R2', 'R3', 'R4', 'R5'])
+        self.assertEqual(gradebook['marks'], [[80.0, 70.0, None, 90.0, None], [40.0, 50.0, 30.0, None, None]])
+        self.assertEqual(gradebook['absent'], [[2], [3]])
+        self.assertEqual(gradebook['max_total'], 150)
+        self.assertEqual(gradebook['total'], [120.0, 120.0, 30.0, 90.0, None])
+        self.assertEqual(gradebook['percentage'], [80.0, 80.0, 20.0, 60.0, None])
+        self.assertEqual(gradebook['grade'], ['A', 'A', 'F', 'B', None])
+        self.assertEqual(gradebook['rank'], [1, 1, 4, 3, None])
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'class_obj': self.class_obj.pk, 'export': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="gradebook-finals-5a.csv"')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            'Roll number,Name,Maths (100),English (50),Total (150),Percentage,Grade,Rank',
+            'R1,Student 1,80.0,40.0,120.0,80.0,A,1',
+            'R2,Student 2,70.0,50.0,120.0,80.0,A,1',
+            'R3,Student 3,AB,30.0,30.0,20.0,F,4',
+            'R4,Student 4,90.0,AB,90.0,60.0,B,3',
+            'R5,Student 5,,,,,,',
+        ])
+
+    def test_class_obj_is_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'class_obj': 'nope'}).status_code, 400)
+
+class ExamAnalyticsTests(APITestCase):
+    def test_marks_are_grouped_by_their_own_schedule(self):
+        exam = Exam.objects.create(name='Finals', exam_type='Final', academic_year=self.year,
+                                   start_date=self.year.start_date, end_date=self.year.start_date)
+        students = [make_student(self.class_obj, number) for number in (1, 2, 3)]
+        scores = {'Maths': [80, 60], 'Science': [30, 40, None]}
+        for code, marks in scores.items():
+            schedule = ExamSchedule.objects.create(exam=exam, class_obj=self.class_obj, total_marks=100,
+                                                   subject=Subject.objects.create(name=code, code=code),
+                                                   exam_date=exam.start_date, start_time=time(9), end_time=time(12))
+            for student, score in zip(students, marks):
+                Mark.objects.create(exam_schedule=schedule, student=student, is_absent=score is None,
+                                    marks_obtained=score)
+        clear_reference_cache()
+
+        for numpy in (exam_analytics.np, None):
+            with self.subTest(numpy=numpy is not None), mock.patch.object(exam_analytics, 'np', numpy):
+                groups = exam_analytics.exam_analytics(exam, top=1)['groups']
+                summary = {group['subject_name']: (group['appeared'], group['absent'], group['mean'],
+                                                   group['top'][0]['marks']) for group in groups}
+                self.assertEqual(summary, {'Maths': (2, 0, 70.0, 80.0), 'Science': (2, 1, 35.0, 40.0)})
+                exam_analytics.cache.clear()
+
+    def test_class_rename_refreshes_cached_analytics(self):
+        exam = Exam.objects.create(name='Finals', exam_type='Final', academic_year=self.year,
+                                   start_date=self.year.start_date, end_date=self.year.start_date)
+        schedule = ExamSchedule.objects.create(exam=exam, class_obj=self.class_obj, total_marks=100,
+                                               subject=Subject.objects.create(name='Maths', code='MATH'),
+                                               exam_date=exam.start_date, start_time=time(9), end_time=time(12))
+        Mark.objects.create(exam_schedule=schedule, student=make_student(self.class_obj, 1), marks_obtained=50)
+        exam_analytics.cache.clear()
+        self.assertEqual(exam_analytics.exam_analytics(exam)['groups'][0]['class_name'], '5A')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_obj.name = '5 Alpha'
+            self.class_obj.save()
+        self.assertEqual(exam_analytics.exam_analytics(exam)['groups'][0]['class_name'], '5 Alpha')
@@ -6,8 +6,8 @@ from .views import (
     AttendanceRecordViewSet, FeeStructureViewSet, FeePaymentViewSet,
     ExamViewSet, MarkViewSet, ResultViewSet, TransportRouteViewSet,
     VehicleViewSet, HomeworkViewSet, NotificationViewSet,
-    LibraryBookViewSet, ComplaintViewSet, CertificateViewSet,
-    TokenAuthView
+    LibraryBookViewSet, ComplaintViewSet, CertificateViewSet, DeletionJobViewSet,
+    ArchiveView, BatchView, SyncView, TokenAuthView
 )
 
 router = DefaultRouter()
@@ -32,8 +32,12 @@ router.register(r'notifications', NotificationViewSet)
 router.register(r'library-books', LibraryBookViewSet)
 router.register(r'complaints', ComplaintViewSet)
 router.register(r'certificates', CertificateViewSet)
+router.register(r'deletion-jobs', DeletionJobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/token/', TokenAuthView.as_view(), name='token_auth'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('archive/<str:source>/', ArchiveView.as_view(), name='archive'),
 ]
@@ -1,16 +1,52 @@
+from decimal import Decimal
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.views import APIView
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import slugify
 from django_filters.rest_framework import DjangoFilterBackend
+from school_management.core.archive import ARCHIVES, ArchivedError, archived_years, check_not_archived, iter_archived
+from school_management.core.attendance_rollups import PERIODS as ROLLUP_PERIODS, summarize as summarize_rollups
+from school_management.core.attendance_store import AttendanceMatrix
+from school_management.core.documents import DOCUMENTS, class_report_cards, iter_merged_pdf, render_document
+from school_management.core import published_results
+from school_management.core.reference_cache import reference_cache
+from school_management.core.rollover import next_year_defaults, plan_rollover, rollback_rollover, start_rollover
+from school_management.core.school_calendar import calendar_for
 from school_management.core.models import (
     User, AcademicYear, School, Class, Subject, Student, Parent, Staff,
-    AttendanceRecord, FeeStructure, FeePayment, Exam, Mark, Result,
-    TransportRoute, Vehicle, Homework, Notification, LibraryBook,
-    Complaint, Certificate
+    AttendanceRecord, AttendanceDailyRollup, FeeStructure, FeePayment, Exam,
+    ExamSchedule, Mark, Result, Grade, TransportRoute, Vehicle, Homework,
+    Notification, LibraryBook, Complaint, Certificate, YearRollover, DeletionJob
+)
+from .filters import (
+    AttendanceRecordFilter, ComplaintFilter, ExamFilter, FeePaymentFilter, HomeworkFilter, NotificationFilter
+)
+from .batch import run_subrequest
+from .exam_analytics import MAX_TOP as MAX_ANALYTICS_TOP, exam_analytics
+from .gradebook import build_gradebook, gradebook_csv_response
+from .overview import parent_overview
+from .permissions import IsSchoolAdmin
+from .profile import PROFILE_SECTIONS, profile_queryset, render_profile
+from .sync import RESOURCES as SYNC_RESOURCES, SyncScope, changes_since, tombstone_horizon
+from .mixins import (
+    CachedResponseMixin, ConditionalGetMixin, DeferredDestroyMixin, FastListMixin, SparseFieldsetsMixin,
 )
 from .serializers import (
     UserSerializer, AcademicYearSerializer, SchoolSerializer, ClassSerializer,
@@ -18,11 +54,41 @@ from .serializers import (
     AttendanceRecordSerializer, FeeStructureSerializer, FeePaymentSerializer,
     ExamSerializer, MarkSerializer, ResultSerializer, TransportRouteSerializer,
     VehicleSerializer, HomeworkSerializer, NotificationSerializer,
-    LibraryBookSerializer, ComplaintSerializer, CertificateSerializer
+    LibraryBookSerializer, ComplaintSerializer, CertificateSerializer, DeletionJobSerializer
 )
 
 
-class UserViewSet(viewsets.ModelViewSet):
+def _filter_date_range(request, queryset, field):
+    """Apply ?date_from= / ?date_to= (inclusive) to `field`; None if either is not a date"""
+    bounds = {}
+    for param, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+        try:
+            bounds[f'{field}__{lookup}'] = parse_date(value)
+        except ValueError:
+            return None
+        if bounds[f'{field}__{lookup}'] is None:
+            return None
+    return queryset.filter(**bounds)
+
+
+def _rollover_data(rollover):
+    return {
+        'id': rollover.pk,
+        'from_year': rollover.from_year_id,
+        'to_year': rollover.to_year_id,
+        'to_year_name': rollover.to_year_name,
+        'status': rollover.status,
+        'completed_stages': rollover.completed_stages,
+        'classes_created': len(rollover.snapshot.get('classes', [])),
+        'students_moved': len(rollover.snapshot.get('students', {})),
+        'completed_at': rollover.completed_at,
+    }
+
+
+class UserViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -39,7 +105,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class AcademicYearViewSet(viewsets.ModelViewSet):
+class AcademicYearViewSet(DeferredDestroyMixin, ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = AcademicYear.objects.all()
     serializer_class = AcademicYearSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -49,76 +115,249 @@ class AcademicYearViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def active_year(self, request):
         """Get active academic year"""
-        active_year = AcademicYear.objects.filter(is_active=True).first()
+        active_year = reference_cache.active_year()
         if active_year:
             serializer = self.get_serializer(active_year)
             return Response(serializer.data)
         return Response({'error': 'No active academic year'}, status=status.HTTP_404_NOT_FOUND)
 
-
-class SchoolViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def calendar(self, request, pk=None):
+        """Get working-day counts of the year, or of date_from..date_to, and the position of ?date"""
+        params = request.query_params
+        dates = {key: parse_date(params[key]) if params.get(key) else None for key in ('date_from', 'date_to', 'date')}
+        if any(params.get(key) and value is None for key, value in dates.items()):
+            return Response({'error': 'date_from, date_to and date must be dates (YYYY-MM-DD)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        calendar = calendar_for(self.get_object())
+        data = {
+            'academic_year': calendar.year.pk,
+            'days_of_week': sorted(day + 1 for day in calendar.weekdays),  # TimeTable.day_of_week numbering
+            'holidays': sorted(calendar.holidays),
+            'total_working_days': calendar.total_working_days,
+            'working_days': calendar.working_days_between(dates['date_from'], dates['date_to']),
+        }
+        if dates['date']:
+            data['date'] = {
+                'date': dates['date'],
+                'is_working_day': calendar.is_working_day(dates['date']),
+                'day_index': calendar.day_index(dates['date']),
+            }
+        return Response(data)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsSchoolAdmin])
+    def rollover(self, request, pk=None):
+        """Roll the year over into the next (name, start_date, end_date, held_back), or preview it with dry_run"""
+        year = self.get_object()
+        name, start_date, end_date = next_year_defaults(year)
+        name = request.data.get('name') or name
+        try:
+            start_date = parse_date(request.data['start_date']) if request.data.get('start_date') else start_date
+            end_date = parse_date(request.data['end_date']) if request.data.get('end_date') else end_date
+        except ValueError:
+            start_date = end_date = None
+        if start_date is None or end_date is None:
+            return Response({'error': 'start_date and end_date must be dates (YYYY-MM-DD)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        held_back = request.data.get('held_back') or []
+        try:
+            if str(request.data.get('dry_run', '')).lower() in ('1', 'true'):
+                return Response(plan_rollover(year, name, start_date, end_date, held_back))
+            rollover = start_rollover(year, name, start_date, end_date, held_back, user=request.user)
+        except ValidationError as exc:
+            return Response({'error': exc.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_rollover_data(rollover), status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='rollover/rollback', permission_classes=[IsSchoolAdmin])
+    def rollback_rollover(self, request, pk=None):
+        """Undo the year's latest rollover; ?force=true also deletes rows added to the new year since"""
+        rollover = YearRollover.objects.filter(from_year=self.get_object()).exclude(status='ROLLED_BACK').first()
+        if rollover is None:
+            return Response({'error': 'This year has no rollover to roll back'}, status=status.HTTP_404_NOT_FOUND)
+        force = str(request.data.get('force', request.query_params.get('force', ''))).lower() in ('1', 'true')
+        try:
+            rollback_rollover(rollover, force=force)
+        except ValidationError as exc:
+            return Response({'error': exc.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_rollover_data(rollover))
+
+
+class SchoolViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = School.objects.all()
     serializer_class = SchoolSerializer
 
 
-class ClassViewSet(viewsets.ModelViewSet):
+class ClassViewSet(DeferredDestroyMixin, ConditionalGetMixin, CachedResponseMixin, SparseFieldsetsMixin,
+                   viewsets.ModelViewSet):
     queryset = Class.objects.all()
     serializer_class = ClassSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['academic_year', 'class_number']
     search_fields = ['name']
-
-
-class SubjectViewSet(viewsets.ModelViewSet):
+    cache_dependencies = (AcademicYear, User)
+
+    @action(detail=True, methods=['get'], url_path='report-cards')
+    def report_cards(self, request, pk=None):
+        """Stream one printable PDF of the class's report cards for ?term= (and ?academic_year=)"""
+        class_obj = self.get_object()
+        term = request.query_params.get('term')
+        if not term:
+            return Response({'error': 'term is required'}, status=status.HTTP_400_BAD_REQUEST)
+        academic_year = request.query_params.get('academic_year') or class_obj.academic_year_id
+        try:
+            cards = class_report_cards(class_obj.pk, academic_year, term)
+            if not cards.exists():
+                return Response({'error': 'No report cards for this term'}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError:
+            return Response({'error': 'academic_year must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(iter_merged_pdf('report_card', cards), content_type='application/pdf')
+        filename = slugify(f'report cards {class_obj.name} {term}')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.pdf"'
+        return response
+
+
+class SubjectViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     search_fields = ['name', 'code']
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(DeferredDestroyMixin, ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['current_class', 'gender']
     search_fields = ['roll_number', 'admission_number', 'user__first_name', 'user__last_name']
+    cache_dependencies = (User, Class)
 
     @action(detail=True, methods=['get'])
     def attendance(self, request, pk=None):
-        """Get student attendance records"""
+        """Get student attendance records, paginated, with a summary of day-level marks"""
         student = self.get_object()
-        records = student.attendance_records.all()
-        serializer = AttendanceRecordSerializer(records, many=True)
-        return Response(serializer.data)
+        records = _filter_date_range(request, student.attendance_records.all(), 'date')
+        if records is None:
+            return Response({'error': 'date_from and date_to must be dates (YYYY-MM-DD)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Days, not periods: subject-level marks would count a day once per subject, and the packed
+        # store archived years are counted from only has the day-level ones
+        counts = records.filter(subject__isnull=True).aggregate(
+            total=Count('pk'),
+            present=Count('pk', filter=Q(status='PRESENT')),
+            absent=Count('pk', filter=Q(status='ABSENT')),
+            late=Count('pk', filter=Q(status='LATE')),
+            leave=Count('pk', filter=Q(status='LEAVE')),
+        )
+        # Archived years' records are gone from the table: count their days from the packed store instead;
+        # the records themselves are served by /api/archive/attendance/
+        dates = {key: parse_date(request.query_params[key]) if request.query_params.get(key) else None
+                 for key in ('date_from', 'date_to')}
+        years = archived_years('attendance', **dates)
+        for year in years:
+            for stats in AttendanceMatrix.load(year, [student.pk]).stats(**dates):
+                for key in ('present', 'absent', 'late', 'leave'):
+                    counts[key] += stats[key]
+                counts['total'] += stats['marked_days']
+        counts['archived_years'] = [year.pk for year in years]
+        attended = counts['present'] + counts['late']
+        counts['attendance_percentage'] = round(attended * 100 / counts['total'], 2) if counts['total'] else None
+        return self._paginated_with_summary(records, AttendanceRecordSerializer, counts)
 
     @action(detail=True, methods=['get'])
     def fee_details(self, request, pk=None):
-        """Get student fee details"""
+        """Get student fee details, paginated, with a summary"""
         student = self.get_object()
-        payments = student.fee_payments.all()
-        serializer = FeePaymentSerializer(payments, many=True)
-        return Response(serializer.data)
-
+        payments = _filter_date_range(request, student.fee_payments.all(), 'due_date')
+        if payments is None:
+            return Response({'error': 'date_from and date_to must be dates (YYYY-MM-DD)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        totals = payments.aggregate(
+            count=Count('pk'),
+            total_due=Coalesce(Sum('amount_due'), Decimal('0')),
+            total_paid=Coalesce(Sum('amount_paid'), Decimal('0')),
+            overdue=Count('pk', filter=Q(status='OVERDUE')),
+        )
+        totals['balance_due'] = totals['total_due'] - totals['total_paid']
+        for key in ('total_due', 'total_paid', 'balance_due'):
+            totals[key] = f'{totals[key]:.2f}'
+        return self._paginated_with_summary(payments, FeePaymentSerializer, totals)
 
-class ParentViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def profile(self, request, pk=None):
+        """Get the student's full profile; ?sections= picks some of parents, transport, attendance, ..."""
+        sections = [name for name in request.query_params.get('sections', '').split(',') if name]
+        unknown = set(sections) - set(PROFILE_SECTIONS)
+        if unknown:
+            return Response({'error': f'Unknown sections: {", ".join(sorted(unknown))}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        sections = sections or PROFILE_SECTIONS
+
+        student = get_object_or_404(profile_queryset(self.get_queryset(), sections), pk=pk)
+        self.check_object_permissions(request, student)
+        return Response(render_profile(student, sections))
+
+    def _paginated_with_summary(self, queryset, serializer_class, summary):
+        context = self.get_serializer_context()
+        queryset = serializer_class(context=context).optimize_queryset(queryset)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            data = serializer_class(queryset, many=True, context=context).data
+            return Response({'summary': summary, 'results': data})
+        response = self.get_paginated_response(serializer_class(page, many=True, context=context).data)
+        response.data['summary'] = summary
+        return response
+
+
+class ParentViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Parent.objects.all()
     serializer_class = ParentSerializer
     search_fields = ['user__first_name', 'user__last_name', 'company_name']
+    cache_dependencies = (User,)
 
+    @action(detail=False, methods=['get'], url_path='me/overview', permission_classes=[IsAuthenticated])
+    def overview(self, request):
+        """Get attendance, fees, results, homework and notifications for all my children"""
+        data = parent_overview(request.user)
+        if data is None:
+            return Response({'error': 'No parent profile for this user'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
 
-class StaffViewSet(viewsets.ModelViewSet):
+
+class StaffViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Staff.objects.all()
     serializer_class = StaffSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['designation', 'department']
     search_fields = ['employee_id', 'user__first_name', 'user__last_name']
+    cache_dependencies = (User,)
 
 
-class AttendanceRecordViewSet(viewsets.ModelViewSet):
+class AttendanceRecordViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = AttendanceRecord.objects.all()
     serializer_class = AttendanceRecordSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['student', 'date', 'status']
+    filterset_class = AttendanceRecordFilter
     ordering_fields = ['-date']
+    cache_dependencies = (Student, User, Subject)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ArchivedError):
+            return Response({'error': exc.messages}, status=status.HTTP_409_CONFLICT)
+        return super().handle_exception(exc)
+
+    # Archived years' records are out of the table; a write would recount their store and rollups without them
+    def perform_create(self, serializer):
+        check_not_archived('attendance', serializer.validated_data['date'])
+        serializer.save()
+
+    def perform_update(self, serializer):
+        check_not_archived('attendance', serializer.instance.date, serializer.validated_data.get('date'))
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        check_not_archived('attendance', instance.date)
+        instance.delete()
 
     @action(detail=False, methods=['post'])
     def bulk_mark(self, request):
@@ -128,24 +367,77 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
         for record in records_data:
             serializer = self.get_serializer(data=record)
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            self.perform_create(serializer)
             created_records.append(serializer.data)
         return Response(created_records, status=status.HTTP_201_CREATED)
 
-
-class FeeStructureViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """Get attendance totals per day, month or term from the daily class rollups"""
+        period = request.query_params.get('period', 'day')
+        if period not in ROLLUP_PERIODS:
+            return Response({'error': f'period must be one of {", ".join(ROLLUP_PERIODS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        rollups = _filter_date_range(request, AttendanceDailyRollup.objects.all(), 'date')
+        if rollups is None:
+            return Response({'error': 'date_from and date_to must be dates (YYYY-MM-DD)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        year = reference_cache.active_year()
+        if year and not {'date_from', 'date_to'} & set(request.query_params):
+            rollups = rollups.filter(date__range=(year.start_date, year.end_date))
+
+        try:
+            if request.query_params.get('class_obj'):
+                rollups = rollups.filter(class_obj=request.query_params['class_obj'])
+            if request.query_params.get('subject'):
+                rollups = rollups.filter(subject=request.query_params['subject'])
+            else:
+                rollups = rollups.filter(subject__isnull=True)
+            summary = summarize_rollups(rollups, period)
+        except ValidationError:
+            return Response({'error': 'class_obj and subject must be ids'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'period': period, 'results': summary})
+
+    @action(detail=False, methods=['get'], url_path='student-stats')
+    def student_stats(self, request):
+        """Get per-student attendance %, counts and absence streaks over a year from the packed store"""
+        params = request.query_params
+        dates = {key: parse_date(params[key]) if params.get(key) else None for key in ('date_from', 'date_to')}
+        if any(params.get(key) and value is None for key, value in dates.items()):
+            return Response({'error': 'date_from and date_to must be dates (YYYY-MM-DD)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            year = (reference_cache.get(AcademicYear, AcademicYear._meta.pk.to_python(params['academic_year']))
+                    if params.get('academic_year') else reference_cache.active_year())
+            students = Student.objects.filter(current_class=params['class_obj']) if params.get('class_obj') else None
+            matrix = AttendanceMatrix.load(year, students) if year else None
+        except ValidationError:
+            return Response({'error': 'academic_year and class_obj must be ids'}, status=status.HTTP_400_BAD_REQUEST)
+        if matrix is None:
+            return Response({'error': 'Academic year not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        stats = matrix.stats(**dates)
+        page = self.paginate_queryset(stats)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(stats)
+
+
+class FeeStructureViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = FeeStructure.objects.all()
     serializer_class = FeeStructureSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['academic_year', 'class_obj', 'fee_type']
+    cache_dependencies = (Class,)
 
 
-class FeePaymentViewSet(viewsets.ModelViewSet):
+class FeePaymentViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = FeePayment.objects.all()
     serializer_class = FeePaymentSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['student', 'status', 'payment_method']
+    filterset_class = FeePaymentFilter
     ordering_fields = ['-due_date']
+    cache_dependencies = (Student, User)
 
     @action(detail=False, methods=['get'])
     def overdue(self, request):
@@ -159,11 +451,11 @@ class FeePaymentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ExamViewSet(viewsets.ModelViewSet):
+class ExamViewSet(DeferredDestroyMixin, ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Exam.objects.all()
     serializer_class = ExamSerializer
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['academic_year', 'exam_type']
+    filterset_class = ExamFilter
 
     @action(detail=True, methods=['post'])
     def publish_results(self, request, pk=None):
@@ -173,12 +465,43 @@ class ExamViewSet(viewsets.ModelViewSet):
         exam.save()
         return Response({'status': 'Results published'})
 
+    @action(detail=True, methods=['get'])
+    def gradebook(self, request, pk=None):
+        """Get a class's student x subject marks with totals, grades and ranks, as columnar JSON or ?export=csv"""
+        exam = self.get_object()
+        class_id = request.query_params.get('class_obj')
+        if not class_id:
+            return Response({'error': 'class_obj is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            gradebook = build_gradebook(exam, class_id)
+        except ValidationError:
+            return Response({'error': 'class_obj must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('export') == 'csv':
+            filename = slugify(f"gradebook {exam.name} {gradebook['class_name'] or class_id}")
+            return gradebook_csv_response(gradebook, f'{filename}.csv')
+        return Response(gradebook)
 
-class MarkViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """Get per class and subject mark statistics, pass rates, grade distributions and top scorers"""
+        exam = self.get_object()
+        try:
+            top = min(int(request.query_params.get('top', 5)), MAX_ANALYTICS_TOP)
+        except ValueError:
+            return Response({'error': 'top must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            data = exam_analytics(exam, request.query_params.get('class_obj') or None, max(top, 0))
+        except ValidationError:
+            return Response({'error': 'class_obj must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+
+class MarkViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Mark.objects.all()
     serializer_class = MarkSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['exam_schedule', 'student']
+    cache_dependencies = (Student, User, ExamSchedule, Subject)
 
     @action(detail=False, methods=['post'])
     def bulk_upload(self, request):
@@ -193,41 +516,64 @@ class MarkViewSet(viewsets.ModelViewSet):
         return Response(created_marks, status=status.HTTP_201_CREATED)
 
 
-class ResultViewSet(viewsets.ModelViewSet):
+class ResultViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Result.objects.all()
     serializer_class = ResultSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['exam', 'student']
-
-
-class TransportRouteViewSet(viewsets.ModelViewSet):
+    cache_dependencies = (Student, User, Grade)
+    throttle_scope = 'results_lookup'  # only applies where ScopedRateThrottle does, i.e. lookup
+
+    @action(detail=False, methods=['get'], authentication_classes=[], permission_classes=[AllowAny],
+            throttle_classes=[ScopedRateThrottle])
+    def lookup(self, request):
+        """Look up a published result by exam, roll number and date of birth, from the pre-rendered cache"""
+        roll_number = request.query_params.get('roll_number', '').strip()
+        try:
+            exam_id = Exam._meta.pk.to_python(request.query_params.get('exam'))
+            date_of_birth = parse_date(request.query_params.get('date_of_birth', ''))
+        except (ValidationError, ValueError):
+            exam_id = date_of_birth = None
+        if exam_id is None or not roll_number or date_of_birth is None:
+            return Response({'error': 'exam, roll_number and date_of_birth (YYYY-MM-DD) are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        payload = published_results.lookup(exam_id, roll_number, date_of_birth)
+        if payload is None:
+            return Response({'error': 'No published result matches these details'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(payload)
+
+
+class TransportRouteViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = TransportRoute.objects.all()
     serializer_class = TransportRouteSerializer
     search_fields = ['route_number', 'name']
 
 
-class VehicleViewSet(viewsets.ModelViewSet):
+class VehicleViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Vehicle.objects.all()
     serializer_class = VehicleSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['vehicle_type', 'route', 'is_active']
     search_fields = ['registration_number']
+    cache_dependencies = (TransportRoute,)
 
 
-class HomeworkViewSet(viewsets.ModelViewSet):
+class HomeworkViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Homework.objects.all()
     serializer_class = HomeworkSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['class_obj', 'subject']
+    filterset_class = HomeworkFilter
     ordering_fields = ['-due_date']
+    cache_dependencies = (Subject, Class, User)
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['notification_type']
+    filterset_class = NotificationFilter
     ordering_fields = ['-sent_date']
+    cache_dependencies = (User,)
 
     @action(detail=False, methods=['get'])
     def unread(self, request):
@@ -237,7 +583,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class LibraryBookViewSet(viewsets.ModelViewSet):
+class LibraryBookViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = LibraryBook.objects.all()
     serializer_class = LibraryBookSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
@@ -245,19 +591,136 @@ class LibraryBookViewSet(viewsets.ModelViewSet):
     search_fields = ['title', 'author', 'isbn']
 
 
-class ComplaintViewSet(viewsets.ModelViewSet):
+class ComplaintViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Complaint.objects.all()
     serializer_class = ComplaintSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['status', 'complaint_type', 'priority']
+    filterset_class = ComplaintFilter
     ordering_fields = ['-filed_date']
+    cache_dependencies = (User,)
 
 
-class CertificateViewSet(viewsets.ModelViewSet):
+class CertificateViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     queryset = Certificate.objects.all()
     serializer_class = CertificateSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['certificate_type', 'student']
+    cache_dependencies = (Student, User)
+
+    @action(detail=True, methods=['get'])
+    def pdf(self, request, pk=None):
+        """Download the certificate as a PDF, rendered on first request and whenever its content changes"""
+        certificate = self.get_object()
+        name, _ = render_document('certificate', DOCUMENTS['certificate'].queryset().get(pk=certificate.pk))
+        return FileResponse(default_storage.open(name), content_type='application/pdf', as_attachment=True,
+                            filename=f'{slugify(certificate.certificate_number)}.pdf')
+
+
+class DeletionJobViewSet(ConditionalGetMixin, SparseFieldsetsMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = DeletionJob.objects.all()
+    serializer_class = DeletionJobSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status', 'model_label', 'object_id']
+    cache_dependencies = (User,)
+
+
+class SyncView(APIView):
+    """
+    Delta sync for offline clients.
+
+    Pass the watermark from the previous response per resource, e.g.
+    `?homework=<watermark>&timetable=<watermark>`; an empty value (or no
+    resource parameters at all) is a cold load. Each resource returns the rows
+    created or updated since its watermark, the ids deleted since then and the
+    watermark to send next time. `reset` is set when the watermark predates the
+    retained tombstones, in which case `updated` is a full snapshot that should
+    replace the client's copy.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        requested = [name for name in SYNC_RESOURCES if name in request.query_params] or list(SYNC_RESOURCES)
+        watermark = timezone.now()
+        horizon = tombstone_horizon()
+        scope = SyncScope.for_user(request.user)
+
+        resources = {}
+        for name in requested:
+            since = None
+            value = request.query_params.get(name)
+            if value:
+                since = parse_datetime(value.replace(' ', '+'))
+                if since is None:
+                    return Response({'error': f'{name} must be an ISO 8601 watermark'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                if timezone.is_naive(since):
+                    since = timezone.make_aware(since)
+            reset = since is not None and since < horizon
+            updated, deleted = changes_since(SYNC_RESOURCES[name], scope, None if reset else since)
+            resources[name] = {'watermark': watermark, 'reset': reset, 'updated': updated, 'deleted': deleted}
+        return Response({'server_time': watermark, 'resources': resources})
+
+
+class ArchiveView(APIView):
+    """
+    Rows of a closed academic year that were moved out of their table (see
+    core.archive), e.g. `/api/archive/attendance/?academic_year=<id>&student=<id>`.
+    Rows come back as stored, with column names, in pages. Every archive file of
+    the year is read, so this is much slower than the live endpoints.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, source):
+        if source not in ARCHIVES:
+            return Response({'error': f'source must be one of {", ".join(sorted(ARCHIVES))}'},
+                            status=status.HTTP_404_NOT_FOUND)
+        filters = {field: request.query_params[field] for field in ARCHIVES[source].filter_fields
+                   if request.query_params.get(field)}
+        try:
+            year_id = AcademicYear._meta.pk.to_python(request.query_params.get('academic_year'))
+            year = reference_cache.get(AcademicYear, year_id)
+            if year is None:
+                return Response({'error': 'academic_year must be an existing academic year'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            rows = list(iter_archived(year, source, **filters))
+        except ValidationError as exc:
+            return Response({'error': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return paginator.get_paginated_response(page)
+
+
+class BatchView(APIView):
+    """
+    Run several GET requests in one round-trip.
+
+    POST `{"requests": [{"id": "profile", "path": "/api/students/<id>/"}, ...]}`
+    (or a list of paths). Sub-requests run in-process, in order, as the caller,
+    sharing its authentication and this request's reference-data snapshot, and
+    come back as `{"responses": [{"id", "status", "body", "etag"?}, ...]}`.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items = request.data.get('requests') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'requests must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+        if len(items) > limit:
+            return Response({'error': f'At most {limit} requests per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+        responses = []
+        with reference_cache.pinned():
+            for index, item in enumerate(items):
+                if isinstance(item, str):
+                    item = {'path': item}
+                if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+                    responses.append({'id': index, 'status': status.HTTP_400_BAD_REQUEST,
+                                      'body': {'detail': 'Each request needs a path.'}})
+                    continue
+                result = run_subrequest(request, item['path'], excluded=(BatchView,))
+                responses.append({'id': item.get('id', index), **result})
+        return Response({'responses': responses})
 
 
 class TokenAuthView(APIView):
@@ -0,0 +1,184 @@
+import gzip
+import hashlib
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .attendance_store import rebuild_year as rebuild_attendance_store
+from .generations import bulk_written
+from .models import (
+    AcademicYear, ArchivedChunk, AttendanceRecord, BiometricAttendance, HomeworkSubmission, TransportAttendance,
+)
+
+
+class ArchiveSource:
+    def __init__(self, model, rows_of_year, filter_fields):
+        self.model = model
+        self.rows_of_year = rows_of_year  # year -> Q selecting that year's rows
+        self.filter_fields = filter_fields  # fields the archive can be searched by
+
+    def queryset(self, year):
+        return self.model.objects.filter(self.rows_of_year(year))
+
+    @property
+    def columns(self):
+        return [field.attname for field in self.model._meta.concrete_fields]
+
+
+def _dated(field):
+    return lambda year: Q(**{f'{field}__range': (year.start_date, year.end_date)})
+
+
+# Tables whose closed years are archived. Day-level attendance lives on in the packed store and the class
+# rollups, which are never archived. Marks stay: exam analytics, gradebooks and report cards read them directly.
+ARCHIVES = {
+    'attendance': ArchiveSource(AttendanceRecord, _dated('date'), ('student', 'date', 'status', 'subject')),
+    'homework_submissions': ArchiveSource(HomeworkSubmission, lambda year: Q(homework__class_obj__academic_year=year),
+                                          ('student', 'homework', 'status')),
+    'biometric_attendance': ArchiveSource(BiometricAttendance, _dated('date'), ('student', 'date')),
+    'transport_attendance': ArchiveSource(TransportAttendance, _dated('date'), ('student', 'date')),
+}
+
+
+def is_closed(year):
+    return not year.is_active and year.end_date < timezone.localdate()
+
+
+def _delete_rows(model, pks):
+    # Straight SQL: archiving is not a delete, so none of the delete signals (rollup and store refreshes,
+    # sync tombstones, published result refreshes) may run, and nothing references these tables
+    table, pk = connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name(model._meta.pk.column)
+    field = model._meta.pk
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {pk} IN ({", ".join(["%s"] * len(pks))})',
+                       [field.get_db_prep_value(value, connection) for value in pks])
+
+
+def _write_chunk(year, name, sequence, rows):
+    data = gzip.compress(''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows).encode())
+    file_name = f'archive/{year.pk}/{name}/{sequence:06d}.jsonl.gz'
+    if default_storage.exists(file_name):  # left behind by a run that died before recording it
+        default_storage.delete(file_name)
+    return default_storage.save(file_name, ContentFile(data)), hashlib.sha256(data).hexdigest()
+
+
+def archive_source(year, name, chunk_size=5000):
+    """
+    Move `year`'s rows of one source out of its table, chunk by chunk in
+    primary-key order. Each chunk's file is written before the transaction
+    that records it and deletes its rows, so an interrupted run loses nothing
+    and simply carries on from the next chunk. Returns the rows archived.
+    """
+    source = ARCHIVES[name]
+    queryset = source.queryset(year).order_by('pk')
+    sequence = ArchivedChunk.objects.filter(academic_year=year, source=name).count()
+    archived = 0
+    while True:
+        rows = list(queryset.values(*source.columns)[:chunk_size])
+        if not rows:
+            break
+        file_name, checksum = _write_chunk(year, name, sequence, rows)
+        with transaction.atomic():
+            ArchivedChunk.objects.create(academic_year=year, source=name, sequence=sequence, file_name=file_name,
+                                         row_count=len(rows), checksum=checksum)
+            _delete_rows(source.model, [row['id'] for row in rows])
+        sequence += 1
+        archived += len(rows)
+    if archived:
+        bulk_written(source.model)
+    return archived
+
+
+def archive_year(year, sources=None, chunk_size=5000):
+    """
+    Archive a closed year's rows of `sources` (default: all of ARCHIVES).
+    Attendance is re-encoded into the packed store first, so per-student
+    attendance keeps working from the store. Returns {source: rows archived}.
+    """
+    if not is_closed(year):
+        raise ValidationError(f'{year.name} is not closed: it must be inactive and over')
+    sources = sources or list(ARCHIVES)
+    unknown = set(sources) - set(ARCHIVES)
+    if unknown:
+        raise ValidationError(f'Unknown archive sources: {", ".join(sorted(unknown))}')
+    if 'attendance' in sources and source_count(year, 'attendance'):
+        rebuild_attendance_store(year)
+    return {name: archive_source(year, name, chunk_size) for name in sources}
+
+
+def source_count(year, name):
+    return ARCHIVES[name].queryset(year).count()
+
+
+def _read_chunk(chunk):
+    with default_storage.open(chunk.file_name, 'rb') as handle:
+        data = handle.read()
+    if hashlib.sha256(data).hexdigest() != chunk.checksum:
+        raise ValueError(f'Archive file {chunk.file_name} does not match its checksum')
+    for line in gzip.decompress(data).decode().splitlines():
+        yield json.loads(line)
+
+
+def iter_archived(year, name, **filters):
+    """
+    Archived rows of one source and year, as stored (column names, JSON
+    values), optionally only those whose `filter_fields` equal the given
+    values. Every chunk is read, so this is the slow path; rows still in
+    the table are not included.
+    """
+    source = ARCHIVES[name]
+    wanted = {}
+    for field_name, value in filters.items():
+        if field_name not in source.filter_fields:
+            raise ValidationError(f'{name} archives cannot be filtered by {field_name}')
+        field = source.model._meta.get_field(field_name)
+        target = field.target_field if field.is_relation else field
+        wanted[field.attname] = json.loads(json.dumps(target.to_python(value), cls=DjangoJSONEncoder))
+    for chunk in ArchivedChunk.objects.filter(academic_year=year, source=name):
+        for row in _read_chunk(chunk):
+            if all(row[column] == value for column, value in wanted.items()):
+                yield row
+
+
+def archive_status(year):
+    """Rows archived and rows still in the tables, per source, for `year`"""
+    archived = {}
+    for chunk_source, rows in ArchivedChunk.objects.filter(academic_year=year).values_list('source', 'row_count'):
+        archived[chunk_source] = archived.get(chunk_source, 0) + rows
+    return {name: {'archived': archived.get(name, 0), 'remaining': source_count(year, name)} for name in ARCHIVES}
+
+
+def archived_years(name, date_from=None, date_to=None):
+    """Years with rows of one source archived, optionally only those overlapping the date window"""
+    years = AcademicYear.objects.filter(archived_chunks__source=name).distinct().order_by('start_date')
+    if date_from:
+        years = years.filter(end_date__gte=date_from)
+    if date_to:
+        years = years.filter(start_date__lte=date_to)
+    return list(years)
+
+
+class ArchivedError(ValidationError):
+    """A write to a source's rows on a day of a year that has been archived"""
+
+
+def check_not_archived(name, *days):
+    """
+    Raise ArchivedError if any of `days` falls in a year whose rows of the
+    source are archived. Those rows are gone from the table, so anything
+    recounted from it (the packed attendance store, class rollups) would
+    lose them.
+    """
+    years = {year.name for day in days if day is not None for year in archived_years(name, day, day)}
+    if years:
+        raise ArchivedError(f'{", ".join(sorted(years))} has been archived: its {name} can no longer be changed')
+
+
+def closed_years():
+    return [year for year in AcademicYear.objects.filter(is_active=False).order_by('start_date') if is_closed(year)]
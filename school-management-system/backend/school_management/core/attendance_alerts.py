@@ -0,0 +1,108 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .attendance_store import AttendanceMatrix
+from .generations import bulk_written, bump_owner_generations
+from .models import Notification, Student, StudentParent, User
+from .school_calendar import calendar_for, year_for
+
+ALERTS = ('low_attendance', 'absence_streak', 'attendance_drop')
+
+# A recent window with fewer marked days than this says too little to compare
+_RECENT_MIN_MARKED = 5
+
+
+def _setting(name, default):
+    return getattr(settings, f'ATTENDANCE_ALERT_{name}', default)
+
+
+def _evaluate(matrix, day):
+    """Per-student (raised alerts, stats) from attendance up to and including `day`"""
+    threshold, min_days = _setting('THRESHOLD', 75.0), _setting('MIN_DAYS', 10)
+    recent_from = day - timedelta(days=_setting('RECENT_DAYS', 14) - 1)
+    overall = matrix.stats(date_to=day)
+    recent = matrix.stats(date_from=recent_from, date_to=day)
+    earlier = matrix.stats(date_to=recent_from - timedelta(days=1))
+
+    evaluated = []
+    for total, last, before in zip(overall, recent, earlier):
+        raised = set()
+        if total['marked_days'] >= min_days and total['attendance_percentage'] < threshold:
+            raised.add('low_attendance')
+        if total['current_absence_streak'] >= _setting('STREAK', 3):
+            raised.add('absence_streak')
+        if (last['marked_days'] >= _RECENT_MIN_MARKED and before['marked_days'] >= min_days
+                and before['attendance_percentage'] - last['attendance_percentage'] >= _setting('DROP', 25.0)):
+            raised.add('attendance_drop')
+        evaluated.append((raised, {'overall': total, 'recent': last, 'earlier': before}))
+    return evaluated
+
+
+def detect_anomalies(day=None):
+    """
+    Students whose attendance up to `day` (default today) newly raises one of
+    ALERTS, as {student_id: {'alerts': [...], 'overall', 'recent', 'earlier'}}.
+
+    The whole school is evaluated at once from the packed attendance store,
+    ignoring marks on days the school calendar is closed (holidays, days
+    without timetable slots). Alerts are edge-triggered: only those raised on
+    `day` but not the day before are reported, so a nightly run alerts once
+    per episode; rerun with a past `day` to catch up a missed night.
+    """
+    day = day or timezone.localdate()
+    year = year_for(day)
+    if year is None:
+        return {}
+    matrix = AttendanceMatrix.load(year, Student.objects.filter(user__is_active=True))
+    matrix = matrix.without_days(calendar_for(year).closed_days())
+
+    anomalies = {}
+    today, yesterday = _evaluate(matrix, day), _evaluate(matrix, day - timedelta(days=1))
+    for student_id, (raised, stats), (before, _) in zip(matrix.student_ids, today, yesterday):
+        if raised - before:
+            anomalies[student_id] = {'alerts': [alert for alert in ALERTS if alert in raised - before], **stats}
+    return anomalies
+
+
+def _message(name, anomaly):
+    overall, recent, earlier = anomaly['overall'], anomaly['recent'], anomaly['earlier']
+    sentences = {
+        'low_attendance': f"{name}'s attendance this year is {overall['attendance_percentage']:g}%, "
+                          f"below the required {_setting('THRESHOLD', 75.0):g}%.",
+        'absence_streak': f"{name} has been absent for {overall['current_absence_streak']} consecutive school days.",
+        'attendance_drop': f"{name}'s attendance over the last {_setting('RECENT_DAYS', 14)} days is "
+                           f"{recent['attendance_percentage']:g}%, down from {earlier['attendance_percentage']:g}% "
+                           f"earlier in the year.",
+    }
+    return ' '.join(sentences[alert] for alert in anomaly['alerts'])
+
+
+def notify_parents(anomalies):
+    """Queue one ATTENDANCE notification per flagged student to their linked parents; returns how many"""
+    parents = defaultdict(list)
+    for student_id, user_id in (StudentParent.objects.filter(student__in=anomalies)
+                                .values_list('student', 'parent__user')):
+        parents[student_id].append(user_id)
+    names = {
+        pk: f'{first} {last}'.strip() or username
+        for pk, first, last, username in Student.objects.filter(pk__in=parents)
+        .values_list('pk', 'user__first_name', 'user__last_name', 'user__username')
+    }
+
+    Recipient = Notification.recipients.through
+    notifications, recipients = [], []
+    for student_id, user_ids in parents.items():
+        notification = Notification(title=f'Attendance alert: {names[student_id]}', notification_type='ATTENDANCE',
+                                    message=_message(names[student_id], anomalies[student_id]))
+        notifications.append(notification)
+        recipients.extend(Recipient(notification_id=notification.pk, user_id=user_id) for user_id in user_ids)
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications)
+        Recipient.objects.bulk_create(recipients, ignore_conflicts=True)
+    bulk_written(Notification)
+    bump_owner_generations(User, [recipient.user_id for recipient in recipients])
+    return len(notifications)
@@ -0,0 +1,188 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .generations import bulk_written
+from .models import AcademicYear, AttendanceDailyRollup, AttendanceRecord, Class
+from .reference_cache import reference_cache
+from .rollover import students_moved_out
+from .utils import OnCommitBatch
+
+STATUS_FIELDS = {'PRESENT': 'present', 'ABSENT': 'absent', 'LATE': 'late', 'LEAVE': 'leave'}
+
+
+def _status_counts():
+    return {field: Count('pk', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()}
+
+
+def _year_of(class_id):
+    class_obj = reference_cache.get(Class, class_id) if class_id else None
+    return reference_cache.get(AcademicYear, class_obj.academic_year_id) if class_obj else None
+
+
+def _in_year(year, day):
+    return year is not None and year.start_date <= day <= year.end_date
+
+
+def class_on(student_id, current_class_id, day):
+    """
+    The class a student was in on `day`: their current class if its year
+    contains the day, else the class a rollover of the day's year moved them
+    out of, else None (unknown, so no rollup is touched).
+    """
+    if _in_year(_year_of(current_class_id), day):
+        return current_class_id
+    for year in reference_cache.table(AcademicYear).values():
+        if not _in_year(year, day):
+            continue
+        class_id = students_moved_out(year.pk).get(str(student_id))
+        if class_id is not None:
+            return class_id
+    return None
+
+
+def _members(class_id, year):
+    """Students attributed to the class over its year: those in it now and those a rollover moved on"""
+    moved = [student_id for student_id, moved_from in students_moved_out(year.pk).items() if moved_from == class_id]
+    return Q(student__current_class=class_id) | Q(student__in=moved)
+
+
+def refresh_rollup(class_id, day, subject_id):
+    """Recount one class, day and subject (None: day-level records) from attendance_records"""
+    year = _year_of(class_id)
+    if not _in_year(year, day):
+        return  # outside the class's year none of its students' records are the class's
+    records = AttendanceRecord.objects.filter(_members(class_id, year), date=day)
+    records = records.filter(subject=subject_id) if subject_id else records.filter(subject__isnull=True)
+    counts = records.aggregate(**_status_counts())
+    lookup = {'class_obj_id': class_id, 'date': day, 'subject_id': subject_id}
+    if not any(counts.values()):
+        AttendanceDailyRollup.objects.filter(**lookup).delete()
+        return
+    try:
+        AttendanceDailyRollup.objects.update_or_create(defaults=counts, **lookup)
+    except IntegrityError:
+        # Created concurrently by another worker; it may predate our commit, so update it
+        AttendanceDailyRollup.objects.filter(**lookup).update(**counts)
+
+
+_scheduled = OnCommitBatch(refresh_rollup)
+
+
+def schedule_rollup(class_id, day, subject_id):
+    """Refresh a rollup once the current transaction commits"""
+    if class_id is not None:
+        _scheduled.add(class_id, day, subject_id)
+
+
+def schedule_class_move(student_id, *class_ids):
+    """
+    Recount each of `class_ids` (a student's previous and new class) on every
+    day of its year the student has records, once the current transaction
+    commits. Outside rollovers there is no record of which class a student was
+    in on a given day, so their records count for their current class within
+    its year and a mid-year class change takes the earlier ones along.
+    """
+    for class_id in class_ids:
+        year = _year_of(class_id)
+        if year is None:
+            continue
+        for day, subject_id in (AttendanceRecord.objects
+                                .filter(student=student_id, date__range=(year.start_date, year.end_date))
+                                .values_list('date', 'subject').distinct().order_by()):
+            schedule_rollup(class_id, day, subject_id)
+
+
+def _rebuilt_rows(records, class_ids):
+    """(class id, grouped counts) of `records`, each attributed to the class its student was in on its date"""
+    current = records.filter(student__current_class__isnull=False,
+                             date__gte=F('student__current_class__academic_year__start_date'),
+                             date__lte=F('student__current_class__academic_year__end_date'))
+    if class_ids:
+        current = current.filter(student__current_class__in=class_ids)
+    for row in current.values('student__current_class', 'date', 'subject').annotate(**_status_counts()).order_by():
+        yield row['student__current_class'], row
+
+    # Earlier years: the classes their rollovers moved students out of (students since put back in the
+    # same class were counted above)
+    for year in AcademicYear.objects.filter(rollovers__status='COMPLETED').distinct():
+        classes = {}
+        for student_id, class_id in students_moved_out(year.pk).items():
+            classes.setdefault(class_id, []).append(student_id)
+        for class_id, students in classes.items():
+            if (class_ids and class_id not in class_ids) or reference_cache.get(Class, class_id) is None:
+                continue
+            rows = (records.filter(student__in=students, date__range=(year.start_date, year.end_date))
+                    .exclude(student__current_class=class_id)
+                    .values('date', 'subject').annotate(**_status_counts()).order_by())
+            for row in rows:
+                yield class_id, row
+
+
+def rebuild_rollups(date_from=None, date_to=None, class_ids=None, batch_size=1000):
+    """
+    Recompute rollups from attendance_records with grouped queries.
+
+    Each record is attributed to the class its student was in on its date:
+    the current class within that class's year, and for earlier years the
+    class a rollover moved the student out of, as the incremental updates
+    do. Returns the number of rollup rows written.
+    """
+    records = AttendanceRecord.objects.all()
+    rollups = AttendanceDailyRollup.objects.all()
+    if date_from:
+        records, rollups = records.filter(date__gte=date_from), rollups.filter(date__gte=date_from)
+    if date_to:
+        records, rollups = records.filter(date__lte=date_to), rollups.filter(date__lte=date_to)
+    if class_ids:
+        class_ids = {Class._meta.pk.to_python(pk) for pk in class_ids}
+        rollups = rollups.filter(class_obj__in=class_ids)
+    # Archived years' records are gone from the table; their rollups are what is left of them
+    for year in AcademicYear.objects.filter(archived_chunks__source='attendance').distinct():
+        records = records.exclude(date__range=(year.start_date, year.end_date))
+        rollups = rollups.exclude(date__range=(year.start_date, year.end_date))
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for class_id, row in _rebuilt_rows(records, class_ids):
+            batch.append(AttendanceDailyRollup(
+                class_obj_id=class_id, date=row['date'], subject_id=row['subject'],
+                **{field: row[field] for field in STATUS_FIELDS.values()},
+            ))
+            if len(batch) >= batch_size:
+                written += len(AttendanceDailyRollup.objects.bulk_create(batch))
+                batch = []
+        written += len(AttendanceDailyRollup.objects.bulk_create(batch))
+    bulk_written(AttendanceDailyRollup)
+    return written
+
+
+PERIODS = ('day', 'month', 'term')
+
+
+def summarize(rollups, period):
+    """
+    Status totals and attendance % (present + late) of `rollups` per day, per
+    month, or for the whole window ('term'), oldest first.
+    """
+    sums = {field: Sum(field) for field in STATUS_FIELDS.values()}
+    rollups = rollups.order_by()
+    if period == 'term':
+        rows = [{'period': None, **rollups.aggregate(**sums)}]
+    else:
+        key = TruncMonth('date') if period == 'month' else F('date')
+        rows = rollups.annotate(period=key).values('period').annotate(**sums).order_by('period')
+
+    summary = []
+    for row in rows:
+        counts = {field: row[field] or 0 for field in STATUS_FIELDS.values()}
+        total = sum(counts.values())
+        summary.append({
+            'period': row['period'],
+            **counts,
+            'total': total,
+            'attendance_percentage': round((counts['present'] + counts['late']) * 100 / total, 2) if total else None,
+        })
+    return summary
@@ -0,0 +1,201 @@
+import re
+
+from django.db import IntegrityError, transaction
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .generations import bulk_written
+from .models import AcademicYear, AttendanceRecord, StudentAttendanceYear
+from .reference_cache import reference_cache
+from .school_calendar import year_for
+from .utils import OnCommitBatch
+
+UNMARKED, PRESENT, ABSENT, LEAVE, LATE = range(5)
+CODES = {'PRESENT': PRESENT, 'ABSENT': ABSENT, 'LEAVE': LEAVE, 'LATE': LATE}
+
+_ABSENCE_RUNS = re.compile(bytes([ABSENT]) + b'+')
+
+
+def year_length(year):
+    return (year.end_date - year.start_date).days + 1
+
+
+def encode(year, records):
+    """Status codes for (date, status) pairs, one byte per day of `year`"""
+    codes = bytearray(year_length(year))
+    for day, status in records:
+        offset = (day - year.start_date).days
+        if 0 <= offset < len(codes):
+            codes[offset] = CODES.get(status, UNMARKED)
+    return bytes(codes)
+
+
+def refresh_student_year(student_id, year_id):
+    """Re-encode one student's year from their day-level attendance_records"""
+    year = reference_cache.get(AcademicYear, year_id)
+    if year is None:
+        return
+    records = (AttendanceRecord.objects
+               .filter(student=student_id, subject__isnull=True, date__range=(year.start_date, year.end_date))
+               .values_list('date', 'status'))
+    lookup = {'student_id': student_id, 'academic_year_id': year_id}
+    codes = encode(year, records)
+    try:
+        StudentAttendanceYear.objects.update_or_create(defaults={'codes': codes}, **lookup)
+    except IntegrityError:
+        StudentAttendanceYear.objects.filter(**lookup).update(codes=codes)
+
+
+_scheduled = OnCommitBatch(refresh_student_year)
+
+
+def schedule_refresh(student_id, day):
+    """Re-encode the student's year containing `day` once the current transaction commits"""
+    year = year_for(day)
+    if year is not None:
+        _scheduled.add(student_id, year.pk)
+
+
+def rebuild_year(year, batch_size=500):
+    """Re-encode every student's copy of `year` from one ordered scan; returns the rows written"""
+    records = (AttendanceRecord.objects
+               .filter(subject__isnull=True, date__range=(year.start_date, year.end_date))
+               .order_by('student_id', 'date').values_list('student', 'date', 'status'))
+    written = 0
+    with transaction.atomic():
+        StudentAttendanceYear.objects.filter(academic_year=year).delete()
+        batch, student_id, days = [], None, []
+        for row_student, day, status in records.iterator(chunk_size=5000):
+            if row_student != student_id:
+                if student_id is not None:
+                    batch.append(StudentAttendanceYear(student_id=student_id, academic_year=year,
+                                                       codes=encode(year, days)))
+                student_id, days = row_student, []
+            days.append((day, status))
+            if len(batch) >= batch_size:
+                written += len(StudentAttendanceYear.objects.bulk_create(batch))
+                batch = []
+        if student_id is not None:
+            batch.append(StudentAttendanceYear(student_id=student_id, academic_year=year, codes=encode(year, days)))
+        written += len(StudentAttendanceYear.objects.bulk_create(batch))
+    bulk_written(StudentAttendanceYear)
+    return written
+
+
+class AttendanceMatrix:
+    """
+    Day-level attendance of many students over one academic year.
+
+    Rows are the students' status codes, one byte per calendar day from the
+    year's start (see CODES): a 2-D uint8 array when NumPy is installed,
+    otherwise a list of bytes. A whole school's year is a few hundred bytes
+    per student, and stats() answers any date window with vectorized
+    operations (or C-level bytes.count/regex scans without NumPy).
+    """
+
+    def __init__(self, year, student_ids, rows):
+        self.year = year
+        self.student_ids = student_ids
+        self.rows = rows
+
+    @classmethod
+    def load(cls, year, students=None):
+        """Matrix for `year`, limited to the `students` queryset or ids when given"""
+        stored = StudentAttendanceYear.objects.filter(academic_year=year)
+        if students is not None:
+            stored = stored.filter(student__in=students)
+        length = year_length(year)
+        student_ids, rows = [], []
+        for student_id, codes in stored.order_by('student_id').values_list('student', 'codes'):
+            # Pad or trim rows encoded before the year's dates were edited
+            codes = bytes(codes)[:length].ljust(length, bytes([UNMARKED]))
+            student_ids.append(student_id)
+            rows.append(codes)
+        if np is not None:
+            rows = np.frombuffer(b''.join(rows), dtype=np.uint8).reshape(len(rows), length)
+        return cls(year, student_ids, rows)
+
+    def without_days(self, days):
+        """A copy with `days` (dates, e.g. holidays) cleared to unmarked for every student"""
+        offsets = sorted({(day - self.year.start_date).days for day in days} & set(range(year_length(self.year))))
+        if not offsets:
+            return self
+        if np is not None:
+            rows = self.rows.copy()
+            rows[:, offsets] = UNMARKED
+        else:
+            rows = []
+            for codes in self.rows:
+                codes = bytearray(codes)
+                for offset in offsets:
+                    codes[offset] = UNMARKED
+                rows.append(bytes(codes))
+        return AttendanceMatrix(self.year, self.student_ids, rows)
+
+    def _window(self, date_from, date_to):
+        length = year_length(self.year)
+        start = (date_from - self.year.start_date).days if date_from else 0
+        end = (date_to - self.year.start_date).days + 1 if date_to else length
+        return max(start, 0), max(min(end, length), 0)
+
+    def stats(self, date_from=None, date_to=None):
+        """
+        Per-student counts, attendance % (present + late over marked days) and
+        absence streaks for the window. Streaks count consecutive absent marks,
+        skipping unmarked days such as weekends and holidays.
+        """
+        start, end = self._window(date_from, date_to)
+        if np is not None:
+            columns = self._stats_numpy(start, end)
+        else:
+            columns = self._stats_python(start, end)
+        return [
+            {'student': student_id, **{name: values[index] for name, values in columns.items()}}
+            for index, student_id in enumerate(self.student_ids)
+        ]
+
+    def _stats_numpy(self, start, end):
+        window = self.rows[:, start:max(start, end)]
+        counts = {name.lower(): (window == code).sum(axis=1, dtype=np.int32) for name, code in CODES.items()}
+        marked = (window != UNMARKED).sum(axis=1, dtype=np.int32)
+        attended = counts['present'] + counts['late']
+        percentage = np.round(attended * 100 / np.maximum(marked, 1), 2)
+
+        absent = window == ABSENT
+        other = (window != UNMARKED) & ~absent
+        absences = np.cumsum(absent, axis=1, dtype=np.int32)
+        positions = np.arange(window.shape[1])
+        last_other = np.maximum.accumulate(np.where(other, positions, -1), axis=1)
+        before = np.take_along_axis(absences, np.maximum(last_other, 0), axis=1)
+        streaks = absences - np.where(last_other >= 0, before, 0)
+        if window.shape[1]:
+            longest, current = streaks.max(axis=1), streaks[:, -1]
+        else:
+            longest = current = np.zeros(len(self.student_ids), dtype=np.int32)
+
+        columns = {name: values.tolist() for name, values in counts.items()}
+        columns['marked_days'] = marked.tolist()
+        columns['attendance_percentage'] = [
+            value if days else None for value, days in zip(percentage.tolist(), columns['marked_days'])]
+        columns['longest_absence_streak'] = longest.tolist()
+        columns['current_absence_streak'] = current.tolist()
+        return columns
+
+    def _stats_python(self, start, end):
+        columns = {name: [] for name in ('present', 'absent', 'leave', 'late', 'marked_days', 'attendance_percentage',
+                                         'longest_absence_streak', 'current_absence_streak')}
+        for codes in self.rows:
+            marks = codes[start:end].replace(bytes([UNMARKED]), b'')
+            counts = {name.lower(): marks.count(code) for name, code in CODES.items()}
+            for name, value in counts.items():
+                columns[name].append(value)
+            columns['marked_days'].append(len(marks))
+            attended = counts['present'] + counts['late']
+            columns['attendance_percentage'].append(round(attended * 100 / len(marks), 2) if marks else None)
+            runs = [len(run) for run in _ABSENCE_RUNS.findall(marks)]
+            columns['longest_absence_streak'].append(max(runs, default=0))
+            columns['current_absence_streak'].append(len(marks) - len(marks.rstrip(bytes([ABSENT]))))
+        return columns
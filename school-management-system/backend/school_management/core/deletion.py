@@ -0,0 +1,187 @@
+import logging
+from datetime import timedelta
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from .generations import bump_generation
+from .models import AcademicYear, Class, DeletionJob, Exam, Student
+from .signals import TOMBSTONE_MODELS, write_tombstones
+
+logger = logging.getLogger(__name__)
+
+# Parents whose deletes run as background jobs instead of one in-request cascade
+DEFERRED_MODELS = (AcademicYear, Class, Exam, Student)
+
+# Jobs whose parent still exists (a failed job keeps it hidden until retried)
+UNFINISHED = ('PENDING', 'RUNNING', 'FAILED')
+
+
+class Step:
+    """Rows of `model` reached from the parent through `lookup`, to delete or (SET_NULL) detach via `field`"""
+
+    def __init__(self, model, lookup, field=None):
+        self.model = model
+        self.lookup = lookup
+        self.field = field  # None: delete the rows
+
+    def rows(self, object_id):
+        return self.model._base_manager.filter(**{self.lookup: object_id})
+
+
+def _relations(model):
+    # Every relation pointing at `model`, hidden ones included, as the delete collector sees them
+    return sorted((field for field in model._meta.get_fields(include_hidden=True)
+                   if field.auto_created and not field.concrete and (field.one_to_one or field.one_to_many)),
+                  key=lambda relation: (relation.related_model._meta.label_lower, relation.field.name))
+
+
+@lru_cache(maxsize=None)
+def deletion_steps(model):
+    """
+    What deleting one `model` row cascades to, as ordered steps: dependents
+    deepest first, so each batch deletes rows nothing else points at any more,
+    and SET_NULL references detached before the rows they point to go.
+    """
+    steps = []
+
+    def walk(parent, lookup, ancestors):
+        for relation in _relations(parent):
+            child, field = relation.related_model, relation.field
+            child_lookup = f'{field.name}__{lookup}' if lookup else field.name
+            if relation.on_delete is models.SET_NULL:
+                steps.append(Step(child, child_lookup, field.name))
+            elif relation.on_delete is models.CASCADE and child not in ancestors:
+                walk(child, child_lookup, ancestors | {child})
+                steps.append(Step(child, child_lookup))
+
+    walk(model, '', frozenset([model]))
+    return tuple(steps)
+
+
+def blockers(obj):
+    """Rows whose PROTECT or RESTRICT reference stops `obj` (or anything it cascades to) from being deleted"""
+    found = []
+    model = type(obj)
+    for step in ((Step(model, 'pk'),) + tuple(step for step in deletion_steps(model) if step.field is None)):
+        for relation in _relations(step.model):
+            if relation.on_delete in (models.PROTECT, models.RESTRICT):
+                count = relation.related_model._base_manager.filter(
+                    **{f'{relation.field.name}__{step.lookup}': obj.pk}).count()
+                if count:
+                    found.append(f'{count} {relation.related_model._meta.verbose_name_plural} still reference '
+                                 f'{step.model._meta.verbose_name_plural} being deleted')
+    return found
+
+
+def pending_deletions(model):
+    """Ids of `model` rows queued for deletion, as a subquery, so they can be hidden straight away"""
+    return DeletionJob.objects.filter(model_label=model._meta.label_lower, status__in=UNFINISHED).values('object_id')
+
+
+def request_deletion(obj, user=None):
+    """
+    Queue `obj` for deletion and hide it at once: API lists and lookups drop
+    it, and offline clients get its tombstone on their next sync. Returns the
+    job (the existing one if it is already queued, requeued if it failed).
+    Raises ValidationError if protected rows would stop the delete.
+    """
+    model = type(obj)
+    found = blockers(obj)
+    if found:
+        raise ValidationError(found)
+    try:
+        with transaction.atomic():
+            job = DeletionJob.objects.create(model_label=model._meta.label_lower, object_id=obj.pk,
+                                             object_repr=str(obj)[:255], requested_by=user)
+            if model in TOMBSTONE_MODELS:
+                write_tombstones(obj)
+            # Cached responses of the model must drop the row now, not when the job deletes it
+            transaction.on_commit(lambda: bump_generation(model))
+    except IntegrityError:
+        job = DeletionJob.objects.get(model_label=model._meta.label_lower, object_id=obj.pk, status__in=UNFINISHED)
+        if job.status == 'FAILED':
+            job.status = 'PENDING'
+            job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def _count(job, label, count):
+    if count:
+        job.deleted[label] = job.deleted.get(label, 0) + count
+
+
+def _run_step(job, step, batch_size):
+    while True:
+        pks = list(step.rows(job.object_id).order_by().values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        with transaction.atomic():
+            if step.field is None:
+                # A bounded batch of rows nothing points at any more: the collector's signals
+                # (generation bumps, sync tombstones, rollup refreshes) still run as for any delete
+                _, per_model = step.model._base_manager.filter(pk__in=pks).delete()
+                for label, count in per_model.items():
+                    _count(job, label.lower(), count)
+            else:
+                _count(job, step.model._meta.label_lower,
+                       step.model._base_manager.filter(pk__in=pks).update(**{step.field: None}))
+                transaction.on_commit(lambda: bump_generation(step.model))
+            job.save(update_fields=['deleted', 'updated_at'])
+
+
+def run_job(job, batch_size=None):
+    """
+    Work through a job's steps from where it left off, one transaction per
+    batch, then delete the parent itself. Progress is saved with every batch,
+    so an interrupted job resumes without redoing finished steps.
+    """
+    batch_size = batch_size or getattr(settings, 'DELETION_BATCH_SIZE', 1000)
+    model = apps.get_model(job.model_label)
+    steps = deletion_steps(model)
+    job.status, job.error = 'RUNNING', None
+    job.started_at = job.started_at or timezone.now()
+    job.save(update_fields=['status', 'error', 'started_at', 'updated_at'])
+    try:
+        while job.step < len(steps):
+            _run_step(job, steps[job.step], batch_size)
+            job.step += 1
+            job.save(update_fields=['step', 'updated_at'])
+        with transaction.atomic():
+            _, per_model = model._base_manager.filter(pk=job.object_id).delete()
+            for label, count in per_model.items():
+                _count(job, label.lower(), count)
+            job.status, job.finished_at = 'COMPLETED', timezone.now()
+            job.save(update_fields=['deleted', 'status', 'finished_at', 'updated_at'])
+    except Exception as exc:
+        logger.exception('Deletion job %s failed at step %s', job.pk, job.step)
+        job.refresh_from_db(fields=['step', 'deleted'])  # drop counts of the batch that rolled back
+        job.status, job.error = 'FAILED', f'{type(exc).__name__}: {exc}'
+        job.save(update_fields=['status', 'error', 'updated_at'])
+    return job
+
+
+def claim_job(retry_failed=False):
+    """
+    The next job to run, marked RUNNING: a pending one, one whose worker
+    stopped reporting progress (interrupted), or with `retry_failed` a failed one.
+    """
+    stale = timezone.now() - timedelta(minutes=getattr(settings, 'DELETION_JOB_STALE_MINUTES', 10))
+    ready = models.Q(status='PENDING') | models.Q(status='RUNNING', updated_at__lt=stale)
+    if retry_failed:
+        ready |= models.Q(status='FAILED')
+    with transaction.atomic():
+        job = DeletionJob.objects.select_for_update(skip_locked=True).filter(ready).order_by('created_at').first()
+        if job is None:
+            return None
+        job.status = 'RUNNING'
+        job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def total_steps(job):
+    return len(deletion_steps(apps.get_model(job.model_label))) + 1  # the parent's own delete is the last
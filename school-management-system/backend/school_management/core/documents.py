@@ -0,0 +1,150 @@
+import hashlib
+import json
+from functools import lru_cache
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.template.loader import get_template
+
+from .models import AcademicYear, Certificate, Class, ReportCard, School
+from .pdf import iter_pdf, layout, render_pdf
+from .reference_cache import reference_cache
+from .rollover import class_in_year, students_moved_out
+from .utils import map_in_processes
+
+# Part of every document's name: bump when the PDF layout changes to re-render everything
+LAYOUT_VERSION = 1
+
+
+class DocumentKind:
+    def __init__(self, template_name, queryset, context):
+        self.template_name = template_name
+        self.queryset = queryset  # callable, so querysets are built per use (and per worker)
+        self.context = context
+
+
+def _student(student):
+    return {
+        'name': student.user.get_full_name() or student.user.username,
+        'roll_number': student.roll_number,
+        'admission_number': student.admission_number,
+    }
+
+
+def _school():
+    school = min(reference_cache.table(School).values(), key=lambda school: school.pk, default=None)
+    return school.name if school is not None else ''
+
+
+def _report_card_context(card):
+    return {
+        'school': _school(),
+        'student': _student(card.student),
+        # The class of the card's year, which a rollover has since moved the student out of
+        'class_name': reference_cache.name(
+            Class, class_in_year(card.student_id, card.student.current_class_id, card.academic_year_id)),
+        'academic_year': card.academic_year.name,
+        'term': card.term,
+        'attendance_percentage': str(card.attendance_percentage) if card.attendance_percentage is not None else None,
+        'performance': json.loads(card.class_performance) if card.class_performance else {},
+        'teacher_comments': card.teacher_comments,
+    }
+
+
+def _certificate_context(certificate):
+    return {
+        'school': _school(),
+        'student': _student(certificate.student),
+        'class_name': reference_cache.name(Class, certificate.student.current_class_id),
+        'certificate_type': certificate.certificate_type,
+        'certificate_number': certificate.certificate_number,
+        'issue_date': certificate.issue_date.isoformat(),
+        'valid_until': certificate.valid_until.isoformat() if certificate.valid_until else None,
+        'issued_by': certificate.issued_by.get_full_name() if certificate.issued_by else None,
+        'remarks': certificate.remarks,
+    }
+
+
+DOCUMENTS = {
+    'report_card': DocumentKind(
+        'core/documents/report_card.txt',
+        lambda: ReportCard.objects.select_related('student__user', 'academic_year'),
+        _report_card_context,
+    ),
+    'certificate': DocumentKind(
+        'core/documents/certificate.txt',
+        lambda: Certificate.objects.select_related('student__user', 'issued_by'),
+        _certificate_context,
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def _compiled(template_name):
+    """The template, compiled once per process, and a digest of its source"""
+    template = get_template(template_name)
+    return template, hashlib.sha256(template.template.source.encode()).hexdigest()
+
+
+def _prepare(kind, obj):
+    """(storage name, context) of a document; the name is a hash of everything printed on it"""
+    document = DOCUMENTS[kind]
+    context = document.context(obj)
+    _, template_digest = _compiled(document.template_name)
+    payload = json.dumps([LAYOUT_VERSION, template_digest, context], sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return f'documents/{kind}/{digest[:2]}/{digest}.pdf', context
+
+
+def _markup(kind, context):
+    template, _ = _compiled(DOCUMENTS[kind].template_name)
+    return template.render(context)
+
+
+def render_document(kind, obj):
+    """
+    Storage name of `obj`'s PDF, rendering and saving it only if no document
+    with identical content exists yet. Returns (name, rendered).
+    """
+    name, context = _prepare(kind, obj)
+    if default_storage.exists(name):
+        return name, False
+    default_storage.save(name, ContentFile(render_pdf(_markup(kind, context))))
+    return name, True
+
+
+def _render_chunk(kind, pks):
+    return [(obj.pk, *render_document(kind, obj)) for obj in DOCUMENTS[kind].queryset().filter(pk__in=pks)]
+
+
+def render_documents(kind, pks, workers=1, chunk_size=200):
+    """
+    Render the PDFs of many documents of `kind`, in chunks spread over a
+    process pool when workers > 1. Returns {pk: (storage name, rendered)}.
+    """
+    pks = list(pks)
+    chunks = [(kind, pks[start:start + chunk_size]) for start in range(0, len(pks), chunk_size)]
+    rendered = map_in_processes(_render_chunk, chunks, workers)
+    return {pk: (name, created) for chunk in rendered for pk, name, created in chunk}
+
+
+def iter_merged_pdf(kind, queryset):
+    """Stream one PDF with the pages of every document in `queryset`, in its order, for printing"""
+    def pages():
+        for obj in queryset.iterator(chunk_size=200):
+            yield from layout(_markup(kind, DOCUMENTS[kind].context(obj)))
+    return iter_pdf(pages())
+
+
+def class_report_cards(class_id, academic_year, term):
+    """
+    Report cards of a class for a term, by roll number: its current
+    students', and for a past year those a rollover has since moved on.
+    """
+    class_id = Class._meta.pk.to_python(class_id)
+    moved = [student_id for student_id, moved_from in
+             students_moved_out(AcademicYear._meta.pk.to_python(academic_year)).items() if moved_from == class_id]
+    return (DOCUMENTS['report_card'].queryset()
+            .filter(Q(student__current_class=class_id) | Q(student__in=moved), academic_year=academic_year, term=term)
+            .order_by('student__roll_number'))
@@ -0,0 +1,67 @@
+import time
+
+from django.core.cache import cache
+
+
+def generation_key(model):
+    return f'generation:{model._meta.label_lower}'
+
+
+def owner_key(model, pk):
+    return f'generation:{model._meta.label_lower}:{pk}'
+
+
+def _current(keys):
+    current = cache.get_many(keys)
+    missing = [key for key in keys if key not in current]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        current.update(cache.get_many(missing))
+    return tuple(current.get(key) for key in keys)
+
+
+def get_generations(models):
+    """
+    Current write generation of each model, in order.
+
+    A generation is a counter in the shared cache that every save or delete of
+    the model bumps (see core.signals), so anything derived from a model can be
+    stored alongside the generations it was built from and invalidated in O(1)
+    by comparing them. Missing counters (first use, eviction, flush) start from
+    a fresh timestamp so they never match a previously stored value.
+    """
+    return _current([generation_key(model) for model in models])
+
+
+def get_owner_generations(owners):
+    """
+    Current generation of each (model, pk) owner's own data, in order: like
+    get_generations, but bumped only by writes to rows that belong to that
+    one row (see core.signals.OWNERS), e.g. one student's attendance.
+    """
+    return _current([owner_key(model, pk) for model, pk in owners])
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_generation(model):
+    """Invalidate everything derived from `model`; call after bulk writes that skip signals"""
+    _incr(generation_key(model))
+
+
+def bump_owner_generations(model, pks):
+    """Invalidate everything derived from the own data of the given rows of `model`"""
+    for pk in set(pks):
+        _incr(owner_key(model, pk))
+
+
+def bulk_written(*models):
+    """Bump the generations of models just written by bulk_create/update, which skip the signals that bump them"""
+    for model in models:
+        bump_generation(model)
@@ -0,0 +1,30 @@
+import math
+
+from .models import Grade
+from .reference_cache import reference_cache
+
+
+def round_score(value):
+    """A mark or percentage to two decimals; None (and NaN) stay None"""
+    return None if value is None or math.isnan(value) else round(float(value), 2)
+
+
+def grade_scale():
+    """The grading scale, highest min_marks first, as grade_name expects it"""
+    return sorted(reference_cache.table(Grade).values(), key=lambda grade: grade.min_marks, reverse=True)
+
+
+def grade_name(percentage, grades):
+    """Name of the highest grade whose min_marks `percentage` reaches, if within its max_marks"""
+    if percentage is None:
+        return None
+    grade = next((grade for grade in grades if grade.min_marks <= percentage), None)
+    return grade.name if grade is not None and percentage <= grade.max_marks else None
+
+
+def competition_ranks(scores):
+    """{score: rank} by competition ranking (1, 2, 2, 4), highest first; None is unranked"""
+    ranks = {}
+    for place, score in enumerate(sorted((score for score in scores if score is not None), reverse=True), start=1):
+        ranks.setdefault(score, place)
+    return ranks
@@ -0,0 +1,42 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from school_management.core.archive import ARCHIVES, archive_status, archive_year, closed_years
+from school_management.core.models import AcademicYear
+
+
+class Command(BaseCommand):
+    help = ("Move closed academic years' attendance, homework submissions, biometric and transport attendance "
+            "out of the hot tables into compressed archive files")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', dest='year_ids', action='append',
+                            help='Academic year id (repeatable; default: every closed year)')
+        parser.add_argument('--source', dest='sources', action='append', choices=sorted(ARCHIVES),
+                            help='Table to archive (repeatable; default: all)')
+        parser.add_argument('--chunk', type=int, default=5000, help='Rows per archive file')
+        parser.add_argument('--status', action='store_true', help='Only report archived and remaining rows')
+
+    def handle(self, *args, **options):
+        if options['year_ids']:
+            try:
+                years = list(AcademicYear.objects.filter(pk__in=options['year_ids']).order_by('start_date'))
+            except ValidationError as exc:
+                raise CommandError(f'Invalid academic year id: {exc.messages[0]}')
+            if len(years) != len(set(options['year_ids'])):
+                raise CommandError('Unknown academic year')
+        else:
+            years = closed_years()
+
+        for year in years:
+            if options['status']:
+                for name, counts in archive_status(year).items():
+                    self.stdout.write(f"{year.name} {name}: {counts['archived']} archived, "
+                                      f"{counts['remaining']} remaining")
+                continue
+            try:
+                archived = archive_year(year, options['sources'], chunk_size=options['chunk'])
+            except ValidationError as exc:
+                raise CommandError(exc.messages[0])
+            self.stdout.write(self.style.SUCCESS(
+                f'{year.name}: archived ' + ', '.join(f'{rows} {name}' for name, rows in archived.items())))
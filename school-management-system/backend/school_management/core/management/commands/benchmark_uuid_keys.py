@@ -0,0 +1,95 @@
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from school_management.core.utils import uuid7
+
+GENERATORS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+def index_size(table):
+    """Total on-disk size of the table's indexes in bytes, or None if the backend can't tell"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_indexes_size(%s)', [table])
+            return cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table],
+                )
+            except Exception:
+                return None
+            return cursor.fetchone()[0]
+    return None
+
+
+class Command(BaseCommand):
+    help = ('Compare insert throughput and primary-key index size of random (uuid4) and '
+            'time-ordered (uuid7) ids on scratch tables shaped like attendance_records')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000)
+        parser.add_argument('--batch', type=int, default=10_000)
+        parser.add_argument('--students', type=int, default=10_000)
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch tables afterwards')
+
+    def handle(self, *args, **options):
+        uuid_field = models.UUIDField()
+        uuid_type = uuid_field.db_type(connection)
+        qn = connection.ops.quote_name
+        students = [uuid_field.get_db_prep_value(uuid.uuid4(), connection)
+                    for _ in range(options['students'])]
+        start_date = date(2000, 1, 1)
+
+        for name, generate in GENERATORS.items():
+            table = f'bench_attendance_{name}'
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {qn(table)}')
+                cursor.execute(
+                    f'CREATE TABLE {qn(table)} ('
+                    f'id {uuid_type} NOT NULL PRIMARY KEY, '
+                    f'student_id {uuid_type} NOT NULL, '
+                    f'date date NOT NULL, '
+                    f'status varchar(20) NOT NULL)'
+                )
+            insert = f'INSERT INTO {qn(table)} (id, student_id, date, status) VALUES (%s, %s, %s, %s)'
+
+            elapsed = 0.0
+            inserted = 0
+            while inserted < options['rows']:
+                size = min(options['batch'], options['rows'] - inserted)
+                rows = [
+                    (
+                        uuid_field.get_db_prep_value(generate(), connection),
+                        random.choice(students),
+                        start_date + timedelta(days=(inserted + i) // len(students)),
+                        'PRESENT',
+                    )
+                    for i in range(size)
+                ]
+                started = time.perf_counter()
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.executemany(insert, rows)
+                elapsed += time.perf_counter() - started
+                inserted += size
+
+            index_bytes = index_size(table)
+            self.stdout.write(
+                f'{name}: {inserted} rows in {elapsed:.1f}s '
+                f'({inserted / elapsed:,.0f} rows/s), '
+                f'index size {"n/a" if index_bytes is None else f"{index_bytes / 1024 / 1024:.1f} MiB"}'
+            )
+
+            if not options['keep']:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {qn(table)}')
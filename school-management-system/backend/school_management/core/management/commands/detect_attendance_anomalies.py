@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from school_management.core.attendance_alerts import ALERTS, detect_anomalies, notify_parents
+
+
+class Command(BaseCommand):
+    help = ('Flag students with low attendance, consecutive absences or a sudden drop, and notify their parents; '
+            'meant to run nightly')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to evaluate (YYYY-MM-DD, default today)')
+        parser.add_argument('--dry-run', action='store_true', help='Report flagged students without notifying')
+
+    def handle(self, *args, **options):
+        day = parse_date(options['date']) if options['date'] else None
+        if options['date'] and day is None:
+            raise CommandError(f"Invalid date: {options['date']}")
+
+        anomalies = detect_anomalies(day)
+        counts = {alert: sum(alert in anomaly['alerts'] for anomaly in anomalies.values()) for alert in ALERTS}
+        self.stdout.write(f'Flagged {len(anomalies)} students: '
+                          + ', '.join(f'{count} {alert}' for alert, count in counts.items()))
+        if options['dry_run'] or not anomalies:
+            return
+        sent = notify_parents(anomalies)
+        self.stdout.write(self.style.SUCCESS(f'Queued {sent} attendance notifications'))
@@ -0,0 +1,40 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from school_management.core.models import AcademicYear
+from school_management.core.reference_cache import reference_cache
+from school_management.core.report_cards import generate_report_cards
+
+
+class Command(BaseCommand):
+    help = ("Generate or refresh a term's report cards for every class of an academic year, "
+            "keeping teachers' comments")
+
+    def add_arguments(self, parser):
+        parser.add_argument('term', help='Term name, e.g. "First Term"')
+        parser.add_argument('--year', help='Academic year id (default: the active year)')
+        parser.add_argument('--from', dest='date_from', help='First day of the term (YYYY-MM-DD, default: year start)')
+        parser.add_argument('--to', dest='date_to', help='Last day of the term (YYYY-MM-DD, default: year end)')
+        parser.add_argument('--class', dest='class_ids', action='append', help='Class id (repeatable)')
+        parser.add_argument('--workers', type=int, default=1, help='Processes to spread classes over')
+
+    def handle(self, *args, **options):
+        dates = {}
+        for option in ('date_from', 'date_to'):
+            value = options[option]
+            dates[option] = parse_date(value) if value else None
+            if value and dates[option] is None:
+                raise CommandError(f'Invalid date: {value}')
+        try:
+            year = (AcademicYear.objects.filter(pk=options['year']).first() if options['year']
+                    else reference_cache.active_year())
+        except ValidationError as exc:
+            raise CommandError(f'Invalid academic year id: {exc.messages[0]}')
+        if year is None:
+            raise CommandError('Academic year not found')
+
+        written = generate_report_cards(year, options['term'], class_ids=options['class_ids'],
+                                        workers=options['workers'], **dates)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {sum(written.values())} report cards for {len(written)} classes ({year.name}, {options['term']})"))
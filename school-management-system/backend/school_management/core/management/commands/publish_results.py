@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from school_management.core.published_results import publish_all
+
+
+class Command(BaseCommand):
+    help = ('Pre-render the result payloads of every published exam into the results cache, e.g. after a '
+            'deploy or a cache flush (lookups otherwise rebuild them on their first miss)')
+
+    def handle(self, *args, **options):
+        published = publish_all()
+        for exam, students in published.items():
+            self.stdout.write(f'{exam.name}: {students} students')
+        self.stdout.write(self.style.SUCCESS(f'Published {len(published)} exams'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from school_management.core.attendance_rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = ('Rebuild per-class daily attendance rollups from attendance_records, for backfills '
+            'and after students change class')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--class', dest='class_ids', action='append', help='Class id (repeatable)')
+        parser.add_argument('--batch', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        dates = {}
+        for option in ('date_from', 'date_to'):
+            value = options[option]
+            dates[option] = parse_date(value) if value else None
+            if value and dates[option] is None:
+                raise CommandError(f'Invalid date: {value}')
+        written = rebuild_rollups(class_ids=options['class_ids'], batch_size=options['batch'], **dates)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup rows'))
@@ -0,0 +1,31 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from school_management.core.attendance_store import rebuild_year
+from school_management.core.models import AcademicYear, ArchivedChunk
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the packed per-student yearly attendance store from attendance_records, for backfills'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', dest='year_ids', action='append',
+                            help='Academic year id (repeatable; default: every year)')
+        parser.add_argument('--batch', type=int, default=500)
+
+    def handle(self, *args, **options):
+        years = AcademicYear.objects.order_by('start_date')
+        if options['year_ids']:
+            try:
+                years = years.filter(pk__in=options['year_ids'])
+                if len(years) != len(set(options['year_ids'])):
+                    raise CommandError('Unknown academic year')
+            except ValidationError as exc:
+                raise CommandError(f'Invalid academic year id: {exc.messages[0]}')
+        for year in years:
+            if ArchivedChunk.objects.filter(academic_year=year, source='attendance').exists():
+                # Its records are archived; rebuilding from what is left would wipe the store
+                self.stdout.write(self.style.WARNING(f'{year.name}: attendance archived, skipped'))
+                continue
+            written = rebuild_year(year, batch_size=options['batch'])
+            self.stdout.write(self.style.SUCCESS(f'{year.name}: wrote {written} student rows'))
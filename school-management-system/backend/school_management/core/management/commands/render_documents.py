@@ -0,0 +1,35 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from school_management.core.documents import DOCUMENTS, render_documents
+
+
+class Command(BaseCommand):
+    help = 'Render report card or certificate PDFs into media storage, skipping documents whose content is unchanged'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(DOCUMENTS))
+        parser.add_argument('--year', help='Academic year id (report cards)')
+        parser.add_argument('--term', help='Term name (report cards)')
+        parser.add_argument('--class', dest='class_ids', action='append',
+                            help="Student's current class id (repeatable)")
+        parser.add_argument('--workers', type=int, default=1, help='Processes to render in')
+
+    def handle(self, *args, **options):
+        documents = DOCUMENTS[options['kind']].queryset()
+        try:
+            if options['kind'] == 'report_card':
+                if options['year']:
+                    documents = documents.filter(academic_year=options['year'])
+                if options['term']:
+                    documents = documents.filter(term=options['term'])
+            if options['class_ids']:
+                documents = documents.filter(student__current_class__in=options['class_ids'])
+            pks = list(documents.values_list('pk', flat=True))
+        except ValidationError as exc:
+            raise CommandError(exc.messages[0])
+
+        rendered = render_documents(options['kind'], pks, workers=options['workers'])
+        created = sum(created for _, created in rendered.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(rendered)} documents: rendered {created}, {len(rendered) - created} unchanged'))
@@ -0,0 +1,82 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from school_management.core.models import AcademicYear, YearRollover
+from school_management.core.reference_cache import reference_cache
+from school_management.core.rollover import next_year_defaults, plan_rollover, rollback_rollover, start_rollover
+
+
+class Command(BaseCommand):
+    help = ('Roll an academic year over into the next: clone its classes, class subjects, fee structures and '
+            'timetables, promote students and renumber their rolls, then activate the new year')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', help='Academic year to roll over (default: the active year)')
+        parser.add_argument('--name', help='Name of the new year (default: the old name with its years moved on one)')
+        parser.add_argument('--start', help='First day of the new year (YYYY-MM-DD, default: a year after the old)')
+        parser.add_argument('--end', help='Last day of the new year (YYYY-MM-DD, default: a year after the old)')
+        parser.add_argument('--hold-back', dest='held_back', action='append', default=[],
+                            help='Id of a student repeating their class (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Print what would change without changing it')
+        parser.add_argument('--moves', action='store_true', help='With --dry-run, list every student move')
+        parser.add_argument('--rollback', action='store_true', help="Undo the year's latest rollover instead")
+        parser.add_argument('--force', action='store_true',
+                            help='With --rollback, also delete rows added to the new year since')
+
+    def handle(self, *args, **options):
+        try:
+            year = (AcademicYear.objects.filter(pk=options['year']).first() if options['year']
+                    else reference_cache.active_year())
+        except ValidationError as exc:
+            raise CommandError(f'Invalid academic year id: {exc.messages[0]}')
+        if year is None:
+            raise CommandError('Academic year not found')
+
+        if options['rollback']:
+            rollover = YearRollover.objects.filter(from_year=year).exclude(status='ROLLED_BACK').first()
+            if rollover is None:
+                raise CommandError(f'{year.name} has no rollover to roll back')
+            try:
+                rollback_rollover(rollover, force=options['force'])
+            except ValidationError as exc:
+                raise CommandError('; '.join(exc.messages))
+            self.stdout.write(self.style.SUCCESS(f'Rolled back {year.name} -> {rollover.to_year_name}'))
+            return
+
+        name, start_date, end_date = next_year_defaults(year)
+        name = options['name'] or name
+        for option, default in (('start', start_date), ('end', end_date)):
+            value = options[option]
+            if value and parse_date(value) is None:
+                raise CommandError(f'Invalid date: {value}')
+            options[option] = parse_date(value) if value else default
+
+        try:
+            if options['dry_run']:
+                self._print_plan(plan_rollover(year, name, options['start'], options['end'], options['held_back']),
+                                 options['moves'])
+                return
+            rollover = start_rollover(year, name, options['start'], options['end'], options['held_back'])
+        except ValidationError as exc:
+            raise CommandError('; '.join(exc.messages))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled {year.name} over into {rollover.to_year_name}: {len(rollover.snapshot.get('classes', []))} "
+            f"classes created, {len(rollover.snapshot.get('students', {}))} students moved"))
+
+    def _print_plan(self, plan, moves):
+        to_year = plan['to_year']
+        self.stdout.write(f"{plan['from_year']['name']} -> {to_year['name']} ({to_year['start_date']} to "
+                          f"{to_year['end_date']}, {'existing' if to_year['exists'] else 'new'})")
+        self.stdout.write(f"Classes: {len(plan['classes']['create'])} to create, "
+                          f"{len(plan['classes']['existing'])} already there")
+        self.stdout.write(f"Class subjects: {plan['class_subjects']}, fee structures: {plan['fee_structures']}, "
+                          f"timetable slots: {plan['timetables']}")
+        self.stdout.write('Students: ' + ', '.join(f'{count} {key.replace("_", " ")}'
+                                                   for key, count in plan['students'].items()))
+        if moves:
+            for move in plan['moves']:
+                self.stdout.write(f"  {move['from_roll_number']} ({move['from_class']}) -> "
+                                  f"{move['to_roll_number']} ({move['to_class'] or 'graduated'})")
+        for conflict in plan['conflicts']:
+            self.stdout.write(self.style.ERROR(conflict))
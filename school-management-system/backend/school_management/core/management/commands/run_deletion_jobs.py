@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from school_management.core.deletion import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background deletes (academic years, classes, exams, students) in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs instead of exiting')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds between polls with --loop')
+        parser.add_argument('--batch', type=int, help='Rows per transaction (default: DELETION_BATCH_SIZE)')
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry failed jobs')
+
+    def handle(self, *args, **options):
+        retry_failed = options['retry_failed']
+        while True:
+            job = claim_job(retry_failed=retry_failed)
+            if job is None:
+                if not options['loop']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+            job = run_job(job, batch_size=options['batch'])
+            deleted = sum(job.deleted.values())
+            if job.status == 'COMPLETED':
+                self.stdout.write(self.style.SUCCESS(f'{job.object_repr}: deleted {deleted} rows'))
+            else:
+                self.stdout.write(self.style.ERROR(f'{job.object_repr}: failed after {deleted} rows: {job.error}'))
+                retry_failed = False  # once per run; otherwise a job that keeps failing would be retried forever
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['status', '-date'], name='attendance__status_16c24a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feepayment',
+            index=models.Index(fields=['student', '-due_date'], name='fee_payment_student_820bdd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feepayment',
+            index=models.Index(fields=['status', '-due_date'], name='fee_payment_status_b6f07e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feepayment',
+            index=models.Index(fields=['payment_method', '-due_date'], name='fee_payment_payment_61b444_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feepayment',
+            index=models.Index(fields=['-due_date'], name='fee_payment_due_dat_7e5b27_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['academic_year', '-start_date'], name='exams_academi_76baf3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['exam_type', '-start_date'], name='exams_exam_ty_3089c2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['-start_date'], name='exams_start_d_2939b9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['vehicle_type'], name='vehicles_vehicle_d54349_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['is_active'], name='vehicles_is_acti_fa11c1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['class_obj', '-due_date'], name='homework_class_o_ae747c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['subject', '-due_date'], name='homework_subject_3f051b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['-due_date'], name='homework_due_dat_3fa28a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['notification_type', '-sent_date'], name='notificatio_notific_bc3840_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['-sent_date'], name='notificatio_sent_da_73addf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['status', '-filed_date'], name='complaints_status_52019c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['complaint_type', '-filed_date'], name='complaints_complai_eda7e8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['priority', '-filed_date'], name='complaints_priorit_48d375_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['-filed_date'], name='complaints_filed_d_290e27_idx'),
+        ),
+    ]
@@ -0,0 +1,224 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:07
+
+from django.db import migrations, models
+import school_management.core.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_viewset_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='academicyear',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='biometricattendance',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='class',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='classdiary',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='classsubject',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='complaint',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='driver',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='exam',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='examschedule',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='feediscount',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='feepayment',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='feestructure',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='grade',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='homework',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='homeworksubmission',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='librarybook',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='librarytransaction',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='mark',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='parent',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='reportcard',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='result',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='routestop',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='salary',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='school',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='smslog',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='staff',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='studentparent',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='studenttransport',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='subject',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='timetable',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='transportattendance',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='transportroute',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='id',
+            field=models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
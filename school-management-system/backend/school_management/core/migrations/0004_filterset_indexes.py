@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_time_ordered_uuid_pks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['subject', '-date'], name='attendance__subject_7a701a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['complainant', '-filed_date'], name='complaints_complai_c157df_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['assigned_to', '-filed_date'], name='complaints_assigne_6be0b6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feepayment',
+            index=models.Index(fields=['payment_date'], name='fee_payment_payment_2c0b73_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['teacher', '-due_date'], name='homework_teacher_82f554_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['sender', '-sent_date'], name='notificatio_sender__998141_idx'),
+        ),
+    ]
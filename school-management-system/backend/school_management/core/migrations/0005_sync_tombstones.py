@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:30
+
+from django.db import migrations, models
+import school_management.core.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_filterset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model_label', models.CharField(max_length=100)),
+                ('object_id', models.UUIDField()),
+                ('class_id', models.UUIDField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sync_tombstones',
+                'ordering': ['deleted_at'],
+                'indexes': [models.Index(fields=['model_label', 'deleted_at'], name='sync_tombst_model_l_527b09_idx'), models.Index(fields=['model_label', 'class_id', 'deleted_at'], name='sync_tombst_model_l_74fdb2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import school_management.core.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDailyRollup',
+            fields=[
+                ('id', models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('leave', models.IntegerField(default=0)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='core.class')),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.subject')),
+            ],
+            options={
+                'db_table': 'attendance_daily_rollups',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'class_obj'], name='attendance__date_a73d82_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='attendancedailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('subject__isnull', False)), fields=('class_obj', 'date', 'subject'), name='attendance_rollup_subject_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancedailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('subject__isnull', True)), fields=('class_obj', 'date'), name='attendance_rollup_day'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import school_management.core.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_attendance_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAttendanceYear',
+            fields=[
+                ('id', models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('codes', models.BinaryField()),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_attendance', to='core.academicyear')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_years', to='core.student')),
+            ],
+            options={
+                'db_table': 'student_attendance_years',
+                'unique_together': {('student', 'academic_year')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import school_management.core.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_student_attendance_years'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YearRollover',
+            fields=[
+                ('id', models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('to_year_name', models.CharField(max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('held_back', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('ROLLED_BACK', 'Rolled Back')], default='IN_PROGRESS', max_length=20)),
+                ('completed_stages', models.JSONField(blank=True, default=list)),
+                ('snapshot', models.JSONField(blank=True, default=dict)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('from_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollovers', to='core.academicyear')),
+                ('performed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.user')),
+                ('to_year', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.academicyear')),
+            ],
+            options={
+                'db_table': 'year_rollovers',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
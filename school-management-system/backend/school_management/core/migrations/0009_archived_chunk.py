@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import school_management.core.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_year_rollover'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedChunk',
+            fields=[
+                ('id', models.UUIDField(default=school_management.core.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('source', models.CharField(max_length=50)),
+                ('sequence', models.IntegerField()),
+                ('file_name', models.CharField(max_length=255)),
+                ('row_count', models.IntegerField()),
+                ('checksum', models.CharField(max_length=64)),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_chunks', to='core.academicyear')),
+            ],
+            options={
+                'db_table': 'archived_chunks',
+                'ordering': ['academic_year', 'source', 'sequence'],
+                'unique_together': {('academic_year', 'source', 'sequence')},
+            },
+        ),
+    ]
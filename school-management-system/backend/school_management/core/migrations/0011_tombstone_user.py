@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_deletion_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='user_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model_label', 'user_id', 'deleted_at'], name='sync_tombst_model_l_dba9e0_idx'),
+        ),
+    ]
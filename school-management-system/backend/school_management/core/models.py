@@ -1,11 +1,12 @@
-import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
 
+from .utils import uuid7
+
 
 class BaseModel(models.Model):
-    """Base model with UUID primary key and timestamps"""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    """Base model with time-ordered UUID primary key and timestamps"""
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -25,7 +26,7 @@ class User(AbstractUser):
         ('TRANSPORT_MANAGER', 'Transport Manager'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='STUDENT')
     phone = models.CharField(max_length=15, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
@@ -249,11 +250,60 @@ class AttendanceRecord(BaseModel):
         db_table = 'attendance_records'
         unique_together = ('student', 'date', 'subject')
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['status', '-date']),
+            models.Index(fields=['subject', '-date']),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.date} - {self.status}"
 
 
+class AttendanceDailyRollup(BaseModel):
+    """Per-class, per-day attendance counts by status (see core.attendance_rollups)"""
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='attendance_rollups')
+    date = models.DateField()
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, blank=True)  # null: day-level records
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    leave = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'attendance_daily_rollups'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['class_obj', 'date', 'subject'], condition=models.Q(subject__isnull=False),
+                                    name='attendance_rollup_subject_day'),
+            models.UniqueConstraint(fields=['class_obj', 'date'], condition=models.Q(subject__isnull=True),
+                                    name='attendance_rollup_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'class_obj']),
+        ]
+
+    @property
+    def total(self):
+        return self.present + self.absent + self.late + self.leave
+
+    def __str__(self):
+        return f"{self.class_obj} - {self.date} - {self.subject or 'day'}"
+
+
+class StudentAttendanceYear(BaseModel):
+    """A student's day-level attendance for one academic year, one status code per calendar day"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_years')
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE, related_name='student_attendance')
+    codes = models.BinaryField()  # byte i is day start_date + i, see core.attendance_store.CODES
+
+    class Meta:
+        db_table = 'student_attendance_years'
+        unique_together = ('student', 'academic_year')
+
+    def __str__(self):
+        return f"{self.student} - {self.academic_year}"
+
+
 class BiometricAttendance(BaseModel):
     """Biometric Attendance Records"""
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='biometric_records')
@@ -339,6 +389,13 @@ class FeePayment(BaseModel):
     class Meta:
         db_table = 'fee_payments'
         ordering = ['-due_date']
+        indexes = [
+            models.Index(fields=['student', '-due_date']),
+            models.Index(fields=['status', '-due_date']),
+            models.Index(fields=['payment_method', '-due_date']),
+            models.Index(fields=['-due_date']),
+            models.Index(fields=['payment_date']),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.amount_due} - {self.status}"
@@ -382,6 +439,11 @@ class Exam(BaseModel):
     class Meta:
         db_table = 'exams'
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['academic_year', '-start_date']),
+            models.Index(fields=['exam_type', '-start_date']),
+            models.Index(fields=['-start_date']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.academic_year})"
@@ -531,6 +593,10 @@ class Vehicle(BaseModel):
 
     class Meta:
         db_table = 'vehicles'
+        indexes = [
+            models.Index(fields=['vehicle_type']),
+            models.Index(fields=['is_active']),
+        ]
 
     def __str__(self):
         return f"{self.vehicle_type} - {self.registration_number}"
@@ -609,6 +675,12 @@ class Homework(BaseModel):
     class Meta:
         db_table = 'homework'
         ordering = ['-due_date']
+        indexes = [
+            models.Index(fields=['class_obj', '-due_date']),
+            models.Index(fields=['subject', '-due_date']),
+            models.Index(fields=['teacher', '-due_date']),
+            models.Index(fields=['-due_date']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.class_obj}"
@@ -679,6 +751,11 @@ class Notification(BaseModel):
     class Meta:
         db_table = 'notifications'
         ordering = ['-sent_date']
+        indexes = [
+            models.Index(fields=['notification_type', '-sent_date']),
+            models.Index(fields=['sender', '-sent_date']),
+            models.Index(fields=['-sent_date']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.notification_type}"
@@ -857,6 +934,14 @@ class Complaint(BaseModel):
     class Meta:
         db_table = 'complaints'
         ordering = ['-filed_date']
+        indexes = [
+            models.Index(fields=['status', '-filed_date']),
+            models.Index(fields=['complaint_type', '-filed_date']),
+            models.Index(fields=['priority', '-filed_date']),
+            models.Index(fields=['complainant', '-filed_date']),
+            models.Index(fields=['assigned_to', '-filed_date']),
+            models.Index(fields=['-filed_date']),
+        ]
 
     def __str__(self):
         return self.complaint_id
@@ -901,3 +986,112 @@ class Certificate(BaseModel):
 
     def __str__(self):
         return f"{self.student} - {self.certificate_type}"
+
+
+# ============ SYNC MODELS ============
+
+class Tombstone(BaseModel):
+    """Record of a deleted row, so offline clients can drop it on their next sync"""
+    model_label = models.CharField(max_length=100)  # core.homework, core.student, ...
+    object_id = models.UUIDField()
+    class_id = models.UUIDField(blank=True, null=True)  # class the row belonged to, for scoping
+    user_id = models.UUIDField(blank=True, null=True)  # set: meant only for this user (a student or their parent)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['model_label', 'deleted_at']),
+            models.Index(fields=['model_label', 'class_id', 'deleted_at']),
+            models.Index(fields=['model_label', 'user_id', 'deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} {self.object_id}"
+
+
+# ============ YEAR-END MODELS ============
+
+class YearRollover(BaseModel):
+    """A year-end rollover into the next academic year, with what is needed to roll it back"""
+    STATUS_CHOICES = [
+        ('IN_PROGRESS', 'In Progress'),
+        ('COMPLETED', 'Completed'),
+        ('ROLLED_BACK', 'Rolled Back'),
+    ]
+
+    from_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE, related_name='rollovers')
+    to_year = models.ForeignKey(AcademicYear, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    to_year_name = models.CharField(max_length=20)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    held_back = models.JSONField(default=list, blank=True)  # ids of students repeating their class
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='IN_PROGRESS')
+    completed_stages = models.JSONField(default=list, blank=True)  # see core.rollover.STAGES
+    snapshot = models.JSONField(default=dict, blank=True)  # rows created and values replaced, for rollback
+    performed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'year_rollovers'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.from_year} -> {self.to_year_name} ({self.get_status_display()})"
+
+
+class ArchivedChunk(BaseModel):
+    """A batch of a closed year's rows moved out of their table into a compressed file (see core.archive)"""
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.PROTECT, related_name='archived_chunks')
+    source = models.CharField(max_length=50)  # key of core.archive.ARCHIVES
+    sequence = models.IntegerField()
+    file_name = models.CharField(max_length=255)  # gzipped JSON lines in default storage
+    row_count = models.IntegerField()
+    checksum = models.CharField(max_length=64)  # sha256 of the file
+
+    class Meta:
+        db_table = 'archived_chunks'
+        unique_together = ('academic_year', 'source', 'sequence')
+        ordering = ['academic_year', 'source', 'sequence']
+
+    def __str__(self):
+        return f"{self.academic_year} {self.source} #{self.sequence}"
+
+
+# ============ DELETION JOBS ============
+
+class DeletionJob(BaseModel):
+    """A large delete run in the background: the parent is hidden at once, its dependents removed in batches"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    model_label = models.CharField(max_length=100)  # core.student, core.class, ...
+    object_id = models.UUIDField()
+    object_repr = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    step = models.IntegerField(default=0)  # steps of core.deletion.deletion_steps() already done
+    deleted = models.JSONField(default=dict, blank=True)  # rows deleted (or detached) so far, by model label
+    error = models.TextField(blank=True, null=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'deletion_jobs'
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['model_label', 'object_id'],
+                                    condition=models.Q(status__in=['PENDING', 'RUNNING', 'FAILED']),
+                                    name='deletion_job_unfinished_object'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Delete {self.object_repr} ({self.get_status_display()})"
@@ -0,0 +1,115 @@
+import textwrap
+import zlib
+
+# A4 in points
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 56
+
+# Line styles: font resource, size, line height
+STYLES = {
+    'title': ('F2', 18, 28),
+    'heading': ('F2', 12, 22),
+    'text': ('F1', 10, 15),
+    'small': ('F1', 8, 12),
+}
+_PREFIXES = (('# ', 'title'), ('## ', 'heading'), ('~ ', 'small'))
+_FONTS = {'F1': 'Helvetica', 'F2': 'Helvetica-Bold'}
+
+
+def _escape(text):
+    # The standard fonts use WinAnsi (roughly Latin-1); anything else prints as '?'
+    return (text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            .encode('latin-1', errors='replace'))
+
+
+def layout(markup):
+    """
+    Content streams of the pages `markup` lays out, top to bottom.
+
+    One directive per line: '# ' a title, '## ' a heading, '~ ' small text,
+    '---' a horizontal rule, '===' a page break, anything else body text.
+    Tabs split a line into equal-width columns; long lines wrap.
+    """
+    pages, ops, y = [], [], PAGE_HEIGHT - MARGIN
+    usable = PAGE_WIDTH - 2 * MARGIN
+
+    def new_page():
+        nonlocal ops, y
+        pages.append(b'\n'.join(ops))
+        ops, y = [], PAGE_HEIGHT - MARGIN
+
+    for line in markup.splitlines():
+        line = line.rstrip()
+        if line == '===':
+            new_page()
+            continue
+        if line == '---':
+            y -= 6
+            ops.append(f'0.5 w {MARGIN} {y} m {PAGE_WIDTH - MARGIN} {y} l S'.encode())
+            y -= 10
+            continue
+        style = next((style for prefix, style in _PREFIXES if line.startswith(prefix)), 'text')
+        if style != 'text':
+            line = line.split(' ', 1)[1]
+        font, size, leading = STYLES[style]
+        cells = line.split('\t')
+        width = usable / len(cells)
+        # Helvetica averages about half an em per character
+        wrapped = [textwrap.wrap(cell, max(int(width / (size * 0.5)) - 1, 1)) or [''] for cell in cells]
+        for row in range(max(len(cell) for cell in wrapped)):
+            if y - leading < MARGIN:
+                new_page()
+            y -= leading
+            for column, cell in enumerate(wrapped):
+                if row < len(cell) and cell[row]:
+                    ops.append(b'BT /%s %d Tf %.1f %.1f Td (%s) Tj ET' % (
+                        font.encode(), size, MARGIN + column * width, y, _escape(cell[row])))
+    if ops or not pages:
+        new_page()
+    return pages
+
+
+def iter_pdf(pages):
+    """
+    Yield a PDF of `pages` (content streams, any iterable) in pieces, so a
+    document of thousands of pages can be streamed without holding it whole.
+    """
+    offsets = {}
+    position = 0
+    kids = []
+
+    def obj(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header
+    yield obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    font_refs = []
+    for number, (resource, name) in enumerate(_FONTS.items(), start=3):
+        yield obj(number, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % name.encode())
+        font_refs.append(b'/%s %d 0 R' % (resource.encode(), number))
+    resources = b'<< /Font << %s >> >>' % b' '.join(font_refs)
+
+    number = 3 + len(_FONTS)
+    for content in pages:
+        data = zlib.compress(content)
+        yield obj(number, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(data), data))
+        yield obj(number + 1, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R /Resources %s >>'
+                  % (PAGE_WIDTH, PAGE_HEIGHT, number, resources))
+        kids.append(b'%d 0 R' % (number + 1))
+        number += 2
+    yield obj(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids)))
+
+    xref = [b'xref\n0 %d\n' % number, b'0000000000 65535 f \n']
+    xref.extend(b'%010d 00000 n \n' % offsets[entry] for entry in range(1, number))
+    yield b''.join(xref)
+    yield b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (number, position)
+
+
+def render_pdf(markup):
+    return b''.join(iter_pdf(layout(markup)))
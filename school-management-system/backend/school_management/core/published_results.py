@@ -0,0 +1,216 @@
+import hashlib
+
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Class, Exam, Grade, Mark, Result, Student, Subject
+from .reference_cache import reference_cache
+from .utils import OnCommitBatch
+
+# Seconds a lookup that found nothing is remembered, so repeated typos and guesses are answered from the cache
+MISS_TIMEOUT = 60
+
+
+def _cache():
+    return caches['results']
+
+
+def _exam_key(exam_id):
+    return f'published-results:{exam_id}'
+
+
+def lookup_key(exam_id, roll_number, date_of_birth):
+    """Cache key of one student's published result, from the details they look it up with"""
+    raw = f'{exam_id}|{roll_number.strip().lower()}|{date_of_birth}'
+    return 'published-result:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _decimal(value):
+    return f'{value:.2f}' if value is not None else None
+
+
+def build_payloads(exam, student_ids=None):
+    """
+    {lookup key: payload} of the exam's students (all with a result or a
+    mark, or just `student_ids`): the Result row plus the marks per subject.
+    Three queries however many students there are.
+    """
+    # Payloads are cached indefinitely: read names from reference tables at their latest, e.g. the classes a
+    # rollover has just created, rather than from a copy that is up to a check interval old
+    reference_cache.sync(force=True)
+    results = Result.objects.filter(exam=exam)
+    marks = Mark.objects.filter(exam_schedule__exam=exam)
+    if student_ids is not None:
+        results, marks = results.filter(student__in=student_ids), marks.filter(student__in=student_ids)
+    results = {result.student_id: result for result in results}
+    subjects = {}
+    for student, subject, total, obtained, is_absent in (marks.order_by('exam_schedule__exam_date').values_list(
+            'student', 'exam_schedule__subject', 'exam_schedule__total_marks', 'marks_obtained', 'is_absent')):
+        subjects.setdefault(student, []).append({
+            'subject': subject,
+            'subject_name': reference_cache.name(Subject, subject),
+            'marks_obtained': None if is_absent else _decimal(obtained),
+            'total_marks': total,
+            'is_absent': is_absent,
+        })
+
+    students = Student.objects.filter(pk__in=set(results) | set(subjects)).values_list(
+        'pk', 'roll_number', 'date_of_birth', 'user__first_name', 'user__last_name', 'current_class')
+    exam_data = {'id': exam.pk, 'name': exam.name, 'exam_type': exam.exam_type,
+                 'result_published_date': exam.result_published_date}
+    payloads = {}
+    for pk, roll_number, date_of_birth, first_name, last_name, class_id in students:
+        result = results.get(pk)
+        payloads[lookup_key(exam.pk, roll_number, date_of_birth)] = {
+            'exam': exam_data,
+            'student': {'name': f'{first_name} {last_name}'.strip(), 'roll_number': roll_number,
+                        'class_name': reference_cache.name(Class, class_id)},
+            'result': {
+                'total_marks_obtained': _decimal(result.total_marks_obtained),
+                'total_marks': result.total_marks,
+                'percentage': _decimal(result.percentage),
+                'grade_name': reference_cache.name(Grade, result.grade_id),
+                'is_passed': result.is_passed,
+                'rank': result.rank,
+            } if result else None,
+            'subjects': subjects.get(pk, []),
+        }
+    return payloads
+
+
+def publish(exam):
+    """Pre-render every student's result payload of a published exam, then open lookups for it"""
+    payloads = build_payloads(exam)
+    _cache().set_many(payloads, timeout=None)
+    _cache().set(_exam_key(exam.pk), {'published_at': timezone.now(), 'students': len(payloads)}, timeout=None)
+    return len(payloads)
+
+
+def unpublish(exam_id):
+    # Payloads stay cached but are unreachable without the exam's entry; publishing again overwrites them
+    _cache().delete(_exam_key(exam_id))
+
+
+def _rebuild_student(exam, roll_number, date_of_birth):
+    students = list(Student.objects.filter(roll_number__iexact=roll_number.strip(), date_of_birth=date_of_birth)
+                    .values_list('pk', flat=True))
+    payloads = build_payloads(exam, students) if students else {}
+    if payloads:
+        _cache().set_many(payloads, timeout=None)
+    return payloads.get(lookup_key(exam.pk, roll_number, date_of_birth))
+
+
+def lookup(exam_id, roll_number, date_of_birth):
+    """
+    A published result payload, or None. Served from the cache; whatever the
+    cache lost (a restart, a deploy, eviction) is rebuilt on the miss: the
+    whole exam when its entry is gone, else just the student looked up.
+    Lookups that find nothing are remembered for MISS_TIMEOUT seconds, so
+    only the first of a run of wrong details reaches the database.
+    """
+    cache = _cache()
+    exam_key, key = _exam_key(exam_id), lookup_key(exam_id, roll_number, date_of_birth)
+    exam_miss, miss = f'{exam_key}:miss', f'{key}:miss'
+    entries = cache.get_many([exam_key, key, exam_miss, miss])
+    if exam_key in entries:
+        if key in entries:
+            return entries[key]
+        if miss in entries:
+            return None
+        exam = Exam.objects.filter(pk=exam_id).first()
+        payload = _rebuild_student(exam, roll_number, date_of_birth) if exam is not None else None
+        if payload is None:
+            cache.set(miss, True, MISS_TIMEOUT)
+        return payload
+
+    if exam_miss in entries:
+        return None
+    exam = Exam.objects.filter(pk=exam_id, is_published=True).first()
+    if exam is None:
+        cache.set(exam_miss, True, MISS_TIMEOUT)
+        return None
+    # One request re-publishes the exam; the others meanwhile render only the student they look up
+    if cache.add(f'{exam_key}:rebuilding', True, timeout=300):
+        try:
+            publish(exam)
+        finally:
+            cache.delete(f'{exam_key}:rebuilding')
+        return cache.get(key)
+    return _rebuild_student(exam, roll_number, date_of_birth)
+
+
+def publish_all():
+    """Re-publish every published exam, e.g. to warm a fresh cache; returns {exam: payloads written}"""
+    return {exam: publish(exam) for exam in Exam.objects.filter(is_published=True).order_by('start_date')}
+
+
+def refresh_student(exam_id, student_id):
+    """Re-render one student's payload after a correction, if the exam is (still) published"""
+    exam = Exam.objects.filter(pk=exam_id, is_published=True).first()
+    if exam is None:
+        return
+    payloads = build_payloads(exam, [student_id])
+    if payloads:
+        _cache().set_many(payloads, timeout=None)
+        return
+    # Nothing left to show (marks and result removed); stop serving what was published
+    student = Student.objects.filter(pk=student_id).values_list('roll_number', 'date_of_birth').first()
+    if student is not None:
+        _cache().delete(lookup_key(exam_id, *student))
+
+
+def published_exams_of(student_ids):
+    """Ids of the published exams the students have a result or a mark in"""
+    return list(Exam.objects.filter(is_published=True)
+                .filter(Q(results__student__in=student_ids) | Q(schedules__marks__student__in=student_ids))
+                .values_list('pk', flat=True).distinct())
+
+
+def rekey_students(previous, exam_ids=None):
+    """
+    Re-render the published payloads of students whose lookup details
+    changed, from {student id: (roll number, date of birth) before}: the old
+    details stop finding the result and the current ones (and class) find
+    it. `exam_ids` defaults to the published exams the students are in;
+    pass them for deleted students, whose marks and results are gone.
+    """
+    exam_ids = published_exams_of(list(previous)) if exam_ids is None else exam_ids
+    _cache().delete_many([lookup_key(exam_id, roll_number, date_of_birth)
+                          for exam_id in exam_ids for roll_number, date_of_birth in previous.values()])
+    for exam in Exam.objects.filter(pk__in=exam_ids, is_published=True):
+        payloads = build_payloads(exam, list(previous))
+        if payloads:
+            _cache().set_many(payloads, timeout=None)
+
+
+def _rekey_student(student_id, roll_number, date_of_birth, exam_ids):
+    rekey_students({student_id: (roll_number, date_of_birth)}, exam_ids)
+
+
+def _publish_or_withdraw(exam_id):
+    exam = Exam.objects.filter(pk=exam_id).first()
+    if exam is not None and exam.is_published:
+        publish(exam)
+    else:
+        unpublish(exam_id)
+
+
+_scheduled_students = OnCommitBatch(refresh_student)
+_scheduled_exams = OnCommitBatch(_publish_or_withdraw)
+_scheduled_rekeys = OnCommitBatch(_rekey_student)
+
+
+def schedule_refresh(exam_id, student_id):
+    """Refresh a student's payload once the current transaction commits"""
+    _scheduled_students.add(exam_id, student_id)
+
+
+def schedule_publication(exam_id):
+    """Publish (or withdraw) an exam's payloads once the current transaction commits"""
+    _scheduled_exams.add(exam_id)
+
+
+def schedule_rekey(student_id, roll_number, date_of_birth, exam_ids=None):
+    """Re-render a student's payloads under their new details once the current transaction commits"""
+    _scheduled_rekeys.add(student_id, roll_number, date_of_birth, tuple(exam_ids) if exam_ids is not None else None)
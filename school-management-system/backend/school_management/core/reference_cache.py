@@ -0,0 +1,101 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .generations import get_generations
+from .models import AcademicYear, Class, Grade, School, Subject, TransportRoute
+
+REFERENCE_MODELS = (Subject, Grade, Class, AcademicYear, School, TransportRoute)
+
+
+class ReferenceCache:
+    """
+    In-process copy of small, rarely changing reference tables.
+
+    Each table is loaded whole on first use and kept until the model's write
+    generation in the shared cache changes; post_save/post_delete signals bump
+    it, so every worker reloads lazily on its next check. Generations are
+    re-read at the start of each request (see ReferenceCacheMiddleware) and at
+    most every REFERENCE_CACHE_CHECK_INTERVAL seconds otherwise.
+
+    Cached instances are shared between requests and must not be mutated.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._versions = {}
+        self._checked_at = None
+        self._local = threading.local()
+
+    def sync(self, force=False):
+        """Drop tables whose generation changed since they were loaded"""
+        if getattr(self._local, 'pinned', False):
+            return
+        interval = getattr(settings, 'REFERENCE_CACHE_CHECK_INTERVAL', 5.0)
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < interval:
+            return
+        current = get_generations(REFERENCE_MODELS)
+        with self._lock:
+            for model, version in zip(REFERENCE_MODELS, current):
+                if self._versions.get(model) != version:
+                    self._tables.pop(model, None)
+                    self._versions[model] = version
+            self._checked_at = now
+
+    @contextmanager
+    def pinned(self):
+        """Skip generation checks on this thread, e.g. for the sub-requests of one batch"""
+        previous = getattr(self._local, 'pinned', False)
+        self._local.pinned = True
+        try:
+            yield self
+        finally:
+            self._local.pinned = previous
+
+    def discard(self, model):
+        with self._lock:
+            self._tables.pop(model, None)
+            self._versions.pop(model, None)
+
+    def table(self, model):
+        """All rows of a reference model keyed by primary key"""
+        self.sync()
+        rows = self._tables.get(model)
+        if rows is None:
+            rows = {obj.pk: obj for obj in model._default_manager.all()}
+            with self._lock:
+                self._tables[model] = rows
+        return rows
+
+    def get(self, model, pk):
+        if pk is None:
+            return None
+        return self.table(model).get(pk)
+
+    def name(self, model, pk):
+        """The name of a reference row, or None if it is missing"""
+        obj = self.get(model, pk)
+        return obj.name if obj is not None else None
+
+    def active_year(self):
+        """The active AcademicYear, or None"""
+        active = [year for year in self.table(AcademicYear).values() if year.is_active]
+        return min(active, key=lambda year: year.pk, default=None)
+
+
+reference_cache = ReferenceCache()
+
+
+class ReferenceCacheMiddleware:
+    """Re-check reference table generations once at the start of every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reference_cache.sync(force=True)
+        return self.get_response(request)
@@ -0,0 +1,131 @@
+import json
+
+from django.db.models import Count, FloatField, Q, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .attendance_store import AttendanceMatrix
+from .generations import bulk_written
+from .grading import competition_ranks, grade_name, grade_scale, round_score
+from .models import AcademicYear, Class, Mark, ReportCard, Result, Student, Subject
+from .reference_cache import reference_cache
+from .school_calendar import calendar_for
+from .utils import map_in_processes
+
+# Fields regenerated on every run; teacher_comments are written by hand and kept
+GENERATED_FIELDS = ['attendance_percentage', 'class_performance', 'generated_date', 'updated_at']
+
+
+def _percentage(obtained, total):
+    return round_score(obtained * 100 / total) if obtained is not None and total else None
+
+
+def _subject_summary(row, grades):
+    subject = row['exam_schedule__subject']
+    percentage = _percentage(row['obtained'] or 0, row['total'])
+    return {
+        'subject': str(subject),
+        'subject_name': getattr(reference_cache.get(Subject, subject), 'name', None),
+        'obtained': round_score(row['obtained']),
+        'total': row['total'],
+        'percentage': percentage,
+        'grade': grade_name(percentage, grades),
+        'absent': row['absent'],
+    }
+
+
+def build_class_report_cards(class_id, year, term, date_from, date_to):
+    """
+    Unsaved ReportCards of one class's current students for `term`, from the
+    exams starting within date_from..date_to and day-level attendance on the
+    calendar's working days of that window (up to today).
+
+    class_performance holds a JSON summary: marks per subject, the overall
+    result with its rank in the class, and the attendance counts.
+    """
+    students = list(Student.objects.filter(current_class=class_id).values_list('pk', flat=True))
+    if not students:
+        return []
+    exams = {'exam_schedule__exam__academic_year': year,
+             'exam_schedule__exam__start_date__range': (date_from, date_to)}
+    subjects = {}
+    for row in (Mark.objects.filter(student__in=students, **exams)
+                .values('student', 'exam_schedule__subject')
+                .annotate(obtained=Sum(Cast('marks_obtained', FloatField()), filter=Q(is_absent=False)),
+                          total=Sum('exam_schedule__total_marks'), absent=Count('pk', filter=Q(is_absent=True)))
+                .order_by()):
+        subjects.setdefault(row['student'], []).append(row)
+    results = {
+        row['student']: row for row in Result.objects.filter(
+            student__in=students, exam__academic_year=year, exam__start_date__range=(date_from, date_to),
+        ).values('student').annotate(
+            obtained=Sum(Cast('total_marks_obtained', FloatField())), total=Sum('total_marks'),
+            exams=Count('pk'), passed=Count('pk', filter=Q(is_passed=True)),
+        ).order_by()
+    }
+
+    calendar = calendar_for(year)
+    attendance_to = min(date_to, timezone.localdate())
+    working_days = calendar.working_days_between(date_from, attendance_to)
+    matrix = AttendanceMatrix.load(year, students).without_days(calendar.closed_days())
+    attended = {row['student']: row['present'] + row['late']
+                for row in matrix.stats(date_from=date_from, date_to=attendance_to)}
+
+    grades = grade_scale()
+    overall = {student: _percentage(row['obtained'], row['total']) for student, row in results.items()}
+    ranks = competition_ranks(overall.values())
+
+    now = timezone.now()
+    report_cards = []
+    for student in students:
+        result = results.get(student)
+        percentage = overall.get(student)
+        performance = {
+            'subjects': sorted((_subject_summary(row, grades) for row in subjects.get(student, [])),
+                               key=lambda subject: str(subject['subject_name'])),
+            'overall': {
+                'obtained': round_score(result['obtained']),
+                'total': result['total'],
+                'percentage': percentage,
+                'grade': grade_name(percentage, grades),
+                'exams': result['exams'],
+                'exams_passed': result['passed'],
+                'rank': ranks.get(percentage),
+                'ranked_students': len(ranked),
+            } if result else None,
+            'attendance': {'attended': attended.get(student, 0), 'working_days': working_days},
+        }
+        report_cards.append(ReportCard(
+            student_id=student, academic_year=year, term=term, generated_date=now,
+            attendance_percentage=_percentage(attended.get(student, 0), working_days),
+            class_performance=json.dumps(performance),
+        ))
+    return report_cards
+
+
+def generate_class_report_cards(class_id, year_id, term, date_from, date_to):
+    """Build and upsert one class's report cards; returns how many were written"""
+    year = AcademicYear.objects.get(pk=year_id)
+    report_cards = build_class_report_cards(class_id, year, term, date_from, date_to)
+    ReportCard.objects.bulk_create(
+        report_cards, batch_size=500, update_conflicts=True,
+        unique_fields=['student', 'academic_year', 'term'], update_fields=GENERATED_FIELDS,
+    )
+    return len(report_cards)
+
+
+def generate_report_cards(year, term, date_from=None, date_to=None, class_ids=None, workers=1):
+    """
+    Generate (or regenerate) `term`'s report cards for every class of `year`,
+    one class per task; with workers > 1 classes run across a process pool.
+    Returns {class_id: report cards written}.
+    """
+    date_from, date_to = date_from or year.start_date, date_to or year.end_date
+    classes = Class.objects.filter(academic_year=year).order_by('class_number', 'section')
+    if class_ids:
+        classes = classes.filter(pk__in=class_ids)
+    tasks = [(class_id, year.pk, term, date_from, date_to) for class_id in classes.values_list('pk', flat=True)]
+
+    written = map_in_processes(generate_class_report_cards, tasks, workers)
+    bulk_written(ReportCard)
+    return {task[0]: count for task, count in zip(tasks, written)}
@@ -0,0 +1,454 @@
+import re
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import published_results
+from .generations import bulk_written, bump_owner_generations, get_generations
+from .models import AcademicYear, Class, ClassSubject, FeeStructure, Student, TimeTable, Tombstone, YearRollover
+from .reference_cache import reference_cache
+
+# Run in this order, each in its own transaction; rollback undoes them in reverse
+STAGES = ('year', 'classes', 'class_subjects', 'fee_structures', 'timetables', 'students', 'activate')
+
+# Rows the rollover clones into the new year; rolling back deletes them with their classes
+CLONED_MODELS = (ClassSubject, FeeStructure, TimeTable)
+
+
+def _shift(day, years):
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:  # 29 February
+        return day.replace(year=day.year + years, day=28)
+
+
+def next_year_defaults(year):
+    """(name, start_date, end_date) of the year after `year`: every 4-digit year in the name and dates moved on one"""
+    name = re.sub(r'\d{4}', lambda match: str(int(match.group()) + 1), year.name)
+    return name, _shift(year.start_date, 1), _shift(year.end_date, 1)
+
+
+def _roll_number(year_name, class_name, position):
+    fmt = getattr(settings, 'ROLLOVER_ROLL_NUMBER_FORMAT', '{year}-{class_name}-{position:02d}')
+    return fmt.format(year=year_name, class_name=class_name, position=position)
+
+
+def _promotions(from_year):
+    """
+    {class_id: (name of the class it promotes into, section changed)} for the
+    classes of `from_year`: the same section of the next class number, else
+    that number's first section; None for the last class, which graduates.
+    """
+    classes = list(Class.objects.filter(academic_year=from_year).values_list('pk', 'name', 'class_number', 'section'))
+    by_number = {}
+    for _, name, number, section in sorted(classes, key=lambda row: (row[2], row[3])):
+        by_number.setdefault(number, {})[section] = name
+    numbers = sorted(by_number)
+    promotions = {}
+    for pk, _, number, section in classes:
+        position = numbers.index(number)
+        if position + 1 == len(numbers):
+            promotions[pk] = (None, False)
+            continue
+        sections = by_number[numbers[position + 1]]
+        promotions[pk] = (sections.get(section) or next(iter(sections.values())), section not in sections)
+    return promotions
+
+
+def _moves(from_year, to_year_name, held_back):
+    """
+    Where each student of `from_year` goes, by student id: (class id now, roll
+    number now, name of the new class or None if graduating, new roll number,
+    section changed). New roll numbers run alphabetically within each class.
+    """
+    promotions = _promotions(from_year)
+    names = dict(Class.objects.filter(academic_year=from_year).values_list('pk', 'name'))
+    students = Student.objects.filter(current_class__academic_year=from_year).values_list(
+        'pk', 'current_class', 'roll_number', 'user__first_name', 'user__last_name', 'admission_number')
+    by_class = {}
+    targets = {}
+    for pk, class_id, roll_number, first_name, last_name, admission_number in students:
+        target, section_changed = ((names[class_id], False) if pk in held_back else promotions[class_id])
+        targets[pk] = (class_id, roll_number, target, section_changed)
+        if target is not None:
+            by_class.setdefault(target, []).append(((first_name.lower(), last_name.lower(), admission_number), pk))
+    rolls = {}
+    for target, members in by_class.items():
+        for position, (_, pk) in enumerate(sorted(members), start=1):
+            rolls[pk] = _roll_number(to_year_name, target, position)
+    return {pk: (class_id, roll_number, target, rolls.get(pk, roll_number), section_changed)
+            for pk, (class_id, roll_number, target, section_changed) in targets.items()}
+
+
+def _roll_conflicts(moves):
+    max_length = Student._meta.get_field('roll_number').max_length
+    conflicts = [f'Roll number {roll!r} is longer than {max_length} characters'
+                 for roll in sorted({move[3] for move in moves.values()}) if len(roll) > max_length]
+    taken = (Student.objects.exclude(pk__in=list(moves))
+             .filter(roll_number__in=[move[3] for move in moves.values()]).values_list('roll_number', flat=True))
+    conflicts.extend(f'Roll number {roll!r} already belongs to another student' for roll in sorted(taken))
+    return conflicts
+
+
+def plan_rollover(from_year, name, start_date, end_date, held_back=()):
+    """
+    Dry-run diff of rolling `from_year` over into the year `name`: what would
+    be created, where every student would move, and anything that stops it.
+    """
+    held_back = {Student._meta.pk.to_python(pk) for pk in held_back}
+    to_year = AcademicYear.objects.filter(name=name).first()
+    if to_year is not None:
+        start_date, end_date = to_year.start_date, to_year.end_date
+    conflicts = []
+    if to_year is not None and to_year.pk == from_year.pk:
+        conflicts.append('An academic year cannot roll over into itself')
+    if start_date > end_date:
+        conflicts.append('The new year must start before it ends')
+    if start_date <= from_year.end_date:
+        conflicts.append(f'The new year must start after {from_year.name} ends ({from_year.end_date})')
+    if YearRollover.objects.filter(from_year=from_year, status='COMPLETED').exists():
+        conflicts.append(f'{from_year.name} has already been rolled over; roll that back first')
+
+    source = dict(Class.objects.filter(academic_year=from_year).values_list('pk', 'name'))
+    existing = set(Class.objects.filter(academic_year=to_year).values_list('name', flat=True)) if to_year else set()
+    to_clone = [pk for pk, class_name in source.items() if class_name not in existing]
+    moves = _moves(from_year, name, held_back)
+    unknown = held_back - set(moves)
+    if unknown:
+        conflicts.append(f'{len(unknown)} held-back students are not in a class of {from_year.name}')
+    conflicts.extend(_roll_conflicts(moves))
+
+    return {
+        'from_year': {'id': from_year.pk, 'name': from_year.name},
+        'to_year': {'id': to_year.pk if to_year else None, 'name': name, 'start_date': start_date,
+                    'end_date': end_date, 'exists': to_year is not None},
+        'classes': {'create': sorted(source[pk] for pk in to_clone), 'existing': sorted(existing)},
+        'class_subjects': ClassSubject.objects.filter(class_obj__in=to_clone).count(),
+        'fee_structures': FeeStructure.objects.filter(class_obj__in=to_clone).count(),
+        'timetables': TimeTable.objects.filter(class_obj__in=to_clone).count(),
+        'students': {
+            'promoted': sum(1 for pk, move in moves.items() if move[2] is not None and pk not in held_back),
+            'held_back': len(held_back & set(moves)),
+            'graduated': sum(1 for move in moves.values() if move[2] is None),
+            'section_changed': sum(1 for move in moves.values() if move[4]),
+        },
+        'moves': [
+            {'student': pk, 'from_class': source[class_id], 'to_class': target, 'from_roll_number': roll_number,
+             'to_roll_number': new_roll}
+            for pk, (class_id, roll_number, target, new_roll, _) in sorted(moves.items(), key=lambda item: item[1][3])
+        ],
+        'conflicts': conflicts,
+    }
+
+
+def _tombstone_moves(students):
+    # Offline clients of the classes students leave must drop them; bulk writes skip the signals that
+    # record moves one by one
+    Tombstone.objects.bulk_create([
+        Tombstone(model_label=Student._meta.label_lower, object_id=student.pk, class_id=student.current_class_id)
+        for student in students if student.current_class_id is not None
+    ], batch_size=1000)
+
+
+def _rekey_published_results(students):
+    # Published results are cached under the roll numbers about to change; bulk writes skip the signals
+    # that re-render them one by one
+    previous = {student.pk: (student.roll_number, student.date_of_birth) for student in students}
+    transaction.on_commit(partial(published_results.rekey_students, previous))
+
+
+def students_moved_out(year_id):
+    """
+    {student id (str): class id} of the students the year's completed
+    rollover moved out of their classes: the only record of which class a
+    student was in during an earlier year.
+    """
+    key = f'rollover-moved-out:{year_id}'
+    generations = get_generations((YearRollover,))
+    entry = cache.get(key)
+    if entry is not None and entry['generations'] == generations:
+        return entry['data']
+    moved = {}
+    rollovers = YearRollover.objects.filter(from_year=year_id, status='COMPLETED')
+    for snapshot in rollovers.values_list('snapshot', flat=True):
+        for student_id, (class_id, _) in snapshot.get('students', {}).items():
+            moved[student_id] = Class._meta.pk.to_python(class_id)
+    cache.set(key, {'generations': generations, 'data': moved})
+    return moved
+
+
+def class_in_year(student_id, current_class_id, year_id):
+    """The class a student was in during a year: the current one if it is that year's, else the one a rollover
+    moved them out of, else None"""
+    current = reference_cache.get(Class, current_class_id)
+    if current is not None and current.academic_year_id == year_id:
+        return current_class_id
+    return students_moved_out(year_id).get(str(student_id))
+
+
+def _set_rolls(students, fields):
+    # roll_number is unique and checked row by row, so park everyone on a placeholder first
+    # in case one student's new roll number is another's old one
+    originals = {student.pk: student.roll_number for student in students}
+    for student in students:
+        student.roll_number = '~' + student.pk.hex[-19:]
+    Student.objects.bulk_update(students, ['roll_number'], batch_size=1000)
+    for student in students:
+        student.roll_number = originals[student.pk]
+    Student.objects.bulk_update(students, fields, batch_size=1000)
+    # Bulk updates skip the signals that bump each student's own generation
+    transaction.on_commit(partial(bump_owner_generations, Student, list(originals)))
+
+
+def _clone_map(rollover):
+    """{class id in the old year: id of the class cloned from it in the new one}"""
+    created = dict(Class.objects.filter(pk__in=rollover.snapshot.get('classes', [])).values_list('name', 'pk'))
+    return {pk: created[name] for pk, name in Class.objects.filter(academic_year=rollover.from_year)
+            .values_list('pk', 'name') if name in created}
+
+
+def _stage_year(rollover):
+    year = AcademicYear.objects.filter(name=rollover.to_year_name).first()
+    rollover.snapshot['created_year'] = year is None
+    if year is None:
+        year = AcademicYear.objects.create(name=rollover.to_year_name, start_date=rollover.start_date,
+                                           end_date=rollover.end_date, is_active=False)
+    rollover.to_year = year
+    return ()
+
+
+def _stage_classes(rollover):
+    existing = set(Class.objects.filter(academic_year=rollover.to_year).values_list('name', flat=True))
+    clones = [
+        Class(name=source.name, class_number=source.class_number, academic_year=rollover.to_year,
+              class_teacher_id=source.class_teacher_id, capacity=source.capacity, section=source.section)
+        for source in Class.objects.filter(academic_year=rollover.from_year).exclude(name__in=existing)
+    ]
+    Class.objects.bulk_create(clones, batch_size=500)
+    rollover.snapshot['classes'] = [str(clone.pk) for clone in clones]
+    return (Class,)
+
+
+def _stage_class_subjects(rollover):
+    clone_of = _clone_map(rollover)
+    ClassSubject.objects.bulk_create([
+        ClassSubject(class_obj_id=clone_of[row.class_obj_id], subject_id=row.subject_id, teacher_id=row.teacher_id,
+                     is_mandatory=row.is_mandatory)
+        for row in ClassSubject.objects.filter(class_obj__in=list(clone_of))
+    ], batch_size=1000)
+    return (ClassSubject,)
+
+
+def _stage_fee_structures(rollover):
+    clone_of = _clone_map(rollover)
+    years = rollover.start_date.year - rollover.from_year.start_date.year
+    FeeStructure.objects.bulk_create([
+        FeeStructure(academic_year=rollover.to_year, class_obj_id=clone_of[row.class_obj_id], fee_type=row.fee_type,
+                     amount=row.amount, frequency=row.frequency, due_date=_shift(row.due_date, years),
+                     is_active=row.is_active)
+        for row in FeeStructure.objects.filter(class_obj__in=list(clone_of))
+    ], batch_size=1000)
+    return (FeeStructure,)
+
+
+def _stage_timetables(rollover):
+    clone_of = _clone_map(rollover)
+    TimeTable.objects.bulk_create([
+        TimeTable(class_obj_id=clone_of[row.class_obj_id], day_of_week=row.day_of_week,
+                  period_number=row.period_number, subject_id=row.subject_id, teacher_id=row.teacher_id,
+                  start_time=row.start_time, end_time=row.end_time, room_number=row.room_number)
+        for row in TimeTable.objects.filter(class_obj__in=list(clone_of))
+    ], batch_size=1000)
+    return (TimeTable,)
+
+
+def _stage_students(rollover):
+    held_back = {Student._meta.pk.to_python(pk) for pk in rollover.held_back}
+    moves = _moves(rollover.from_year, rollover.to_year_name, held_back)
+    conflicts = _roll_conflicts(moves)
+    if conflicts:
+        raise ValidationError(conflicts)
+    new_classes = dict(Class.objects.filter(academic_year=rollover.to_year).values_list('name', 'pk'))
+    now = timezone.now()
+    students = list(Student.objects.filter(pk__in=list(moves))
+                    .only('pk', 'current_class', 'roll_number', 'date_of_birth'))
+    _tombstone_moves(students)
+    _rekey_published_results(students)
+    for student in students:
+        _, _, target, new_roll, _ = moves[student.pk]
+        student.current_class_id = new_classes[target] if target is not None else None
+        student.roll_number, student.updated_at = new_roll, now
+    _set_rolls(students, ['current_class', 'roll_number', 'updated_at'])
+    rollover.snapshot['students'] = {str(pk): [str(class_id), roll_number]
+                                     for pk, (class_id, roll_number, _, _, _) in moves.items()}
+    return (Student,)
+
+
+def _stage_activate(rollover):
+    active = list(AcademicYear.objects.filter(is_active=True).exclude(pk=rollover.to_year_id)
+                  .values_list('pk', flat=True))
+    rollover.snapshot['active'] = {'deactivated': [str(pk) for pk in active],
+                                   'was_active': rollover.to_year.is_active}
+    AcademicYear.objects.filter(pk__in=active).update(is_active=False)
+    AcademicYear.objects.filter(pk=rollover.to_year_id).update(is_active=True)
+    return (AcademicYear,)
+
+
+STAGE_RUNNERS = {
+    'year': _stage_year,
+    'classes': _stage_classes,
+    'class_subjects': _stage_class_subjects,
+    'fee_structures': _stage_fee_structures,
+    'timetables': _stage_timetables,
+    'students': _stage_students,
+    'activate': _stage_activate,
+}
+
+
+def run_rollover(rollover):
+    """Run the stages `rollover` has not completed yet, each in one transaction; safe to re-run after a failure"""
+    for stage in STAGES:
+        if stage in rollover.completed_stages:
+            continue
+        try:
+            with transaction.atomic():
+                written = STAGE_RUNNERS[stage](rollover)
+                rollover.completed_stages = [*rollover.completed_stages, stage]
+                rollover.save()
+        except Exception:
+            # Forget what the failed stage recorded in memory; the database has already dropped it
+            rollover.refresh_from_db()
+            raise
+        bulk_written(*written)
+    rollover.status, rollover.completed_at = 'COMPLETED', timezone.now()
+    rollover.save()
+    return rollover
+
+
+def start_rollover(from_year, name, start_date, end_date, held_back=(), user=None):
+    """
+    Roll `from_year` over into a new year `name`, or resume the rollover of
+    `from_year` that an earlier failure left in progress. Raises
+    ValidationError with the plan's conflicts instead of starting.
+    """
+    rollover = YearRollover.objects.filter(from_year=from_year, status='IN_PROGRESS').first()
+    if rollover is not None:
+        return run_rollover(rollover)
+    plan = plan_rollover(from_year, name, start_date, end_date, held_back)
+    if plan['conflicts']:
+        raise ValidationError(plan['conflicts'])
+    rollover = YearRollover.objects.create(
+        from_year=from_year, to_year_name=name,
+        start_date=plan['to_year']['start_date'], end_date=plan['to_year']['end_date'],
+        held_back=[str(pk) for pk in held_back], performed_by=user)
+    return run_rollover(rollover)
+
+
+def _created(rollover):
+    """(ids of the classes, id of the year or None) the rollover created and rollback deletes"""
+    year = rollover.to_year_id if rollover.snapshot.get('created_year') else None
+    return rollover.snapshot.get('classes', []), year
+
+
+def rollback_blockers(rollover):
+    """Rows added since the rollover that rolling it back would delete or orphan, as messages"""
+    classes, year = _created(rollover)
+    blockers = []
+    admitted = Student.objects.filter(current_class__in=classes).exclude(
+        pk__in=list(rollover.snapshot.get('students', {}))).count()
+    if admitted:
+        blockers.append(f'{admitted} students have been placed in the new classes since the rollover')
+    for model, ids in ((Class, classes), (AcademicYear, [year] if year else [])):
+        if not ids:
+            continue
+        for relation in model._meta.related_objects:
+            related = relation.related_model
+            if related in (Class, Student, YearRollover, *CLONED_MODELS):
+                continue
+            count = related._default_manager.filter(**{f'{relation.field.name}__in': ids}).count()
+            if count:
+                blockers.append(f'{count} {related._meta.verbose_name_plural} belong to the new '
+                                f'{model._meta.verbose_name}')
+    return blockers
+
+
+def _undo_students(rollover):
+    previous = rollover.snapshot.get('students', {})
+    students = list(Student.objects.filter(pk__in=list(previous))
+                    .only('pk', 'current_class', 'roll_number', 'date_of_birth'))
+    _tombstone_moves(students)
+    _rekey_published_results(students)
+    now = timezone.now()
+    for student in students:
+        class_id, roll_number = previous[str(student.pk)]
+        student.current_class_id = class_id
+        student.roll_number, student.updated_at = roll_number, now
+    _set_rolls(students, ['current_class', 'roll_number', 'updated_at'])
+    return (Student,)
+
+
+def _undo_activate(rollover):
+    active = rollover.snapshot.get('active', {})
+    AcademicYear.objects.filter(pk__in=active.get('deactivated', [])).update(is_active=True)
+    AcademicYear.objects.filter(pk=rollover.to_year_id).update(is_active=active.get('was_active', False))
+    return (AcademicYear,)
+
+
+def _undo_cloned(model):
+    def undo(rollover):
+        model.objects.filter(class_obj__in=rollover.snapshot.get('classes', [])).delete()
+        return ()
+    return undo
+
+
+def _undo_classes(rollover):
+    Class.objects.filter(pk__in=rollover.snapshot.get('classes', [])).delete()
+    return ()
+
+
+def _undo_year(rollover):
+    _, year = _created(rollover)
+    if year:
+        AcademicYear.objects.filter(pk=year).delete()
+        rollover.to_year = None
+    return ()
+
+
+STAGE_UNDOERS = {
+    'year': _undo_year,
+    'classes': _undo_classes,
+    'class_subjects': _undo_cloned(ClassSubject),
+    'fee_structures': _undo_cloned(FeeStructure),
+    'timetables': _undo_cloned(TimeTable),
+    'students': _undo_students,
+    'activate': _undo_activate,
+}
+
+
+def rollback_rollover(rollover, force=False):
+    """
+    Undo a completed or partly-run rollover, stage by stage in reverse: restore
+    activation and students' classes and roll numbers, then delete the cloned
+    rows, classes and year it created. Unless forced, refuses (ValidationError)
+    while the new year has rows of its own that would go with them.
+    """
+    if rollover.status == 'ROLLED_BACK':
+        raise ValidationError('This rollover has already been rolled back')
+    blockers = [] if force else rollback_blockers(rollover)
+    if blockers:
+        raise ValidationError(blockers)
+    for stage in reversed(STAGES):
+        if stage not in rollover.completed_stages:
+            continue
+        with transaction.atomic():
+            written = STAGE_UNDOERS[stage](rollover)
+            rollover.completed_stages = [done for done in rollover.completed_stages if done != stage]
+            rollover.save()
+        bulk_written(*written)
+    rollover.status = 'ROLLED_BACK'
+    rollover.save()
+    return rollover
@@ -0,0 +1,117 @@
+import threading
+from bisect import bisect_left
+from datetime import date, timedelta
+
+from .generations import get_generations
+from .models import AcademicYear, Class, Event, TimeTable
+from .reference_cache import reference_cache
+
+# Everything a calendar is built from; a write to any of them rebuilds it
+CALENDAR_MODELS = (AcademicYear, Class, Event, TimeTable)
+
+# Monday to Friday, for years without a timetable yet
+DEFAULT_WEEKDAYS = frozenset(range(5))
+
+
+def year_for(day):
+    """The academic year containing `day` (the latest-starting one if years overlap), or None"""
+    years = [year for year in reference_cache.table(AcademicYear).values() if year.start_date <= day <= year.end_date]
+    return max(years, key=lambda year: year.start_date, default=None)
+
+
+class SchoolCalendar:
+    """
+    Working days of one academic year: the weekdays its classes have
+    timetable slots on, minus holiday events.
+
+    Built once into a prefix count over the year's calendar days (how many
+    working days precede each one) plus the sorted working days themselves,
+    so counting working days in a range and indexing a date are O(1) and
+    stepping by working days is O(log n). Dates outside the year are clamped
+    to it.
+    """
+
+    def __init__(self, year, weekdays, holidays):
+        self.year = year
+        self.weekdays = frozenset(weekdays)
+        self.holidays = frozenset(day for day in holidays if year.start_date <= day <= year.end_date)
+        self._start = year.start_date.toordinal()
+        length = year.end_date.toordinal() - self._start + 1
+        self._preceding = [0] * (length + 1)
+        self._working = []
+        for offset in range(length):
+            day = date.fromordinal(self._start + offset)
+            is_working = day.weekday() in self.weekdays and day not in self.holidays
+            if is_working:
+                self._working.append(day.toordinal())
+            self._preceding[offset + 1] = len(self._working)
+
+    @classmethod
+    def build(cls, year):
+        weekdays = {day - 1 for day in (TimeTable.objects.filter(class_obj__academic_year=year)
+                                        .values_list('day_of_week', flat=True).distinct())}
+        holidays = set()
+        events = Event.objects.filter(is_holiday=True, start_date__lte=year.end_date, end_date__gte=year.start_date)
+        for start, end in events.values_list('start_date', 'end_date'):
+            day = max(start, year.start_date)
+            while day <= min(end, year.end_date):
+                holidays.add(day)
+                day += timedelta(days=1)
+        return cls(year, weekdays or DEFAULT_WEEKDAYS, holidays)
+
+    def _offset(self, day):
+        return min(max(day.toordinal() - self._start, 0), len(self._preceding) - 1)
+
+    @property
+    def total_working_days(self):
+        return len(self._working)
+
+    def is_working_day(self, day):
+        offset = day.toordinal() - self._start
+        return 0 <= offset < len(self._preceding) - 1 and self._preceding[offset + 1] > self._preceding[offset]
+
+    def working_days_between(self, date_from=None, date_to=None):
+        """Working days from `date_from` to `date_to` inclusive (default: the year's bounds)"""
+        start = self._offset(date_from) if date_from else 0
+        end = self._offset(date_to + timedelta(days=1)) if date_to else len(self._preceding) - 1
+        return max(self._preceding[end] - self._preceding[start], 0)
+
+    def day_index(self, day):
+        """0-based position of `day` among the year's working days, or None if it is not one"""
+        return self._preceding[self._offset(day)] if self.is_working_day(day) else None
+
+    def working_day(self, index):
+        """The `index`-th (0-based) working day of the year, or None past its end"""
+        return date.fromordinal(self._working[index]) if 0 <= index < len(self._working) else None
+
+    def add_working_days(self, day, count):
+        """The working day `count` working days after `day` (0: `day` or the next working day), or None"""
+        return self.working_day(bisect_left(self._working, day.toordinal()) + count)
+
+    def closed_days(self):
+        """Every calendar day of the year that is not a working day"""
+        working = set(self._working)
+        return [date.fromordinal(ordinal) for ordinal in range(self._start, self._start + len(self._preceding) - 1)
+                if ordinal not in working]
+
+
+_lock = threading.Lock()
+_calendars = {}
+
+
+def calendar_for(year):
+    """The cached SchoolCalendar of `year`, rebuilt when one of CALENDAR_MODELS has been written"""
+    generations = get_generations(CALENDAR_MODELS)
+    cached = _calendars.get(year.pk)
+    if cached is not None and cached[0] == generations:
+        return cached[1]
+    calendar = SchoolCalendar.build(year)
+    with _lock:
+        _calendars[year.pk] = (generations, calendar)
+    return calendar
+
+
+def calendar_on(day):
+    """The calendar of the academic year containing `day`, or None"""
+    year = year_for(day)
+    return calendar_for(year) if year is not None else None
@@ -0,0 +1,254 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .attendance_rollups import class_on, schedule_class_move, schedule_rollup
+from .attendance_store import schedule_refresh as schedule_store_refresh
+from .generations import bump_generation, bump_owner_generations
+from .models import (
+    AttendanceRecord, Class, ClassDiary, Exam, ExamSchedule, FeePayment, Homework, HomeworkSubmission, Mark,
+    Notification, Parent, Result, Student, StudentParent, TimeTable, Tombstone, User,
+)
+from .published_results import (
+    published_exams_of, schedule_publication, schedule_refresh as schedule_result_refresh, schedule_rekey,
+)
+from .reference_cache import REFERENCE_MODELS, reference_cache
+
+
+def _bump(model):
+    bump_generation(model)
+    if model in REFERENCE_MODELS:
+        reference_cache.discard(model)
+
+
+@receiver(post_save, dispatch_uid='core-generation-save')
+@receiver(post_delete, dispatch_uid='core-generation-delete')
+def bump_model_generation(sender, **kwargs):
+    if sender._meta.app_label == 'core':
+        transaction.on_commit(partial(_bump, sender))
+
+
+@receiver(m2m_changed, dispatch_uid='core-generation-m2m')
+def bump_m2m_generation(sender, instance, action, model, **kwargs):
+    if not action.startswith('post_'):
+        return
+    for changed in (type(instance), model):
+        if changed._meta.app_label == 'core':
+            transaction.on_commit(partial(_bump, changed))
+
+
+# Rows that belong to one row of another model, with that owner's model and the attribute holding its pk: writes
+# also bump the owner's own generation (see generations.get_owner_generations), so a cache of one parent's children
+# survives everyone else's attendance, fees and results
+OWNERS = {
+    Student: (Student, 'pk'),
+    AttendanceRecord: (Student, 'student_id'),
+    FeePayment: (Student, 'student_id'),
+    HomeworkSubmission: (Student, 'student_id'),
+    Result: (Student, 'student_id'),
+    Parent: (Parent, 'pk'),
+    StudentParent: (Parent, 'parent_id'),
+    Homework: (Class, 'class_obj_id'),
+    User: (User, 'pk'),
+}
+
+
+def _bump_owners(model, pks):
+    pks = [pk for pk in pks if pk is not None]
+    if pks:
+        transaction.on_commit(partial(bump_owner_generations, model, pks))
+
+
+@receiver(post_save, dispatch_uid='core-owner-generation-save')
+@receiver(post_delete, dispatch_uid='core-owner-generation-delete')
+def bump_owner_generation(sender, instance, **kwargs):
+    if sender in OWNERS:
+        model, attribute = OWNERS[sender]
+        _bump_owners(model, [getattr(instance, attribute)])
+
+
+@receiver(post_save, sender=Notification, dispatch_uid='core-owner-generation-notification')
+def bump_notification_recipients(sender, instance, created=False, **kwargs):
+    # Marking a notification read changes its recipients' unread counts; a new one has no recipients yet
+    if not created:
+        _bump_owners(User, instance.recipients.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Notification, dispatch_uid='core-owner-generation-notification-delete')
+def bump_deleted_notification_recipients(sender, instance, **kwargs):
+    # The recipient links are deleted with it, without m2m_changed
+    _bump_owners(User, instance.recipients.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Notification.recipients.through, dispatch_uid='core-owner-generation-recipients')
+def bump_changed_recipients(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action.startswith('post_'):
+            _bump_owners(User, [instance.pk])
+    elif action == 'pre_clear':
+        _bump_owners(User, instance.recipients.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        _bump_owners(User, pk_set)
+
+
+# Models offline clients sync (see api.sync), with the attribute naming the class each row belongs to
+TOMBSTONE_MODELS = {
+    Student: 'current_class_id',
+    TimeTable: 'class_obj_id',
+    Homework: 'class_obj_id',
+    ClassDiary: 'class_obj_id',
+}
+
+
+def sync_audience(instance):
+    """Users who sync `instance` as their own rather than through its class: a student and their parents"""
+    if not isinstance(instance, Student):
+        return []
+    parents = StudentParent.objects.filter(student=instance.pk).values_list('parent__user', flat=True)
+    return [instance.user_id, *parents]
+
+
+def write_tombstones(instance, audience=None):
+    """
+    Record the delete of `instance` for its class's clients and, separately,
+    for each user of its audience (default: sync_audience()), so they still
+    get it once the links that put the row in their scope are gone too.
+    """
+    model = type(instance)
+    label = model._meta.label_lower
+    Tombstone.objects.create(model_label=label, object_id=instance.pk,
+                             class_id=getattr(instance, TOMBSTONE_MODELS[model]))
+    for user_id in (sync_audience(instance) if audience is None else audience):
+        Tombstone.objects.create(model_label=label, object_id=instance.pk, user_id=user_id)
+
+
+@receiver(pre_delete, sender=Student, dispatch_uid='core-sync-audience')
+def remember_sync_audience(sender, instance, **kwargs):
+    # The student's parent links are deleted before its post_delete runs
+    instance._sync_audience = sync_audience(instance)
+
+
+@receiver(post_delete, dispatch_uid='core-sync-tombstone')
+def record_tombstone(sender, instance, **kwargs):
+    if sender in TOMBSTONE_MODELS:
+        write_tombstones(instance, getattr(instance, '_sync_audience', None))
+
+
+@receiver(pre_save, dispatch_uid='core-sync-class-move')
+def record_class_move(sender, instance, raw=False, **kwargs):
+    # A row moved to another class leaves the old class's scope: its clients must drop it
+    class_attr = TOMBSTONE_MODELS.get(sender)
+    if class_attr is None or raw or instance._state.adding:
+        return
+    previous = sender._base_manager.filter(pk=instance.pk).values_list(class_attr, flat=True).first()
+    if previous is not None and previous != getattr(instance, class_attr):
+        Tombstone.objects.create(model_label=sender._meta.label_lower, object_id=instance.pk, class_id=previous)
+
+
+@receiver(post_delete, sender=StudentParent, dispatch_uid='core-sync-unlinked-parent')
+def record_unlinked_parent(sender, instance, **kwargs):
+    # The child leaves the parent's scope (even if the student stays)
+    user_id = Parent.objects.filter(pk=instance.parent_id).values_list('user', flat=True).first()
+    if user_id is not None:
+        Tombstone.objects.create(model_label=Student._meta.label_lower, object_id=instance.student_id,
+                                 user_id=user_id)
+
+
+@receiver(pre_save, sender=AttendanceRecord, dispatch_uid='core-attendance-rollup-previous')
+def remember_attendance_rollup(sender, instance, **kwargs):
+    # An edit may move the record to another day, subject, class or student; those aggregates need a recount too
+    instance._rollup_previous = None
+    if not instance._state.adding:
+        instance._rollup_previous = (AttendanceRecord.objects.filter(pk=instance.pk)
+                                     .values('student', 'student__current_class', 'date', 'subject').first())
+
+
+def _schedule_attendance_aggregates(student_id, class_id, day, subject_id):
+    # `class_id` is the student's current class; the record counts for the class they were in on the day
+    schedule_rollup(class_on(student_id, class_id, day), day, subject_id)
+    if subject_id is None:
+        schedule_store_refresh(student_id, day)
+
+
+@receiver(post_save, sender=AttendanceRecord, dispatch_uid='core-attendance-rollup-save')
+def update_attendance_rollup(sender, instance, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        _schedule_attendance_aggregates(
+            previous['student'], previous['student__current_class'], previous['date'], previous['subject'])
+    _schedule_attendance_aggregates(
+        instance.student_id, instance.student.current_class_id, instance.date, instance.subject_id)
+
+
+@receiver(post_delete, sender=AttendanceRecord, dispatch_uid='core-attendance-rollup-delete')
+def remove_attendance_rollup(sender, instance, **kwargs):
+    class_id = Student.objects.filter(pk=instance.student_id).values_list('current_class', flat=True).first()
+    _schedule_attendance_aggregates(instance.student_id, class_id, instance.date, instance.subject_id)
+
+
+@receiver(pre_save, sender=Student, dispatch_uid='core-attendance-rollup-class-move')
+def recount_moved_student(sender, instance, raw=False, **kwargs):
+    # The student's records leave the old class's rollups for the new one's (rollovers bulk update and
+    # keep their own history instead)
+    if raw or instance._state.adding:
+        return
+    previous = Student.objects.filter(pk=instance.pk).values_list('current_class', flat=True).first()
+    if previous != instance.current_class_id:
+        schedule_class_move(instance.pk, previous, instance.current_class_id)
+
+
+@receiver(pre_save, sender=Exam, dispatch_uid='core-published-results-previous')
+def remember_exam_publication(sender, instance, **kwargs):
+    instance._was_published = (not instance._state.adding
+                               and Exam.objects.filter(pk=instance.pk, is_published=True).exists())
+
+
+@receiver(post_save, sender=Exam, dispatch_uid='core-published-results-exam')
+def update_published_results(sender, instance, **kwargs):
+    # Publishing (or saving a published exam, whose name is in every payload) pre-renders its results;
+    # unpublishing withdraws them
+    if instance.is_published or getattr(instance, '_was_published', False):
+        schedule_publication(instance.pk)
+
+
+@receiver(post_delete, sender=Exam, dispatch_uid='core-published-results-exam-delete')
+def withdraw_published_results(sender, instance, **kwargs):
+    if instance.is_published:
+        schedule_publication(instance.pk)
+
+
+@receiver(post_save, sender=Mark, dispatch_uid='core-published-results-mark-save')
+@receiver(post_delete, sender=Mark, dispatch_uid='core-published-results-mark-delete')
+def refresh_published_mark(sender, instance, **kwargs):
+    exam_id = (ExamSchedule.objects.filter(pk=instance.exam_schedule_id, exam__is_published=True)
+               .values_list('exam', flat=True).first())
+    if exam_id is not None:
+        schedule_result_refresh(exam_id, instance.student_id)
+
+
+@receiver(post_save, sender=Result, dispatch_uid='core-published-results-result-save')
+@receiver(post_delete, sender=Result, dispatch_uid='core-published-results-result-delete')
+def refresh_published_result(sender, instance, **kwargs):
+    if Exam.objects.filter(pk=instance.exam_id, is_published=True).exists():
+        schedule_result_refresh(instance.exam_id, instance.student_id)
+
+
+@receiver(pre_save, sender=Student, dispatch_uid='core-published-results-student')
+def rekey_published_results(sender, instance, raw=False, **kwargs):
+    # Payloads are cached under the roll number and date of birth they are looked up with, and show the class
+    if raw or instance._state.adding:
+        return
+    previous = (Student.objects.filter(pk=instance.pk)
+                .values_list('roll_number', 'date_of_birth', 'current_class').first())
+    if previous is not None and previous != (instance.roll_number, instance.date_of_birth, instance.current_class_id):
+        schedule_rekey(instance.pk, *previous[:2])
+
+
+@receiver(pre_delete, sender=Student, dispatch_uid='core-published-results-student-delete')
+def withdraw_student_results(sender, instance, **kwargs):
+    # Look the exams up now: the student's marks and results are deleted before the transaction commits
+    exam_ids = published_exams_of([instance.pk])
+    if exam_ids:
+        schedule_rekey(instance.pk, instance.roll_number, instance.date_of_birth, exam_ids)
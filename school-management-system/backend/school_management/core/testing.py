@@ -0,0 +1,19 @@
+from datetime import date
+
+from .models import Student, User
+from .reference_cache import REFERENCE_MODELS, reference_cache
+
+
+def clear_reference_cache():
+    # Generations are bumped on commit, which never happens inside a test: drop cached tables by hand
+    for model in REFERENCE_MODELS:
+        reference_cache.discard(model)
+    reference_cache.sync(force=True)
+
+
+def make_student(class_obj, number):
+    """Student `number` of `class_obj`, roll number R<number>, admitted when the class's year starts"""
+    user = User.objects.create(username=f'student{number}', first_name='Student', last_name=str(number))
+    return Student.objects.create(user=user, roll_number=f'R{number}', admission_number=f'A{number}',
+                                  admission_date=class_obj.academic_year.start_date, current_class=class_obj,
+                                  date_of_birth=date(2014, 1, number), gender='M')
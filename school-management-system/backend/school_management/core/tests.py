@@ -0,0 +1,314 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+
+from . import archive, published_results
+from .attendance_store import AttendanceMatrix, rebuild_year
+from .attendance_rollups import rebuild_rollups
+from .documents import DOCUMENTS, class_report_cards
+from .models import (
+    AcademicYear, AttendanceDailyRollup, AttendanceRecord, Class, Exam, ExamSchedule, Mark, ReportCard, Result, Student,
+    Subject, User, YearRollover,
+)
+from .rollover import STAGE_RUNNERS, plan_rollover, rollback_rollover, start_rollover
+from .school_calendar import SchoolCalendar
+from .testing import clear_reference_cache, make_student
+
+
+class CoreTestCase(TestCase):
+    """A 2024 year with classes 5A and 6A and two students in 5A"""
+
+    def setUp(self):
+        clear_reference_cache()
+        self.year = AcademicYear.objects.create(name='2024-2025', start_date=date(2024, 4, 1),
+                                                end_date=date(2025, 3, 31), is_active=False)
+        self.class_5a = Class.objects.create(name='5A', class_number=5, academic_year=self.year)
+        self.class_6a = Class.objects.create(name='6A', class_number=6, academic_year=self.year)
+        self.admin = User.objects.create(username='admin', role='ADMIN', is_superuser=True)
+        self.students = [make_student(self.class_5a, number) for number in (1, 2)]
+
+    def mark(self, student, day, status='PRESENT'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AttendanceRecord.objects.create(student=student, date=day, status=status, marked_by=self.admin)
+
+    def roll_over(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rollover = start_rollover(self.year, '2025-2026', date(2025, 4, 1), date(2026, 3, 31))
+        clear_reference_cache()
+        return rollover
+
+
+
+class SchoolCalendarTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        # 2024-04-01 is a Monday; Wednesday the 3rd is a holiday
+        self.calendar = SchoolCalendar(self.year, range(5), {date(2024, 4, 3), date(2023, 12, 25)})
+
+    def test_working_days_between(self):
+        calendar = self.calendar
+        self.assertEqual(calendar.working_days_between(date(2024, 4, 1), date(2024, 4, 7)), 4)
+        self.assertEqual(calendar.working_days_between(date(2024, 4, 6), date(2024, 4, 7)), 0)
+        self.assertEqual(calendar.working_days_between(date(2024, 4, 5), date(2024, 4, 1)), 0)
+        # Clamped to the year
+        self.assertEqual(calendar.working_days_between(date(2024, 3, 1), date(2024, 4, 2)), 2)
+        self.assertEqual(calendar.working_days_between(date(2025, 3, 31), date(2025, 5, 1)), 1)
+        self.assertEqual(calendar.working_days_between(), calendar.total_working_days)
+        self.assertEqual(calendar.total_working_days, 260)
+
+    def test_day_index(self):
+        indexes = [self.calendar.day_index(date(2024, 4, day)) for day in range(1, 9)]
+        self.assertEqual(indexes, [0, 1, None, 2, 3, None, None, 4])
+        self.assertIsNone(self.calendar.day_index(date(2024, 3, 29)))
+        self.assertEqual(self.calendar.day_index(date(2025, 3, 31)), self.calendar.total_working_days - 1)
+
+    def test_add_working_days(self):
+        calendar = self.calendar
+        self.assertEqual(calendar.add_working_days(date(2024, 4, 2), 1), date(2024, 4, 4))
+        self.assertEqual(calendar.add_working_days(date(2024, 4, 3), 0), date(2024, 4, 4))
+        self.assertEqual(calendar.add_working_days(date(2024, 4, 6), 0), date(2024, 4, 8))
+        self.assertEqual(calendar.add_working_days(date(2024, 4, 5), 1), date(2024, 4, 8))
+        self.assertEqual(calendar.add_working_days(date(2024, 3, 1), 0), date(2024, 4, 1))
+        self.assertEqual(calendar.add_working_days(date(2025, 3, 31), 0), date(2025, 3, 31))
+        self.assertIsNone(calendar.add_working_days(date(2025, 3, 31), 1))
+
+class RolloverTests(CoreTestCase):
+    def placements(self):
+        return {student.roll_number: (student.current_class.name, student.current_class.academic_year.name)
+                for student in Student.objects.select_related('current_class__academic_year')}
+
+    def test_plan_changes_nothing(self):
+        plan = plan_rollover(self.year, '2025-2026', date(2025, 4, 1), date(2026, 3, 31))
+        self.assertEqual(plan['conflicts'], [])
+        self.assertEqual(plan['classes']['create'], ['5A', '6A'])
+        self.assertEqual(plan['students']['promoted'], 2)
+        self.assertFalse(AcademicYear.objects.filter(name='2025-2026').exists())
+        self.assertEqual(self.placements(), {'R1': ('5A', '2024-2025'), 'R2': ('5A', '2024-2025')})
+
+    def test_failed_stage_resumes_where_it_stopped(self):
+        failing = mock.Mock(side_effect=RuntimeError('connection lost'))
+        with mock.patch.dict(STAGE_RUNNERS, students=failing), self.assertRaises(RuntimeError):
+            self.roll_over()
+        rollover = YearRollover.objects.get(from_year=self.year)
+        self.assertEqual(rollover.status, 'IN_PROGRESS')
+        self.assertNotIn('students', rollover.completed_stages)
+        self.assertEqual(self.placements(), {'R1': ('5A', '2024-2025'), 'R2': ('5A', '2024-2025')})
+
+        self.assertEqual(self.roll_over().pk, rollover.pk)
+        self.assertEqual(Class.objects.filter(academic_year__name='2025-2026').count(), 2)
+        self.assertEqual(set(self.placements().values()), {('6A', '2025-2026')})
+
+    def test_rollback_waits_for_new_rows_then_restores_classes_and_rolls(self):
+        rollover = self.roll_over()
+        exam = Exam.objects.create(name='Unit 1', exam_type='Unit Test', academic_year=rollover.to_year,
+                                   start_date=date(2025, 6, 1), end_date=date(2025, 6, 5))
+        with self.assertRaises(ValidationError):
+            rollback_rollover(rollover)
+        exam.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            rollback_rollover(rollover)
+        self.assertEqual(self.placements(), {'R1': ('5A', '2024-2025'), 'R2': ('5A', '2024-2025')})
+        self.assertFalse(AcademicYear.objects.filter(name='2025-2026').exists())
+        self.assertEqual(YearRollover.objects.get().status, 'ROLLED_BACK')
+
+
+class AttendanceRollupTests(CoreTestCase):
+    def rollups(self):
+        return {(rollup.class_obj.name, rollup.class_obj.academic_year.name, rollup.date): rollup.present
+                for rollup in AttendanceDailyRollup.objects.select_related('class_obj__academic_year')}
+
+    def test_records_stay_with_the_class_of_their_year_after_rollover(self):
+        day = date(2024, 6, 3)
+        records = [self.mark(student, day) for student in self.students]
+        self.roll_over()
+        expected = {('5A', '2024-2025', day): 2}
+        self.assertEqual(self.rollups(), expected)
+
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), expected)
+
+        # Correcting an old record recounts the old class, not the student's new one
+        with self.captureOnCommitCallbacks(execute=True):
+            records[0].status = 'ABSENT'
+            records[0].save()
+        self.assertEqual(self.rollups(), {('5A', '2024-2025', day): 1})
+
+    def test_class_change_takes_earlier_records_to_the_new_class(self):
+        day = date(2024, 6, 3)
+        for student in self.students:
+            self.mark(student, day)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.students[0].current_class = self.class_6a
+            self.students[0].save()
+        expected = {('5A', '2024-2025', day): 1, ('6A', '2024-2025', day): 1}
+        self.assertEqual(self.rollups(), expected)
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), expected)
+
+    def test_new_year_records_count_for_the_new_class(self):
+        self.roll_over()
+        student = Student.objects.get(pk=self.students[0].pk)
+        day = date(2025, 4, 2)
+        self.mark(student, day)
+        self.assertEqual(self.rollups(), {('6A', '2025-2026', day): 1})
+        rebuild_rollups(date_from=day - timedelta(days=1))
+        self.assertEqual(self.rollups(), {('6A', '2025-2026', day): 1})
+
+
+class AttendanceStoreTests(CoreTestCase):
+    def test_rebuild_keeps_students_admitted_on_the_same_day_apart(self):
+        # Both students share an admission date, which is all Student's default ordering sorts by
+        for day in (date(2024, 6, 3), date(2024, 6, 4)):
+            for student, status in zip(self.students, ('PRESENT', 'ABSENT')):
+                AttendanceRecord.objects.create(student=student, date=day, status=status, marked_by=self.admin)
+        self.assertEqual(rebuild_year(self.year), 2)
+        stats = AttendanceMatrix.load(self.year).stats()
+        self.assertEqual({row['student']: (row['present'], row['absent']) for row in stats},
+                         {self.students[0].pk: (2, 0), self.students[1].pk: (0, 2)})
+
+
+class ReportCardTests(CoreTestCase):
+    def test_past_year_cards_print_with_the_class_of_their_year(self):
+        for student in self.students:
+            ReportCard.objects.create(student=student, academic_year=self.year, term='Final')
+        self.roll_over()
+        cards = list(class_report_cards(str(self.class_5a.pk), str(self.year.pk), 'Final'))
+        self.assertEqual([card.student.admission_number for card in cards], ['A1', 'A2'])
+        context = DOCUMENTS['report_card'].context(cards[0])
+        self.assertEqual((context['class_name'], context['academic_year']), ('5A', '2024-2025'))
+        self.assertFalse(class_report_cards(self.class_6a.pk, self.year.pk, 'Final').exists())
+
+
+class ArchiveTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        storage = self.settings(MEDIA_ROOT=media.name)
+        storage.enable()
+        self.addCleanup(storage.disable)
+        days = [date(2024, 6, 3) + timedelta(days=offset) for offset in range(3)]
+        self.records = [AttendanceRecord.objects.create(student=student, date=day, status=status, marked_by=self.admin)
+                        for student, status in ((self.students[0], 'PRESENT'), (self.students[1], 'ABSENT'))
+                        for day in days]
+
+    def test_interrupted_archive_resumes_without_losing_rows(self):
+        delete_rows = archive._delete_rows
+        calls = []
+
+        def dies_on_second_chunk(model, pks):
+            calls.append(pks)
+            if len(calls) == 2:
+                raise RuntimeError('worker killed')
+            delete_rows(model, pks)
+
+        with mock.patch.object(archive, '_delete_rows', dies_on_second_chunk), self.assertRaises(RuntimeError):
+            archive.archive_year(self.year, ['attendance'], chunk_size=4)
+        self.assertEqual(archive.archive_status(self.year)['attendance'], {'archived': 4, 'remaining': 2})
+
+        self.assertEqual(archive.archive_year(self.year, ['attendance'], chunk_size=4), {'attendance': 2})
+        self.assertEqual(archive.archive_status(self.year)['attendance'], {'archived': 6, 'remaining': 0})
+        archived = list(archive.iter_archived(self.year, 'attendance'))
+        self.assertEqual(sorted(row['id'] for row in archived), sorted(str(record.pk) for record in self.records))
+        absent = list(archive.iter_archived(self.year, 'attendance', student=self.students[1].pk))
+        self.assertEqual({row['status'] for row in absent}, {'ABSENT'})
+        self.assertEqual(len(absent), 3)
+
+    def test_attendance_counts_survive_from_the_packed_store(self):
+        archive.archive_year(self.year, ['attendance'])
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertEqual([year.pk for year in archive.archived_years('attendance')], [self.year.pk])
+        stats = AttendanceMatrix.load(self.year, [student.pk for student in self.students]).stats()
+        self.assertEqual({row['student']: (row['present'], row['absent']) for row in stats},
+                         {self.students[0].pk: (3, 0), self.students[1].pk: (0, 3)})
+
+
+class PublishedResultsTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['results'].clear()
+        self.exam = Exam.objects.create(name='Finals', exam_type='Final', academic_year=self.year,
+                                        start_date=date(2025, 3, 1), end_date=date(2025, 3, 10))
+        schedule = ExamSchedule.objects.create(exam=self.exam, class_obj=self.class_5a,
+                                               subject=Subject.objects.create(name='Maths', code='MATH'),
+                                               exam_date=date(2025, 3, 1), start_time=time(9), end_time=time(12),
+                                               total_marks=100)
+        self.marks = [Mark.objects.create(exam_schedule=schedule, student=student, marks_obtained=Decimal(60 + i))
+                      for i, student in enumerate(self.students)]
+        for i, student in enumerate(self.students):
+            Result.objects.create(exam=self.exam, student=student, total_marks_obtained=Decimal(60 + i),
+                                  total_marks=100, percentage=Decimal(60 + i), is_passed=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.exam.is_published = True
+            self.exam.save()
+
+    def lookup(self, student):
+        return published_results.lookup(self.exam.pk, student.roll_number.lower(), student.date_of_birth)
+
+    def test_lookup_serves_published_payloads_from_the_cache(self):
+        with self.assertNumQueries(0):
+            payload = self.lookup(self.students[1])
+        self.assertEqual(payload['result']['percentage'], '61.00')
+        self.assertIsNone(published_results.lookup(self.exam.pk, 'R1', date(2000, 1, 1)))
+
+    def test_corrections_refresh_and_unpublishing_withdraws(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.marks[0].marks_obtained = Decimal('75')
+            self.marks[0].save()
+        self.assertEqual(self.lookup(self.students[0])['subjects'][0]['marks_obtained'], '75.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.exam.is_published = False
+            self.exam.save()
+        self.assertIsNone(self.lookup(self.students[0]))
+        self.assertIsNone(self.lookup(self.students[1]))
+
+    def test_lost_cache_is_rebuilt_on_lookup(self):
+        caches['results'].clear()  # a restart, a deploy or a flush
+        self.assertEqual(self.lookup(self.students[0])['result']['percentage'], '60.00')
+        caches['results'].delete(published_results.lookup_key(self.exam.pk, 'R2', self.students[1].date_of_birth))
+        self.assertEqual(self.lookup(self.students[1])['result']['percentage'], '61.00')
+
+    def test_misses_are_remembered(self):
+        wrong = (self.exam.pk, 'R9', self.students[0].date_of_birth)
+        self.assertIsNone(published_results.lookup(*wrong))
+        with self.assertNumQueries(0):
+            self.assertIsNone(published_results.lookup(*wrong))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.exam.is_published = False
+            self.exam.save()
+        self.assertIsNone(self.lookup(self.students[0]))
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.lookup(self.students[1]))
+
+    def test_changed_details_move_the_result(self):
+        student = self.students[0]
+        old_details = (self.exam.pk, student.roll_number, student.date_of_birth)
+        with self.captureOnCommitCallbacks(execute=True):
+            student.roll_number = 'R7'
+            student.save()
+        self.assertIsNone(published_results.lookup(*old_details))
+        self.assertEqual(self.lookup(student)['student']['roll_number'], 'R7')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.students[1].delete()
+        self.assertIsNone(published_results.lookup(self.exam.pk, 'R2', self.students[1].date_of_birth))
+
+    def test_rollover_moves_results_to_the_new_roll_numbers(self):
+        self.roll_over()
+        self.assertIsNone(published_results.lookup(self.exam.pk, 'R1', self.students[0].date_of_birth))
+        student = Student.objects.get(pk=self.students[0].pk)
+        payload = self.lookup(student)
+        self.assertEqual((payload['student']['class_name'], payload['result']['percentage']), ('6A', '60.00'))
+
+    def test_publish_results_command_warms_the_cache(self):
+        caches['results'].clear()
+        call_command('publish_results', stdout=StringIO())
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(self.lookup(self.students[0]))
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import connections, transaction
+
+_uuid7_lock = threading.Lock()
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7():
+    """
+    Time-ordered UUID (RFC 9562 version 7).
+
+    48 bits of Unix milliseconds followed by a 12-bit counter and 62 random
+    bits, so ids generated later sort later and B-tree inserts land on the
+    right-most leaf instead of a random page. Values are ordinary UUIDs and
+    fit the existing UUIDField columns unchanged.
+    """
+    global _uuid7_last_ms, _uuid7_counter
+    with _uuid7_lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _uuid7_last_ms:
+            _uuid7_last_ms = now_ms
+            # Seed low so the counter rarely overflows within one millisecond
+            _uuid7_counter = int.from_bytes(os.urandom(1), 'big')
+        else:
+            _uuid7_counter += 1
+            if _uuid7_counter > 0xFFF:
+                _uuid7_last_ms += 1
+                _uuid7_counter = 0
+        timestamp, counter = _uuid7_last_ms, _uuid7_counter
+
+    value = (timestamp & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= int.from_bytes(os.urandom(8), 'big') & 0x3FFFFFFFFFFFFFFF
+    return uuid.UUID(int=value)
+
+
+class OnCommitBatch:
+    """
+    Keys to refresh once the current transaction commits.
+
+    Keys are collected per thread and handed to `refresh` together by the
+    first commit callback, so a transaction that touches the same key many
+    times (e.g. marking a whole class) refreshes it once. Keys left over from
+    a rolled-back transaction are refreshed with the next commit, which is
+    harmless for refreshes that recompute from the database.
+    """
+
+    def __init__(self, refresh):
+        self.refresh = refresh
+        self._local = threading.local()
+
+    def add(self, *key):
+        keys = getattr(self._local, 'keys', None)
+        if keys is None:
+            keys = self._local.keys = set()
+        keys.add(key)
+        transaction.on_commit(self._flush)
+
+    def _flush(self):
+        keys, self._local.keys = getattr(self._local, 'keys', None) or set(), set()
+        for key in keys:
+            self.refresh(*key)
+
+
+def _start_worker():
+    # Needed where workers are spawned rather than forked; each opens its own connections
+    django.setup()
+
+
+def map_in_processes(function, tasks, workers=1):
+    """
+    [function(*task) for task in tasks], spread over a pool of `workers`
+    processes when there are more than one of each. `function` must be
+    defined at module level so workers can import it.
+    """
+    if workers > 1 and len(tasks) > 1:
+        # Forked workers must not inherit (and share) this process's open connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker) as pool:
+            return list(pool.map(function, *zip(*tasks)))
+    return [function(*task) for task in tasks]
@@ -36,6 +36,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'school_management.core.reference_cache.ReferenceCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'school_management.urls'
@@ -66,6 +67,65 @@ DATABASES = {
     }
 }
 
+# Cache (shared between workers when REDIS_URL is set)
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'results': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'results',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        # Published result payloads (see core.published_results), one entry per student per exam. Each process
+        # keeps its own copy here, rebuilt on lookup misses; production needs REDIS_URL so they are shared
+        # and survive restarts (warm them with `manage.py publish_results`)
+        'results': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'published-results',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+
+# Seconds between reference-table version checks outside of requests
+REFERENCE_CACHE_CHECK_INTERVAL = config('REFERENCE_CACHE_CHECK_INTERVAL', default=5.0, cast=float)
+
+# Offline sync: how long delete tombstones are kept, and how far each watermark is rewound
+SYNC_TOMBSTONE_RETENTION_DAYS = config('SYNC_TOMBSTONE_RETENTION_DAYS', default=90, cast=int)
+SYNC_WATERMARK_OVERLAP = config('SYNC_WATERMARK_OVERLAP', default=60, cast=int)
+
+# Most GET sub-requests accepted by /api/batch/
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=20, cast=int)
+
+# Attendance alerts to parents: below this % (once a student has enough marked days), after this many
+# consecutive absences, or when the recent window drops this many points below the rest of the year
+ATTENDANCE_ALERT_THRESHOLD = config('ATTENDANCE_ALERT_THRESHOLD', default=75.0, cast=float)
+ATTENDANCE_ALERT_MIN_DAYS = config('ATTENDANCE_ALERT_MIN_DAYS', default=10, cast=int)
+ATTENDANCE_ALERT_STREAK = config('ATTENDANCE_ALERT_STREAK', default=3, cast=int)
+ATTENDANCE_ALERT_RECENT_DAYS = config('ATTENDANCE_ALERT_RECENT_DAYS', default=14, cast=int)
+ATTENDANCE_ALERT_DROP = config('ATTENDANCE_ALERT_DROP', default=25.0, cast=float)
+
+# Roll numbers given at year-end rollover; fields are the new year's name, the class name and the
+# student's alphabetical position in the class
+ROLLOVER_ROLL_NUMBER_FORMAT = config('ROLLOVER_ROLL_NUMBER_FORMAT', default='{year}-{class_name}-{position:02d}')
+
+# Background deletes (run_deletion_jobs): rows removed per transaction, and minutes without progress
+# after which a running job is taken to be interrupted and resumed by another worker
+DELETION_BATCH_SIZE = config('DELETION_BATCH_SIZE', default=1000, cast=int)
+DELETION_JOB_STALE_MINUTES = config('DELETION_JOB_STALE_MINUTES', default=10, cast=int)
+
+# Public result lookups allowed per client IP (see /api/results/lookup/)
+RESULTS_LOOKUP_RATE = config('RESULTS_LOOKUP_RATE', default='30/minute')
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,6 +174,9 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'results_lookup': RESULTS_LOOKUP_RATE,
+    },
 }
 
 # CORS Configuration